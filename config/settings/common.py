@@ -414,6 +414,12 @@ APACHE_TIKA_URL = env("APACHE_TIKA_URL", default="http://localhost:9998/tika")
 
 ELASTICSEARCH_SHOW_SIMILAR = env("ELASTICSEARCH_SHOW_SIMILAR", default=False)
 
+# In-database search engine used when ELASTICSEARCH_URL is not set
+LOCAL_SEARCH_ENABLED = env.bool("LOCAL_SEARCH_ENABLED", default=False)
+
+# Spool emails received by webhook and create letters in background task
+LETTER_RECEIVE_ASYNC = env.bool("LETTER_RECEIVE_ASYNC", default=False)
+
 # To avoid unwanted migrations when upgrading to Django 3.2
 DEFAULT_AUTO_FIELD = "django.db.models.AutoField"
 
@@ -54,7 +54,7 @@ DEBUG_TOOLBAR_CONFIG = {
 
 # TESTING
 # ------------------------------------------------------------------------------
-TEST_RUNNER = "django.test.runner.DiscoverRunner"
+TEST_RUNNER = "feder.main.runner.TemporaryMediaDiscoverRunner"
 
 # Your local stuff: Below this line define 3rd party library settings
 # To get all sql queries sent by Django from py shell
@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+from django.utils.translation import gettext_lazy as _
+
+
+class CasesConfig(AppConfig):
+    name = "feder.cases"
+    verbose_name = _("Cases")
+
+    def ready(self):
+        from . import signals  # noqa
@@ -72,19 +72,19 @@ class CaseReportFilter(django_filters.FilterSet):
         label=_("Tags"), field_name="tags", widget=forms.CheckboxSelectMultiple
     )
     first_request_date = django_filters.DateFromToRangeFilter(
-        label=_("First request date"), field_name="first_request__created"
+        label=_("First request date"), field_name="stats__first_request_date"
     )
     first_request_status = django_filters.ChoiceFilter(
         label=_("First request status"),
-        field_name="first_request__emaillog__status",
+        field_name="stats__first_request_status",
         choices=EMAIL_LOG_STATUS,
     )
     last_request_date = django_filters.DateFromToRangeFilter(
-        label=_("Last request date"), field_name="last_request__created"
+        label=_("Last request date"), field_name="stats__last_request_date"
     )
     last_request_status = django_filters.ChoiceFilter(
         label=_("Last request status"),
-        field_name="last_request__emaillog__status",
+        field_name="stats__last_request_status",
         choices=EMAIL_LOG_STATUS,
     )
 
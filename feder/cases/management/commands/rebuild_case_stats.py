@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from feder.cases.models import Case, CaseStats
+from feder.main.utils import chunked
+
+
+class Command(BaseCommand):
+    help = "Recompute statistics of letters of cases shown in lists of cases."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--monitoring", type=int, help="PK of monitoring of cases to rebuild"
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=500,
+            help="Count of cases recomputed in a single query",
+        )
+
+    def handle(self, *args, **options):
+        cases = Case.objects.order_by("pk")
+        if options["monitoring"]:
+            cases = cases.filter(monitoring=options["monitoring"])
+        count = 0
+        for ids in chunked(
+            cases.values_list("pk", flat=True).iterator(), options["chunk_size"]
+        ):
+            count += CaseStats.objects.refresh(ids)
+        self.stdout.write(f"Statistics of {count} cases rebuilt\n")
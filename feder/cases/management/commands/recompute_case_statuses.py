@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from feder.cases.models import Case
+from feder.monitorings.models import Monitoring
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute confirmation and response received statuses of cases "
+        "with a query per monitoring."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--monitoring",
+            type=int,
+            action="append",
+            help="PK of monitoring of cases to recompute, all monitorings by default",
+        )
+
+    def handle(self, *args, **options):
+        monitorings = Monitoring.objects.order_by("pk")
+        if options["monitoring"]:
+            monitorings = monitorings.filter(pk__in=options["monitoring"])
+        count = 0
+        for monitoring_id in monitorings.values_list("pk", flat=True):
+            count += Case.objects.filter(monitoring=monitoring_id).update_received()
+        self.stdout.write(f"Statuses of {count} cases recomputed\n")
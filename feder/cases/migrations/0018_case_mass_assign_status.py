@@ -0,0 +1,29 @@
+# Generated by Django 3.2.20 on 2026-10-17 23:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("cases", "0017_auto_20230613_1623"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="case",
+            name="mass_assign_status",
+            field=models.CharField(
+                blank=True,
+                choices=[
+                    ("pending", "Pending"),
+                    ("sent", "Sent"),
+                    ("failed", "Failed"),
+                ],
+                db_index=True,
+                editable=False,
+                max_length=10,
+                null=True,
+                verbose_name="Status of mass assign request",
+            ),
+        ),
+    ]
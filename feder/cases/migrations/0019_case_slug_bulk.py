@@ -0,0 +1,25 @@
+# Generated by Django 3.2.20 on 2026-10-17 23:44
+
+from django.db import migrations
+
+import feder.main.fields
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("cases", "0018_case_mass_assign_status"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="case",
+            name="slug",
+            field=feder.main.fields.BulkAutoSlugField(
+                editable=False,
+                max_length=110,
+                populate_from="name",
+                unique=True,
+                verbose_name="Slug",
+            ),
+        ),
+    ]
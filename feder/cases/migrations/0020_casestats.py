@@ -0,0 +1,88 @@
+# Generated by Django 3.2.20 on 2026-10-17 23:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("cases", "0019_case_slug_bulk"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CaseStats",
+            fields=[
+                (
+                    "case",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="stats",
+                        serialize=False,
+                        to="cases.case",
+                        verbose_name="Case",
+                    ),
+                ),
+                (
+                    "record_max",
+                    models.DateTimeField(
+                        blank=True, db_index=True, null=True, verbose_name="Last letter"
+                    ),
+                ),
+                (
+                    "record_count",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="Letters count"
+                    ),
+                ),
+                (
+                    "spam_count",
+                    models.PositiveIntegerField(default=0, verbose_name="Spam count"),
+                ),
+                (
+                    "application_letter_status",
+                    models.CharField(
+                        blank=True,
+                        max_length=20,
+                        null=True,
+                        verbose_name="Application letter status",
+                    ),
+                ),
+                (
+                    "first_request_date",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="First request date"
+                    ),
+                ),
+                (
+                    "first_request_status",
+                    models.CharField(
+                        blank=True,
+                        max_length=20,
+                        null=True,
+                        verbose_name="First request status",
+                    ),
+                ),
+                (
+                    "last_request_date",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="Last request date"
+                    ),
+                ),
+                (
+                    "last_request_status",
+                    models.CharField(
+                        blank=True,
+                        max_length=20,
+                        null=True,
+                        verbose_name="Last request status",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Case statistics",
+                "verbose_name_plural": "Case statistics",
+            },
+        ),
+    ]
@@ -0,0 +1,81 @@
+from django.db import migrations, models
+from django.db.models import Max, OuterRef, Q, Subquery
+
+SPAM = 2  # Letter.SPAM.spam
+CHUNK_SIZE = 500
+
+
+def fill_case_stats(apps, schema_editor):
+    Case = apps.get_model("cases", "Case")
+    CaseStats = apps.get_model("cases", "CaseStats")
+    Letter = apps.get_model("letters", "Letter")
+    Record = apps.get_model("records", "Record")
+    is_spam = Q(letters_letters__is_spam=SPAM)
+    application_letter = (
+        Letter.objects.filter(record__case=OuterRef("pk"), author_user_id__isnull=False)
+        .exclude(is_spam=SPAM)
+        .order_by("created")
+    )
+    case_ids = list(Case.objects.order_by("pk").values_list("pk", flat=True))
+    for i in range(0, len(case_ids), CHUNK_SIZE):
+        ids = case_ids[i : i + CHUNK_SIZE]
+        records = {
+            row["case_id"]: row
+            for row in Record.objects.filter(case_id__in=ids)
+            .order_by()
+            .values("case_id")
+            .annotate(
+                record_max=Max("created"),
+                record_count=models.Count(
+                    models.Case(models.When(is_spam, then=None), default="pk")
+                ),
+                spam_count=models.Count("pk", filter=is_spam),
+            )
+        }
+        rows = (
+            Case.objects.filter(pk__in=ids)
+            .order_by()
+            .annotate(
+                application_letter_status=Subquery(
+                    application_letter.values("emaillog__status")[:1]
+                )
+            )
+            .values(
+                "pk",
+                "application_letter_status",
+                "first_request__created",
+                "first_request__emaillog__status",
+                "last_request__created",
+                "last_request__emaillog__status",
+            )
+        )
+        CaseStats.objects.bulk_create(
+            [
+                CaseStats(
+                    case_id=row["pk"],
+                    record_max=records.get(row["pk"], {}).get("record_max"),
+                    record_count=records.get(row["pk"], {}).get("record_count", 0),
+                    spam_count=records.get(row["pk"], {}).get("spam_count", 0),
+                    application_letter_status=row["application_letter_status"],
+                    first_request_date=row["first_request__created"],
+                    first_request_status=row["first_request__emaillog__status"],
+                    last_request_date=row["last_request__created"],
+                    last_request_status=row["last_request__emaillog__status"],
+                )
+                for row in rows
+            ],
+            ignore_conflicts=True,
+        )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("cases", "0020_casestats"),
+        ("letters", "0039_letter_generated_from"),
+        ("logs", "0006_alter_emaillog_options"),
+        ("records", "0003_auto_20211021_0249"),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_case_stats, migrations.RunPython.noop),
+    ]
@@ -3,30 +3,38 @@ from datetime import timedelta
 from email.headerregistry import Address
 from functools import lru_cache
 
-from autoslug.fields import AutoSlugField
 from django.apps import apps
 from django.conf import settings
 from django.contrib.auth.models import Permission
 from django.contrib.contenttypes.models import ContentType
-from django.db import models
-from django.db.models import CharField, Max, OuterRef, Prefetch, Q, Subquery
+from django.core.cache import cache
+from django.db import models, transaction
+from django.db.models import CharField, Exists, F, Max, OuterRef, Prefetch, Q, Subquery
 from django.db.models.aggregates import Aggregate
-from django.db.models.functions import Cast, Trunc
+from django.db.models.functions import Cast, Coalesce, Trunc
 from django.urls import reverse
 from django.utils.timezone import datetime
 from django.utils.translation import gettext_lazy as _
+from model_utils import Choices
 from model_utils.models import TimeStampedModel
 
 from feder.institutions.models import Institution
+from feder.main.fields import BulkAutoSlugField
 from feder.main.utils import (
     FormattedDatetimeMixin,
     RenderBooleanFieldMixin,
     get_numeric_param,
     get_param,
 )
-from feder.monitorings.models import Monitoring, MonitoringUserObjectPermission
+from feder.monitorings.models import (
+    Monitoring,
+    MonitoringStats,
+    MonitoringUserObjectPermission,
+)
 from feder.teryt.models import JST
 
+from .settings import CASE_QUARANTINE_CACHE_TIMEOUT
+
 
 class GroupConcat(Aggregate):
     function = "GROUP_CONCAT"
@@ -36,9 +44,13 @@ class GroupConcat(Aggregate):
 def enforce_quarantined_queryset(queryset, user, path_case):
     if user.has_perm("monitorings.view_quarantined_case"):
         return queryset
-    if user.is_anonymous:
-        return queryset.filter(**{f"{path_case}__is_quarantined": False})
-    return queryset.filter(**{f"{path_case}__in": Case.objects.for_user(user).all()})
+    non_quarantined = Q(**{f"{path_case}__is_quarantined": False})
+    monitoring_ids = [] if user.is_anonymous else get_quarantine_monitoring_ids(user)
+    if not monitoring_ids:
+        return queryset.filter(non_quarantined)
+    return queryset.filter(
+        non_quarantined | Q(**{f"{path_case}__monitoring_id__in": monitoring_ids})
+    )
 
 
 @lru_cache(maxsize=1)  # TODO: use @functools.cache on python>=3.9
@@ -47,6 +59,35 @@ def get_quarantined_perm():
     return Permission.objects.get(content_type=ctype, codename="view_quarantined_case")
 
 
+def get_quarantine_cache_key(user_id, date_joined):
+    # date of joining distinguishes users, which reused id of deleted one
+    return f"cases:quarantine_monitorings:{user_id}:{date_joined.timestamp()}"
+
+
+def get_quarantine_monitoring_ids(user):
+    """
+    Returns ids of monitorings, in which user can view quarantined cases,
+    cached until change of object permissions of the user.
+    """
+    key = get_quarantine_cache_key(user.pk, user.date_joined)
+    monitoring_ids = cache.get(key)
+    if monitoring_ids is None:
+        monitoring_ids = list(
+            MonitoringUserObjectPermission.objects.filter(
+                user=user, permission=get_quarantined_perm()
+            )
+            .order_by("content_object_id")
+            .values_list("content_object_id", flat=True)
+            .distinct()
+        )
+        cache.set(key, monitoring_ids, CASE_QUARANTINE_CACHE_TIMEOUT)
+    return monitoring_ids
+
+
+def invalidate_quarantine_monitoring_ids(user):
+    cache.delete(get_quarantine_cache_key(user.pk, user.date_joined))
+
+
 class CaseQuerySet(FormattedDatetimeMixin, models.QuerySet):
     def with_record_count(self):
         # return self.annotate(record_count=models.Count("record"))
@@ -138,6 +179,21 @@ class CaseQuerySet(FormattedDatetimeMixin, models.QuerySet):
     def with_record_max(self):
         return self.annotate(record_max=Max("record__created"))
 
+    def with_stats(self):
+        """
+        Annotates cases with statistics stored in CaseStats, without
+        aggregation over records and letters.
+        """
+        return self.annotate(
+            record_max=F("stats__record_max"),
+            record_count=Coalesce("stats__record_count", 0),
+            application_letter_status=F("stats__application_letter_status"),
+            first_request_date=F("stats__first_request_date"),
+            first_request_status=F("stats__first_request_status"),
+            last_request_date=F("stats__last_request_date"),
+            last_request_status=F("stats__last_request_status"),
+        )
+
     def with_record_max_str(self):
         return self.annotate(
             record_max_str=Cast(
@@ -151,20 +207,75 @@ class CaseQuerySet(FormattedDatetimeMixin, models.QuerySet):
         if user.has_perm("monitorings.view_quarantined_case"):
             return self
         non_quarantined = models.Q(is_quarantined=False)
-        perm = get_quarantined_perm()
-        monitoring_permission = models.Q(
-            monitoring__in=MonitoringUserObjectPermission.objects.filter(
-                user=user, permission=perm
-            ).values("content_object")
-        )
-        return self.filter(non_quarantined | monitoring_permission)
+        monitoring_ids = get_quarantine_monitoring_ids(user)
+        if not monitoring_ids:
+            return self.filter(non_quarantined)
+        return self.filter(non_quarantined | models.Q(monitoring_id__in=monitoring_ids))
 
     def get_mass_assign_uid(self):
-        """Returns random UUID identifier ensuring it's unique."""
-        while True:
-            uid = uuid.uuid4()
-            if not self.filter(mass_assign=uid).exists():
-                return uid
+        """Returns random UUID identifier, collisions of UUID4 are negligible."""
+        return uuid.uuid4()
+
+    def mass_assign_progress(self):
+        """
+        Returns count of mass assigned cases by status of sending request.
+        """
+        counts = dict(
+            self.filter(mass_assign_status__isnull=False)
+            .order_by()
+            .values_list("mass_assign_status")
+            .annotate(count=models.Count("pk"))
+        )
+        return {
+            status: counts.get(status, 0) for status, label in Case.MASS_ASSIGN_STATUS
+        }
+
+    def mark_received(self, case_id, field):
+        """
+        Sets "confirmation_received" or "response_received" flag of case
+        with single conditional UPDATE, as new letters and parcels can only set
+        them. Counter of monitoring is updated in the same transaction.
+        Returns True, if the flag has been changed.
+        """
+        with transaction.atomic():
+            if not self.filter(pk=case_id, **{field: False}).update(**{field: True}):
+                return False
+            counter = f"case_{field}_count"
+            monitoring_ids = self.filter(pk=case_id).values("monitoring_id")
+            if not MonitoringStats.objects.filter(
+                monitoring_id__in=monitoring_ids
+            ).update(**{counter: F(counter) + 1}):
+                MonitoringStats.objects.refresh(
+                    monitoring_ids.values_list("monitoring_id", flat=True)
+                )
+        return True
+
+    def update_received(self):
+        """
+        Recomputes "confirmation_received" and "response_received" flags
+        of cases with single UPDATE, followed by counters of their monitorings.
+        Returns count of cases.
+        """
+        from feder.letters.models import Letter
+        from feder.parcels.models import IncomingParcelPost
+
+        incoming = Letter.objects.is_incoming().filter(record__case=OuterRef("pk"))
+        parcels = IncomingParcelPost.objects.filter(record__case=OuterRef("pk"))
+        monitoring_ids = set(
+            self.order_by().values_list("monitoring_id", flat=True).distinct()
+        )
+        with transaction.atomic():
+            count = self.order_by().update(
+                confirmation_received=Exists(incoming.filter_automatic()),
+                response_received=models.Case(
+                    models.When(Exists(incoming.exclude_automatic()), then=True),
+                    models.When(Exists(parcels), then=True),
+                    default=False,
+                    output_field=models.BooleanField(),
+                ),
+            )
+            MonitoringStats.objects.refresh(monitoring_ids)
+        return count
 
     def ajax_boolean_filter(self, request, prefix, field):
         filter_values = []
@@ -212,8 +323,13 @@ class CaseQuerySet(FormattedDatetimeMixin, models.QuerySet):
 
 
 class Case(RenderBooleanFieldMixin, TimeStampedModel):
+    MASS_ASSIGN_STATUS = Choices(
+        ("pending", _("Pending")),
+        ("sent", _("Sent")),
+        ("failed", _("Failed")),
+    )
     name = models.CharField(verbose_name=_("Name"), max_length=100)
-    slug = AutoSlugField(
+    slug = BulkAutoSlugField(
         populate_from="name", verbose_name=_("Slug"), max_length=110, unique=True
     )
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
@@ -226,6 +342,15 @@ class Case(RenderBooleanFieldMixin, TimeStampedModel):
     mass_assign = models.UUIDField(
         verbose_name="Mass assign ID", blank=True, null=True, editable=False
     )
+    mass_assign_status = models.CharField(
+        verbose_name=_("Status of mass assign request"),
+        choices=MASS_ASSIGN_STATUS,
+        max_length=10,
+        blank=True,
+        null=True,
+        db_index=True,
+        editable=False,
+    )
     email = models.CharField(max_length=75, db_index=True)
     tags = models.ManyToManyField(
         to="cases_tags.Tag",
@@ -339,6 +464,130 @@ class Case(RenderBooleanFieldMixin, TimeStampedModel):
         return " | ".join([t.name for t in self.tags.all().order_by("name")])
 
 
+class CaseStatsQuerySet(models.QuerySet):
+    def refresh(self, case_ids):
+        """
+        Recomputes statistics of given cases with set-based queries.
+        Cases which do not exist are skipped.
+        """
+        from feder.letters.models import Letter
+        from feder.records.models import Record
+
+        case_ids = {case_id for case_id in case_ids if case_id is not None}
+        if not case_ids:
+            return 0
+        is_spam = Q(letters_letters__is_spam=Letter.SPAM.spam)
+        records = {
+            row["case_id"]: row
+            for row in Record.objects.filter(case_id__in=case_ids)
+            .order_by()
+            .values("case_id")
+            .annotate(
+                record_max=Max("created"),
+                record_count=models.Count(
+                    models.Case(models.When(is_spam, then=None), default="pk")
+                ),
+                spam_count=models.Count("pk", filter=is_spam),
+            )
+        }
+        stats = []
+        for row in (
+            Case.objects.filter(pk__in=case_ids)
+            .order_by()
+            .with_application_letter_status()
+            .values(
+                "pk",
+                "application_letter_status",
+                "first_request__created",
+                "first_request__emaillog__status",
+                "last_request__created",
+                "last_request__emaillog__status",
+            )
+        ):
+            record = records.get(row["pk"], {})
+            stats.append(
+                CaseStats(
+                    case_id=row["pk"],
+                    record_max=record.get("record_max"),
+                    record_count=record.get("record_count", 0),
+                    spam_count=record.get("spam_count", 0),
+                    application_letter_status=row["application_letter_status"],
+                    first_request_date=row["first_request__created"],
+                    first_request_status=row["first_request__emaillog__status"],
+                    last_request_date=row["last_request__created"],
+                    last_request_status=row["last_request__emaillog__status"],
+                )
+            )
+        existing_ids = set(
+            self.filter(case_id__in=case_ids).values_list("case_id", flat=True)
+        )
+        self.bulk_update(
+            [x for x in stats if x.case_id in existing_ids], CaseStats.STATS_FIELDS
+        )
+        self.bulk_create(
+            [x for x in stats if x.case_id not in existing_ids], ignore_conflicts=True
+        )
+        return len(stats)
+
+
+class CaseStats(models.Model):
+    """
+    Statistics of letters of case, maintained on change of its records,
+    letters and email logs, so lists of cases do not aggregate them.
+    """
+
+    STATS_FIELDS = [
+        "record_max",
+        "record_count",
+        "spam_count",
+        "application_letter_status",
+        "first_request_date",
+        "first_request_status",
+        "last_request_date",
+        "last_request_status",
+    ]
+    case = models.OneToOneField(
+        Case,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="stats",
+        verbose_name=_("Case"),
+    )
+    record_max = models.DateTimeField(
+        verbose_name=_("Last letter"), null=True, blank=True, db_index=True
+    )
+    record_count = models.PositiveIntegerField(
+        verbose_name=_("Letters count"), default=0
+    )
+    spam_count = models.PositiveIntegerField(verbose_name=_("Spam count"), default=0)
+    application_letter_status = models.CharField(
+        verbose_name=_("Application letter status"),
+        max_length=20,
+        null=True,
+        blank=True,
+    )
+    first_request_date = models.DateTimeField(
+        verbose_name=_("First request date"), null=True, blank=True
+    )
+    first_request_status = models.CharField(
+        verbose_name=_("First request status"), max_length=20, null=True, blank=True
+    )
+    last_request_date = models.DateTimeField(
+        verbose_name=_("Last request date"), null=True, blank=True
+    )
+    last_request_status = models.CharField(
+        verbose_name=_("Last request status"), max_length=20, null=True, blank=True
+    )
+    objects = CaseStatsQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = _("Case statistics")
+        verbose_name_plural = _("Case statistics")
+
+    def __str__(self):
+        return f"Statistics of case #{self.case_id}"
+
+
 class Alias(models.Model):
     case = models.ForeignKey(Case, on_delete=models.CASCADE, verbose_name=_("Case"))
     email = models.CharField(max_length=75, db_index=True, unique=True)
@@ -3,7 +3,6 @@ from django.utils.translation import gettext_lazy as _
 from rest_framework import serializers
 
 from feder.cases.models import Case
-from feder.letters.logs.models import EmailLog
 
 
 class CaseSerializer(serializers.HyperlinkedModelSerializer):
@@ -84,30 +83,18 @@ class CaseReportSerializer(serializers.HyperlinkedModelSerializer):
         return obj.institution.regon
 
     def get_first_request_date(self, obj):
-        letter = obj.first_request
-        return formats.date_format(letter.created, format="Y-m-d") if letter else None
+        date = obj.first_request_date
+        return formats.date_format(date, format="Y-m-d") if date else None
 
     def get_first_request_status(self, obj):
-        letter = obj.first_request
-        if letter:
-            try:
-                return letter.emaillog.status
-            except EmailLog.DoesNotExist:
-                pass
-        return _("unknown")
+        return obj.first_request_status or _("unknown")
 
     def get_last_request_date(self, obj):
-        letter = obj.last_request
-        return formats.date_format(letter.created, format="Y-m-d") if letter else None
+        date = obj.last_request_date
+        return formats.date_format(date, format="Y-m-d") if date else None
 
     def get_last_request_status(self, obj):
-        letter = obj.last_request
-        if letter:
-            try:
-                return letter.emaillog.status
-            except EmailLog.DoesNotExist:
-                pass
-        return _("unknown")
+        return obj.last_request_status or _("unknown")
 
     def get_confirmation_received(self, obj):
         return _("yes") if obj.confirmation_received else _("no")
@@ -0,0 +1,5 @@
+from django.conf import settings
+
+CASE_QUARANTINE_CACHE_TIMEOUT = getattr(
+    settings, "CASE_QUARANTINE_CACHE_TIMEOUT", 60 * 60
+)
@@ -0,0 +1,207 @@
+from django.core.exceptions import ObjectDoesNotExist
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from feder.monitorings.models import MonitoringStats, MonitoringUserObjectPermission
+
+from .models import Case, invalidate_quarantine_monitoring_ids
+from .stats import get_deleted_case_ids, refresh_case_stats
+
+# flags of case counted in statistics of monitoring
+COUNTED_FIELDS = {
+    "is_quarantined": "case_quarantined_count",
+    "confirmation_received": "case_confirmation_received_count",
+    "response_received": "case_response_received_count",
+}
+# requests of case shown in its statistics
+REQUEST_FIELDS = ["first_request_id", "last_request_id"]
+
+
+@receiver(pre_delete, sender=Case)
+def mark_deleted_case(sender, instance, **kwargs):
+    get_deleted_case_ids().add(instance.pk)
+
+
+@receiver(post_delete, sender=Case)
+def unmark_deleted_case(sender, instance, **kwargs):
+    get_deleted_case_ids().discard(instance.pk)
+
+
+def remember_values(sender, instance, fields, update_fields):
+    """
+    Stores values of given fields before save of instance, unless the save
+    is limited to other fields.
+    """
+    instance.__dict__.pop("_previous_values", None)
+    if not instance.pk:
+        return
+    if update_fields is not None:
+        names = {sender._meta.get_field(field).name for field in fields}
+        if not (names | set(fields)) & set(update_fields):
+            return
+    instance._previous_values = (
+        sender.objects.filter(pk=instance.pk).values(*fields).first()
+    )
+
+
+def pop_changed_values(instance):
+    """
+    Returns values stored by remember_values, if any of them was changed.
+    """
+    previous = instance.__dict__.pop("_previous_values", None)
+    if previous and any(getattr(instance, k) != v for k, v in previous.items()):
+        return previous
+    return None
+
+
+@receiver(pre_save, sender="records.Record")
+def remember_case_of_record(sender, instance, raw, update_fields, **kwargs):
+    if not raw:
+        remember_values(sender, instance, ["case_id"], update_fields)
+
+
+@receiver(post_save, sender="records.Record")
+def update_stats_of_record(sender, instance, created, raw, **kwargs):
+    if raw:
+        return
+    previous = pop_changed_values(instance)
+    if created:
+        refresh_case_stats(instance.case_id)
+    elif previous:
+        refresh_case_stats(instance.case_id, previous["case_id"])
+
+
+@receiver(post_delete, sender="records.Record")
+def update_stats_of_deleted_record(sender, instance, **kwargs):
+    refresh_case_stats(instance.case_id)
+
+
+@receiver(pre_save, sender="letters.Letter")
+def remember_counted_fields_of_letter(sender, instance, raw, update_fields, **kwargs):
+    if not raw:
+        remember_values(
+            sender, instance, ["record_id", "is_spam", "author_user_id"], update_fields
+        )
+
+
+@receiver(post_save, sender="letters.Letter")
+def update_stats_of_letter(sender, instance, created, raw, **kwargs):
+    from feder.records.models import Record
+
+    if raw:
+        return
+    previous = pop_changed_values(instance)
+    if not created and not previous:
+        return
+    case_ids = [instance.record.case_id] if instance.record_id else []
+    if previous and previous["record_id"] != instance.record_id:
+        case_ids += Record.objects.filter(pk=previous["record_id"]).values_list(
+            "case_id", flat=True
+        )
+    refresh_case_stats(*case_ids)
+
+
+@receiver(post_delete, sender="letters.Letter")
+def update_stats_of_deleted_letter(sender, instance, **kwargs):
+    if not instance.record_id:
+        return
+    try:
+        refresh_case_stats(instance.record.case_id)
+    except ObjectDoesNotExist:
+        # record is deleted in cascade and updates statistics on its own
+        pass
+
+
+@receiver(pre_save, sender="logs.EmailLog")
+def remember_counted_fields_of_email_log(
+    sender, instance, raw, update_fields, **kwargs
+):
+    if not raw:
+        remember_values(
+            sender, instance, ["status", "letter_id", "case_id"], update_fields
+        )
+
+
+@receiver(post_save, sender="logs.EmailLog")
+def update_stats_of_email_log(sender, instance, created, raw, **kwargs):
+    if raw:
+        return
+    previous = pop_changed_values(instance)
+    if created:
+        refresh_case_stats(instance.case_id)
+    elif previous:
+        refresh_case_stats(instance.case_id, previous["case_id"])
+
+
+@receiver(post_delete, sender="logs.EmailLog")
+def update_stats_of_deleted_email_log(sender, instance, **kwargs):
+    refresh_case_stats(instance.case_id)
+
+
+def get_case_counters(values, sign=1):
+    counters = {"case_count": sign}
+    for field, counter in COUNTED_FIELDS.items():
+        counters[counter] = sign if values[field] else 0
+    return counters
+
+
+def add_to_monitoring_stats(monitoring_id, counters, create=True):
+    if not MonitoringStats.objects.add(monitoring_id, **counters) and create:
+        MonitoringStats.objects.refresh([monitoring_id])
+
+
+@receiver(pre_save, sender=Case)
+def remember_counted_fields_of_case(sender, instance, raw, update_fields, **kwargs):
+    if raw or not instance.pk:
+        return
+    tracked = {"monitoring", "first_request", "last_request"}
+    tracked |= {"monitoring_id", *COUNTED_FIELDS, *REQUEST_FIELDS}
+    if update_fields is None or tracked & set(update_fields):
+        instance._previous_counted = (
+            sender.objects.filter(pk=instance.pk)
+            .values("monitoring_id", *COUNTED_FIELDS, *REQUEST_FIELDS)
+            .first()
+        )
+
+
+@receiver(post_save, sender=Case)
+def update_stats_of_case(sender, instance, created, raw, **kwargs):
+    if raw:
+        return
+    current = {field: getattr(instance, field) for field in COUNTED_FIELDS}
+    if created:
+        add_to_monitoring_stats(instance.monitoring_id, get_case_counters(current))
+        return
+    previous = instance.__dict__.pop("_previous_counted", None)
+    if previous is None:
+        return
+    if any(previous[field] != getattr(instance, field) for field in REQUEST_FIELDS):
+        refresh_case_stats(instance.pk)
+    deltas = get_case_counters(current)
+    previous_deltas = get_case_counters(previous, sign=-1)
+    if previous["monitoring_id"] == instance.monitoring_id:
+        deltas = {key: deltas[key] + previous_deltas[key] for key in deltas}
+    else:
+        add_to_monitoring_stats(previous["monitoring_id"], previous_deltas)
+    add_to_monitoring_stats(instance.monitoring_id, deltas)
+
+
+@receiver(post_delete, sender=Case)
+def update_monitoring_stats_of_deleted_case(sender, instance, **kwargs):
+    # statistics are not created, as monitoring could be deleted in cascade
+    counters = {field: getattr(instance, field) for field in COUNTED_FIELDS}
+    add_to_monitoring_stats(
+        instance.monitoring_id, get_case_counters(counters, sign=-1), create=False
+    )
+
+
+@receiver(post_save, sender=MonitoringUserObjectPermission)
+@receiver(post_delete, sender=MonitoringUserObjectPermission)
+def invalidate_quarantine_access(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    try:
+        invalidate_quarantine_monitoring_ids(instance.user)
+    except ObjectDoesNotExist:
+        # permissions of deleted user are not used anymore
+        pass
@@ -0,0 +1,42 @@
+import threading
+from contextlib import contextmanager
+
+from .models import CaseStats
+
+# ids of cases being deleted, their statistics are deleted in cascade
+deleted_cases = threading.local()
+# ids of cases collected to refresh their statistics at once
+batched_cases = threading.local()
+
+
+def get_deleted_case_ids():
+    if not hasattr(deleted_cases, "ids"):
+        deleted_cases.ids = set()
+    return deleted_cases.ids
+
+
+def refresh_case_stats(*case_ids):
+    deleted_ids = get_deleted_case_ids()
+    case_ids = {x for x in case_ids if x is not None and x not in deleted_ids}
+    if getattr(batched_cases, "ids", None) is not None:
+        batched_cases.ids.update(case_ids)
+    else:
+        CaseStats.objects.refresh(case_ids)
+
+
+@contextmanager
+def batch_case_stats():
+    """
+    Refreshes statistics of cases changed within the block once at its end,
+    eg. for bulk changes of records and letters.
+    """
+    if getattr(batched_cases, "ids", None) is not None:
+        yield
+        return
+    batched_cases.ids = set()
+    try:
+        yield
+        case_ids = batched_cases.ids
+    finally:
+        batched_cases.ids = None
+    refresh_case_stats(*case_ids)
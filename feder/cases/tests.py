@@ -1,13 +1,28 @@
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
 from django.test import RequestFactory, TestCase
 from django.urls import reverse
 from django.utils.http import urlencode
-
-from feder.cases.models import Case
+from guardian.shortcuts import assign_perm, remove_perm
+
+from feder.cases.models import (
+    Case,
+    CaseStats,
+    CaseStatsQuerySet,
+    enforce_quarantined_queryset,
+)
 from feder.institutions.factories import InstitutionFactory
-from feder.letters.factories import IncomingLetterFactory
+from feder.letters.factories import IncomingLetterFactory, OutgoingLetterFactory
+from feder.letters.logs.factories import EmailLogFactory
+from feder.letters.logs.models import STATUS
 from feder.letters.models import Letter
 from feder.main.tests import PermissionStatusMixin
+from feder.monitorings.models import MonitoringStats
 from feder.parcels.factories import IncomingParcelPostFactory
+from feder.records.factories import RecordFactory
+from feder.records.models import Record
 from feder.teryt.factories import CommunityJSTFactory, CountyJSTFactory
 from feder.users.factories import UserFactory
 
@@ -166,6 +181,40 @@ class CaseQuerySetTestCase(TestCase):
             Case.objects.by_addresses(["alias-123@example.com"]).get(), case
         )
 
+    def test_for_user_quarantined_by_permission(self):
+        user = UserFactory()
+        case = CaseFactory(is_quarantined=True)
+        other = CaseFactory(is_quarantined=True)
+        self.assertFalse(Case.objects.for_user(user).exists())
+        assign_perm("monitorings.view_quarantined_case", user, case.monitoring)
+        self.assertEqual(list(Case.objects.for_user(user)), [case])
+        remove_perm("monitorings.view_quarantined_case", user, case.monitoring)
+        self.assertFalse(Case.objects.for_user(user).exists())
+        self.assertFalse(Case.objects.filter(pk=other.pk).for_user(user).exists())
+
+    def test_for_user_cache_quarantine_access(self):
+        user = UserFactory()
+        case = CaseFactory(is_quarantined=True)
+        assign_perm("monitorings.view_quarantined_case", user, case.monitoring)
+        list(Case.objects.for_user(user))
+        with self.assertNumQueries(1):
+            # global permissions of user are cached on it by backend
+            self.assertEqual(list(Case.objects.for_user(user)), [case])
+
+    def test_enforce_quarantined_queryset(self):
+        user = UserFactory()
+        record = RecordFactory(case__is_quarantined=True)
+        assign_perm("monitorings.view_quarantined_case", user, record.case.monitoring)
+        self.assertEqual(
+            list(enforce_quarantined_queryset(Record.objects.all(), user, "case")),
+            [record],
+        )
+        self.assertFalse(
+            enforce_quarantined_queryset(
+                Record.objects.all(), UserFactory(), "case"
+            ).exists()
+        )
+
 
 class CaseReportViewSetTestCase(TestCase):
     # TODO: Tests for other available filters could be added here
@@ -185,3 +234,146 @@ class CaseReportViewSetTestCase(TestCase):
         )
         self.assertEqual(response.status_code, 200)
         self.assertIn("text/csv", response["content-type"])
+
+
+class CaseStatsTestCase(TestCase):
+    def setUp(self):
+        self.case = CaseFactory()
+
+    def get_stats(self):
+        return CaseStats.objects.get(case=self.case)
+
+    def test_count_letters_on_save(self):
+        letter = IncomingLetterFactory(record__case=self.case)
+        parcel = IncomingParcelPostFactory(record__case=self.case)
+        stats = self.get_stats()
+        self.assertEqual(stats.record_count, 2)
+        self.assertEqual(stats.spam_count, 0)
+        self.assertEqual(stats.record_max, parcel.record.created)
+
+        letter.is_spam = Letter.SPAM.spam
+        letter.save()
+        stats = self.get_stats()
+        self.assertEqual(stats.record_count, 1)
+        self.assertEqual(stats.spam_count, 1)
+
+        letter.delete()
+        self.assertEqual(self.get_stats().spam_count, 0)
+
+    def test_store_first_request_status(self):
+        letter = OutgoingLetterFactory(record__case=self.case)
+        self.case.first_request = letter
+        self.case.save()
+        EmailLogFactory(case=self.case, letter=letter, status=STATUS.ok)
+        stats = self.get_stats()
+        self.assertEqual(stats.first_request_date, letter.created)
+        self.assertEqual(stats.first_request_status, STATUS.ok)
+        self.assertEqual(stats.application_letter_status, STATUS.ok)
+        self.assertIsNone(stats.last_request_date)
+
+    def test_skip_refresh_on_save_of_other_fields(self):
+        letter = IncomingLetterFactory(record__case=self.case)
+        email_log = EmailLogFactory(case=self.case, letter=letter)
+        with patch.object(CaseStatsQuerySet, "refresh") as refresh:
+            letter.note = "Note"
+            letter.save()
+            letter.record.save()
+            email_log.save()
+            self.case.name = "Other name"
+            self.case.save()
+        refresh.assert_not_called()
+
+    def test_refresh_on_move_of_record(self):
+        letter = IncomingLetterFactory(record__case=self.case)
+        other = CaseFactory()
+        letter.record.case = other
+        letter.record.save()
+        self.assertEqual(self.get_stats().record_count, 0)
+        self.assertEqual(CaseStats.objects.get(case=other).record_count, 1)
+
+    def test_annotate_cases_with_stats(self):
+        IncomingLetterFactory(record__case=self.case)
+        other = CaseFactory()
+        cases = Case.objects.with_stats().order_by("pk")
+        self.assertEqual([x.record_count for x in cases], [1, 0])
+        self.assertIsNone(cases.get(pk=other.pk).record_max)
+
+    def test_delete_case(self):
+        IncomingLetterFactory(record__case=self.case)
+        self.case.delete()
+        self.assertFalse(CaseStats.objects.exists())
+
+    def test_rebuild_command(self):
+        IncomingLetterFactory(record__case=self.case)
+        CaseStats.objects.all().delete()
+        stdout = StringIO()
+        call_command(
+            "rebuild_case_stats",
+            f"--monitoring={self.case.monitoring.pk}",
+            stdout=stdout,
+        )
+        self.assertEqual(self.get_stats().record_count, 1)
+        self.assertIn("Statistics of 1 cases rebuilt", stdout.getvalue())
+
+
+class CaseStatusTestCase(TestCase):
+    def setUp(self):
+        self.case = CaseFactory()
+
+    def get_monitoring_stats(self):
+        return MonitoringStats.objects.get(monitoring=self.case.monitoring)
+
+    def test_confirmation_received(self):
+        IncomingLetterFactory(
+            record__case=self.case,
+            message_type=Letter.MESSAGE_TYPES.disposition_notification,
+        )
+        self.case.refresh_from_db()
+        self.assertTrue(self.case.confirmation_received)
+        self.assertFalse(self.case.response_received)
+        self.assertEqual(
+            self.get_monitoring_stats().case_confirmation_received_count, 1
+        )
+
+    def test_response_received_once(self):
+        IncomingLetterFactory(record__case=self.case)
+        IncomingLetterFactory(record__case=self.case)
+        self.case.refresh_from_db()
+        self.assertFalse(self.case.confirmation_received)
+        self.assertTrue(self.case.response_received)
+        self.assertEqual(self.get_monitoring_stats().case_response_received_count, 1)
+
+    def test_ignore_outgoing_letter(self):
+        OutgoingLetterFactory(record__case=self.case)
+        self.case.refresh_from_db()
+        self.assertFalse(self.case.response_received)
+
+    def test_response_received_by_parcel(self):
+        IncomingParcelPostFactory(record__case=self.case)
+        self.case.refresh_from_db()
+        self.assertTrue(self.case.response_received)
+
+    def test_mark_received_only_once(self):
+        self.assertTrue(Case.objects.mark_received(self.case.pk, "response_received"))
+        self.assertFalse(Case.objects.mark_received(self.case.pk, "response_received"))
+        self.assertEqual(self.get_monitoring_stats().case_response_received_count, 1)
+
+    def test_recompute_command(self):
+        IncomingLetterFactory(record__case=self.case)
+        other = CaseFactory(monitoring=self.case.monitoring, response_received=True)
+        Case.objects.filter(pk=self.case.pk).update(confirmation_received=True)
+        stdout = StringIO()
+        call_command(
+            "recompute_case_statuses",
+            f"--monitoring={self.case.monitoring.pk}",
+            stdout=stdout,
+        )
+        self.case.refresh_from_db()
+        other.refresh_from_db()
+        self.assertFalse(self.case.confirmation_received)
+        self.assertTrue(self.case.response_received)
+        self.assertFalse(other.response_received)
+        stats = self.get_monitoring_stats()
+        self.assertEqual(stats.case_confirmation_received_count, 0)
+        self.assertEqual(stats.case_response_received_count, 1)
+        self.assertIn("Statuses of 2 cases recomputed", stdout.getvalue())
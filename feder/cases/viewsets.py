@@ -99,8 +99,7 @@ class CaseReportViewSet(viewsets.ReadOnlyModelViewSet):
     def get_queryset(self):
         qs = (
             Case.objects.prefetch_related("tags")
-            .select_related("first_request", "first_request__emaillog")
-            .select_related("last_request", "last_request__emaillog")
+            .with_stats()
             .with_institution()
             .with_tags_string()
             .for_user(self.request.user)
@@ -0,0 +1,16 @@
+from django.conf import settings
+
+from .elastic import ElasticsearchEngine
+from .local import LocalEngine
+
+
+def is_available():
+    return get_engine() is not None
+
+
+def get_engine():
+    if settings.ELASTICSEARCH_URL:
+        return ElasticsearchEngine()
+    if getattr(settings, "LOCAL_SEARCH_ENABLED", False):
+        return LocalEngine()
+    return None
@@ -0,0 +1,32 @@
+class BaseEngine:
+    name = None
+
+    def index_letters(self, letters):
+        raise NotImplementedError(
+            f"Provide 'index_letters' in {self.__class__.__name__}"
+        )
+
+    def delete_letters(self, letter_ids):
+        raise NotImplementedError(
+            f"Provide 'delete_letters' in {self.__class__.__name__}"
+        )
+
+    def iter_letter_ids(self):
+        raise NotImplementedError(
+            f"Provide 'iter_letter_ids' in {self.__class__.__name__}"
+        )
+
+    def filter_indexed_letter_ids(self, letter_ids):
+        raise NotImplementedError(
+            f"Provide 'filter_indexed_letter_ids' in {self.__class__.__name__}"
+        )
+
+    def search_keywords(self, query, count=10):
+        raise NotImplementedError(
+            f"Provide 'search_keywords' in {self.__class__.__name__}"
+        )
+
+    def similar_letter_ids(self, letter_id, count=10):
+        raise NotImplementedError(
+            f"Provide 'similar_letter_ids' in {self.__class__.__name__}"
+        )
@@ -0,0 +1,40 @@
+from ..queries import (
+    bulk_save_documents,
+    delete_documents,
+    delete_stale_documents,
+    filter_document_letter_ids,
+    find_document,
+    iter_document_letter_ids,
+    more_like_this,
+    search_keywords,
+)
+from ..serializers import letters_serialize
+from .base import BaseEngine
+
+
+class ElasticsearchEngine(BaseEngine):
+    name = "Elasticsearch"
+
+    def index_letters(self, letters):
+        letters = list(letters)
+        docs = letters_serialize(letters)
+        delete_stale_documents([x.pk for x in letters])
+        return bulk_save_documents(docs)
+
+    def delete_letters(self, letter_ids):
+        delete_documents(letter_ids)
+
+    def iter_letter_ids(self):
+        return iter_document_letter_ids()
+
+    def filter_indexed_letter_ids(self, letter_ids):
+        return filter_document_letter_ids(letter_ids)
+
+    def search_keywords(self, query, count=10):
+        return [int(x.letter_id) for x in search_keywords(query)][:count]
+
+    def similar_letter_ids(self, letter_id, count=10):
+        doc = find_document(letter_id)
+        if not doc:
+            return []
+        return [int(x.letter_id) for x in more_like_this(doc)][:count]
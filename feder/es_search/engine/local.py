@@ -0,0 +1,102 @@
+import math
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import Count
+
+from feder.main.utils import tokenize
+
+from ..models import LocalDocument, LocalTerm
+from ..serializers import letters_serialize
+from .base import BaseEngine
+
+SIMILAR_TERM_COUNT = 25
+
+
+def document_terms(doc):
+    texts = [doc.title, doc.body, *doc.content]
+    return Counter(term for text in texts for term in tokenize(text))
+
+
+class LocalEngine(BaseEngine):
+    """
+    In-process search engine for deployments without Elasticsearch.
+    Keeps inverted index in database and ranks documents by TF-IDF.
+    """
+
+    name = "local"
+
+    def index_letters(self, letters):
+        docs = letters_serialize(letters)
+        with transaction.atomic():
+            LocalDocument.objects.filter(
+                letter_id__in=[doc.letter_id for doc in docs]
+            ).delete()
+            documents = []
+            terms = []
+            for doc in docs:
+                counter = document_terms(doc)
+                documents.append(
+                    LocalDocument(letter_id=doc.letter_id, length=sum(counter.values()))
+                )
+                terms += [
+                    LocalTerm(document_id=doc.letter_id, term=term, count=count)
+                    for term, count in counter.items()
+                ]
+            LocalDocument.objects.bulk_create(documents)
+            LocalTerm.objects.bulk_create(terms, batch_size=1000)
+        return len(docs)
+
+    def delete_letters(self, letter_ids):
+        LocalDocument.objects.filter(letter_id__in=letter_ids).delete()
+
+    def iter_letter_ids(self):
+        return LocalDocument.objects.values_list("letter_id", flat=True).iterator()
+
+    def filter_indexed_letter_ids(self, letter_ids):
+        return set(
+            LocalDocument.objects.filter(letter_id__in=letter_ids).values_list(
+                "letter_id", flat=True
+            )
+        )
+
+    def get_idf(self, terms):
+        total = LocalDocument.objects.count()
+        doc_freq = (
+            LocalTerm.objects.filter(term__in=terms)
+            .values("term")
+            .annotate(doc_freq=Count("document"))
+            .values_list("term", "doc_freq")
+        )
+        return {term: math.log(1 + total / freq) for term, freq in doc_freq}
+
+    def rank(self, weights, count, exclude=None):
+        """
+        Returns ids of letters with the highest sum of TF-IDF of given terms
+        multiplied by the term weights.
+        """
+        idf = self.get_idf(list(weights))
+        scores = defaultdict(float)
+        postings = LocalTerm.objects.filter(term__in=list(idf)).values_list(
+            "document_id", "term", "count", "document__length"
+        )
+        for letter_id, term, term_count, length in postings.iterator():
+            tf = math.sqrt(term_count) / math.sqrt(length)
+            scores[letter_id] += weights[term] * tf * idf[term]
+        scores.pop(exclude, None)
+        ranking = sorted(scores.items(), key=lambda x: (-x[1], x[0]))
+        return [letter_id for letter_id, _ in ranking[:count]]
+
+    def search_keywords(self, query, count=10):
+        return self.rank(Counter(tokenize(query)), count)
+
+    def similar_letter_ids(self, letter_id, count=10):
+        terms = dict(
+            LocalTerm.objects.filter(document_id=letter_id).values_list("term", "count")
+        )
+        idf = self.get_idf(list(terms))
+        weights = {term: terms[term] * idf[term] for term in idf}
+        top_terms = sorted(weights, key=weights.get, reverse=True)[:SIMILAR_TERM_COUNT]
+        return self.rank(
+            {term: weights[term] for term in top_terms}, count, exclude=letter_id
+        )
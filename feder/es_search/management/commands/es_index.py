@@ -1,22 +1,144 @@
-from django.core.management.base import BaseCommand
+import time
 
-from ....letters.models import Letter
-from ...tasks import index_letter
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max, Q
+from django.utils import timezone
+
+from ....letters.models import Attachment, Letter
+from ....main.utils import chunked
+from ...engine import get_engine
+from ...models import IndexCheckpoint
+from ...settings import ELASTICSEARCH_BULK_CHUNK_SIZE
+from ...tasks import bulk_index_letter, index_letter
+
+INCREMENTAL_CHUNK_SIZE = 1000
 
 
 class Command(BaseCommand):
+    help = "Index letters in search engine."
+
     def add_arguments(self, parser):
         parser.add_argument("monitoring_ids", nargs="*", type=int)
         parser.add_argument("--skip-queue", action="store_true")
+        parser.add_argument(
+            "--bulk",
+            action="store_true",
+            help="Index letters in chunks, using bulk API of Elasticsearch",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=ELASTICSEARCH_BULK_CHUNK_SIZE,
+            help="Count of letters indexed in a single bulk task",
+        )
+        parser.add_argument(
+            "--incremental",
+            action="store_true",
+            help="Index only letters changed since the last incremental run "
+            "and remove documents of deleted or spam letters",
+        )
 
     def handle(self, *args, **options):
+        self.engine = get_engine()
+        if self.engine is None:
+            raise CommandError("Search engine is not configured.")
         qs = Letter.objects.all().exclude_spam()
         if options["monitoring_ids"]:
             qs = qs.filter(record__case__monitoring__in=options["monitoring_ids"])
-        for letter_id in qs.values_list("id", flat=True).iterator():
+        start = time.monotonic()
+        if options["incremental"]:
+            checkpoint = IndexCheckpoint.objects.for_monitorings(
+                options["monitoring_ids"]
+            )
+            started_at = timezone.now()
+            last_attachment_id = Attachment.objects.aggregate(Max("pk"))["pk__max"]
+            self.remove_stale_documents()
+            letter_ids = self.get_changed_letter_ids(qs, checkpoint)
+        else:
+            letter_ids = qs.values_list("id", flat=True).iterator()
+        if options["bulk"]:
+            letter_count, indexed_count = self.bulk_index(letter_ids, **options)
+        else:
+            letter_count, indexed_count = self.index(letter_ids, **options)
+        if options["incremental"]:
+            # queued tasks are stored in database and read letters when run,
+            # so changes before the start are indexed by them as well
+            checkpoint.letter_modified = started_at
+            checkpoint.attachment_id = last_attachment_id or 0
+            checkpoint.save()
+        elapsed = max(time.monotonic() - start, 0.001)
+        self.stdout.write(
+            f"Letters: {letter_count}; indexed: {indexed_count}; "
+            f"time: {elapsed:.1f}s; rate: {letter_count / elapsed:.1f} letters/s\n"
+        )
+
+    def remove_stale_documents(self):
+        """
+        Removes documents of letters deleted or marked as spam since indexing.
+        """
+        removed_count = 0
+        for ids in chunked(self.engine.iter_letter_ids(), INCREMENTAL_CHUNK_SIZE):
+            existing_ids = set(
+                Letter.objects.exclude_spam()
+                .filter(pk__in=ids)
+                .values_list("id", flat=True)
+            )
+            stale_ids = [x for x in ids if x not in existing_ids]
+            if stale_ids:
+                self.engine.delete_letters(stale_ids)
+            removed_count += len(stale_ids)
+        self.stdout.write(f"Removed documents of {removed_count} letters\n")
+
+    def get_changed_letter_ids(self, qs, checkpoint):
+        """
+        Yields ids of letters modified since the checkpoint, letters with new
+        attachments and letters missing in the index, eg. no longer spam.
+        Letters are compared with the index in chunks ordered by id.
+        """
+        changed = Q(modified__gt=checkpoint.letter_modified) | Q(
+            attachment__pk__gt=checkpoint.attachment_id
+        )
+        last_id = 0
+        while True:
+            ids = list(
+                qs.filter(pk__gt=last_id)
+                .order_by("pk")
+                .values_list("id", flat=True)[:INCREMENTAL_CHUNK_SIZE]
+            )
+            if not ids:
+                return
+            last_id = ids[-1]
+            if checkpoint.letter_modified is None:
+                yield from ids
+                continue
+            changed_ids = set(
+                qs.filter(changed, pk__in=ids).values_list("id", flat=True)
+            )
+            indexed_ids = self.engine.filter_indexed_letter_ids(ids)
+            yield from (x for x in ids if x in changed_ids or x not in indexed_ids)
+
+    def index(self, letter_ids, **options):
+        letter_count = 0
+        for letter_id in letter_ids:
             ids = [letter_id]
             if options["skip_queue"]:
                 index_letter.now(ids)
             else:
                 index_letter(ids)
+            letter_count += 1
             self.stdout.write(f"Add letter of #{letter_id}\n")
+        return letter_count, letter_count if options["skip_queue"] else 0
+
+    def bulk_index(self, letter_ids, **options):
+        letter_count = 0
+        indexed_count = 0
+        for ids in chunked(letter_ids, options["chunk_size"]):
+            if options["skip_queue"]:
+                indexed_count += bulk_index_letter.now(ids)
+            else:
+                bulk_index_letter(ids)
+            letter_count += len(ids)
+            self.stdout.write(
+                f"Add chunk of {len(ids)} letters (#{ids[0]}-#{ids[-1]})\n"
+            )
+        return letter_count, indexed_count
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from ....monitorings.models import Monitoring
+from ...tasks import precompute_similar_letters
+
+
+class Command(BaseCommand):
+    help = "Precompute similar letters of monitorings to cache."
+
+    def add_arguments(self, parser):
+        parser.add_argument("monitoring_ids", nargs="*", type=int)
+        parser.add_argument("--skip-queue", action="store_true")
+
+    def handle(self, *args, **options):
+        qs = Monitoring.objects.all()
+        if options["monitoring_ids"]:
+            qs = qs.filter(pk__in=options["monitoring_ids"])
+        for monitoring_id in qs.values_list("id", flat=True).iterator():
+            if options["skip_queue"]:
+                precompute_similar_letters.now(monitoring_id)
+            else:
+                precompute_similar_letters(monitoring_id)
+            self.stdout.write(f"Add monitoring of #{monitoring_id}\n")
@@ -0,0 +1,59 @@
+# Generated by Django 3.2.20 on 2026-10-17 23:04
+
+import django.utils.timezone
+import model_utils.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    initial = True
+
+    dependencies = []
+
+    operations = [
+        migrations.CreateModel(
+            name="ExtractedText",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "created",
+                    model_utils.fields.AutoCreatedField(
+                        default=django.utils.timezone.now,
+                        editable=False,
+                        verbose_name="created",
+                    ),
+                ),
+                (
+                    "modified",
+                    model_utils.fields.AutoLastModifiedField(
+                        default=django.utils.timezone.now,
+                        editable=False,
+                        verbose_name="modified",
+                    ),
+                ),
+                (
+                    "content_hash",
+                    models.CharField(
+                        max_length=64, unique=True, verbose_name="Content hash"
+                    ),
+                ),
+                (
+                    "content",
+                    models.TextField(blank=True, verbose_name="Extracted text"),
+                ),
+            ],
+            options={
+                "verbose_name": "Extracted text",
+                "verbose_name_plural": "Extracted texts",
+                "ordering": ["created"],
+            },
+        ),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 3.2.20 on 2026-10-17 23:18
+
+import django.utils.timezone
+import model_utils.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("es_search", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="IndexCheckpoint",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "created",
+                    model_utils.fields.AutoCreatedField(
+                        default=django.utils.timezone.now,
+                        editable=False,
+                        verbose_name="created",
+                    ),
+                ),
+                (
+                    "modified",
+                    model_utils.fields.AutoLastModifiedField(
+                        default=django.utils.timezone.now,
+                        editable=False,
+                        verbose_name="modified",
+                    ),
+                ),
+                (
+                    "name",
+                    models.CharField(max_length=250, unique=True, verbose_name="Name"),
+                ),
+                (
+                    "letter_modified",
+                    models.DateTimeField(
+                        blank=True,
+                        null=True,
+                        verbose_name="Last indexed letter modification time",
+                    ),
+                ),
+                (
+                    "attachment_id",
+                    models.IntegerField(
+                        default=0, verbose_name="Last indexed attachment ID"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Index checkpoint",
+                "verbose_name_plural": "Index checkpoints",
+                "ordering": ["created"],
+            },
+        ),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 3.2.20 on 2026-10-17 23:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("letters", "0035_alter_reputableletteremailtld_name"),
+        ("es_search", "0002_indexcheckpoint"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="LocalDocument",
+            fields=[
+                (
+                    "letter",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="local_document",
+                        serialize=False,
+                        to="letters.letter",
+                        verbose_name="Letter",
+                    ),
+                ),
+                (
+                    "length",
+                    models.IntegerField(default=0, verbose_name="Count of terms"),
+                ),
+            ],
+            options={
+                "verbose_name": "Local search document",
+                "verbose_name_plural": "Local search documents",
+            },
+        ),
+        migrations.CreateModel(
+            name="LocalTerm",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "term",
+                    models.CharField(db_index=True, max_length=50, verbose_name="Term"),
+                ),
+                ("count", models.IntegerField(default=0, verbose_name="Count")),
+                (
+                    "document",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="es_search.localdocument",
+                        verbose_name="Document",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Local search term",
+                "verbose_name_plural": "Local search terms",
+            },
+        ),
+    ]
@@ -0,0 +1,73 @@
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+from model_utils.models import TimeStampedModel
+
+
+class ExtractedText(TimeStampedModel):
+    content_hash = models.CharField(
+        verbose_name=_("Content hash"), max_length=64, unique=True
+    )
+    content = models.TextField(verbose_name=_("Extracted text"), blank=True)
+
+    class Meta:
+        verbose_name = _("Extracted text")
+        verbose_name_plural = _("Extracted texts")
+        ordering = ["created"]
+
+    def __str__(self):
+        return self.content_hash
+
+
+class IndexCheckpointQuerySet(models.QuerySet):
+    def for_monitorings(self, monitoring_ids=None):
+        name = (
+            ",".join(str(x) for x in sorted(monitoring_ids)) if monitoring_ids else ""
+        )
+        obj, _ = self.get_or_create(name=f"letters:{name}")
+        return obj
+
+
+class IndexCheckpoint(TimeStampedModel):
+    name = models.CharField(verbose_name=_("Name"), max_length=250, unique=True)
+    letter_modified = models.DateTimeField(
+        verbose_name=_("Last indexed letter modification time"), null=True, blank=True
+    )
+    attachment_id = models.IntegerField(
+        verbose_name=_("Last indexed attachment ID"), default=0
+    )
+    objects = IndexCheckpointQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = _("Index checkpoint")
+        verbose_name_plural = _("Index checkpoints")
+        ordering = ["created"]
+
+    def __str__(self):
+        return self.name
+
+
+class LocalDocument(models.Model):
+    letter = models.OneToOneField(
+        to="letters.Letter",
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="local_document",
+        verbose_name=_("Letter"),
+    )
+    length = models.IntegerField(verbose_name=_("Count of terms"), default=0)
+
+    class Meta:
+        verbose_name = _("Local search document")
+        verbose_name_plural = _("Local search documents")
+
+
+class LocalTerm(models.Model):
+    document = models.ForeignKey(
+        to=LocalDocument, on_delete=models.CASCADE, verbose_name=_("Document")
+    )
+    term = models.CharField(verbose_name=_("Term"), max_length=50, db_index=True)
+    count = models.IntegerField(verbose_name=_("Count"), default=0)
+
+    class Meta:
+        verbose_name = _("Local search term")
+        verbose_name_plural = _("Local search terms")
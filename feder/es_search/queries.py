@@ -1,3 +1,4 @@
+from elasticsearch.helpers import bulk
 from elasticsearch_dsl.query import MoreLikeThis, MultiMatch, Q
 
 from .documents import LetterDocument
@@ -20,6 +21,43 @@ def delete_document(letter_id):
     LetterDocument.search().query(Q("match", letter_id=letter_id)).delete()
 
 
+def delete_documents(letter_ids):
+    ids = [str(x) for x in letter_ids]
+    LetterDocument.search().query(Q("terms", letter_id=ids)).delete()
+
+
+def iter_document_letter_ids():
+    for hit in LetterDocument.search().source(["letter_id"]).scan():
+        yield int(hit.letter_id)
+
+
+def filter_document_letter_ids(letter_ids):
+    ids = [str(x) for x in letter_ids]
+    search = LetterDocument.search().query(Q("terms", letter_id=ids))
+    return {int(hit.letter_id) for hit in search.source(["letter_id"]).scan()}
+
+
+def delete_stale_documents(letter_ids):
+    """
+    Delete documents of given letters which are not stored under letter_id
+    as a document id, eg. indexed before documents were keyed by letter.
+    """
+    ids = [str(x) for x in letter_ids]
+    q = Q("terms", letter_id=ids) & ~Q("ids", values=ids)
+    LetterDocument.search().query(q).delete()
+
+
+def bulk_save_documents(docs):
+    """
+    Save documents in a single bulk request. Documents with existing id are
+    replaced, so the operation is an upsert when id is set to letter_id.
+    Returns count of successfully saved documents.
+    """
+    actions = (doc.to_dict(include_meta=True) for doc in docs)
+    success, _ = bulk(LetterDocument._get_connection(), actions, stats_only=True)
+    return success
+
+
 def search_keywords(query):
     q = MultiMatch(query=query, fields=["title", "body", "content"])
     return LetterDocument.search().query(q).execute()
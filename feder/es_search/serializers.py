@@ -1,53 +1,143 @@
+import hashlib
 import logging
 import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 
 from requests.exceptions import ConnectionError
 from tika import parser
 
 from .documents import LetterDocument
-from .settings import APACHE_TIKA_URL
+from .models import ExtractedText
+from .settings import (
+    APACHE_TIKA_MAX_IN_FLIGHT,
+    APACHE_TIKA_MAX_WORKERS,
+    APACHE_TIKA_URL,
+)
 
 MAX_RETRIES = 5
 WAIT_TIME = 30
+HASH_CHUNK_SIZE = 64 * 1024
 
 logger = logging.getLogger(__name__)
 
 
-def letter_serialize(letter):
+def get_content_hash(field_file):
+    digest = hashlib.sha256()
+    with field_file.storage.open(field_file.name, "rb") as fp:
+        for chunk in iter(lambda: fp.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def extract_text(field_file):
+    """
+    Extract text of file using Apache Tika.
+    Returns None if text is not extracted, eg. Apache Tika is unreachable
+    or fails, so the result is not cached.
+    """
+    for i in range(MAX_RETRIES):
+        try:
+            with field_file.storage.open(field_file.name, "rb") as fp:
+                # tika reads only instances of io.IOBase, not Django File
+                result = parser.from_file(getattr(fp, "file", fp), APACHE_TIKA_URL)
+            if result.get("status") != 200:
+                logger.error(
+                    f"Error: status {result.get('status')} of Apache Tika. "
+                    f"Skipping file {field_file.name}"
+                )
+                return None
+            return result["content"] or ""
+        except ConnectionError as e:
+            logger.error(f"Error: {e}")
+            if i == MAX_RETRIES - 1:
+                logger.error(f"Max retries exceeded. Skipping file {field_file.name}")
+                return None
+            logger.info(f"Retrying in {WAIT_TIME} seconds...")
+            time.sleep(WAIT_TIME)
+        except Exception as e:
+            logger.error(f"Error: {e}, ")
+            logger.error(f"Skipping file {field_file.name}")
+            return None
+
+
+def extract_concurrently(files):
+    """
+    Extract text of files given as mapping of content hash to file.
+    Keeps at most APACHE_TIKA_MAX_IN_FLIGHT files submitted to the pool.
+    """
+    results = {}
+    with ThreadPoolExecutor(max_workers=APACHE_TIKA_MAX_WORKERS) as executor:
+        in_flight = {}
+        for content_hash, field_file in files.items():
+            if len(in_flight) >= APACHE_TIKA_MAX_IN_FLIGHT:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    results[in_flight.pop(future)] = future.result()
+            in_flight[executor.submit(extract_text, field_file)] = content_hash
+        for future, content_hash in in_flight.items():
+            results[content_hash] = future.result()
+    return results
+
+
+def extract_attachments_text(attachments):
+    """
+    Returns mapping of attachment pk to its text.
+    Text is cached by content hash, so the same bytes are sent
+    to Apache Tika only once.
+    """
+    hashes = {}
+    for attachment in attachments:
+        if not attachment.attachment:
+            continue
+        try:
+            hashes[attachment.pk] = get_content_hash(attachment.attachment)
+        except OSError as e:
+            logger.error(f"Error: {e}")
+            logger.error(f"Skipping attachment {attachment.pk}")
+    texts = dict(
+        ExtractedText.objects.filter(content_hash__in=set(hashes.values())).values_list(
+            "content_hash", "content"
+        )
+    )
+    pending = {}
+    for attachment in attachments:
+        content_hash = hashes.get(attachment.pk)
+        if content_hash and content_hash not in texts:
+            pending.setdefault(content_hash, attachment.attachment)
+    extracted = {
+        content_hash: text
+        for content_hash, text in extract_concurrently(pending).items()
+        if text is not None
+    }
+    ExtractedText.objects.bulk_create(
+        [
+            ExtractedText(content_hash=content_hash, content=text)
+            for content_hash, text in extracted.items()
+        ],
+        ignore_conflicts=True,
+    )
+    texts.update(extracted)
+    return {pk: texts.get(content_hash, "") for pk, content_hash in hashes.items()}
+
+
+def letter_serialize(letter, texts=None):
+    attachments = letter.attachment_set.all()
+    if texts is None:
+        texts = extract_attachments_text(attachments)
     doc = LetterDocument()
+    doc.meta.id = letter.pk
     doc.title = letter.title
     doc.body = letter.body
     doc.letter_id = letter.pk
-    for attachment in letter.attachment_set.all():
-        for i in range(MAX_RETRIES):
-            try:
-                text = parser.from_file(
-                    attachment.attachment.file.file, APACHE_TIKA_URL
-                )["content"]
-                break
-            except ConnectionError as e:
-                logger.error(f"Error: {e}")
-                if i == MAX_RETRIES - 1:
-                    logger.error(
-                        f"Max retries exceeded. Skipping attachment {attachment.pk}"
-                    )
-                    text = ""
-                    break
-                logger.info(f"Retrying in {WAIT_TIME} seconds...")
-                time.sleep(WAIT_TIME)
-            except ValueError as e:
-                logger.error(f"Error: {e}")
-                logger.error(f"Skipping attachment {attachment.pk}")
-                text = ""
-                break
-            except Exception as e:
-                logger.error(f"Error: {e}, ")
-                logger.error(f"Skipping attachment {attachment.pk}")
-                text = ""
-                break
+    for attachment in attachments:
+        text = texts.get(attachment.pk)
         if text:
             doc.content.append(text.strip())
-    # print("title", doc.title)
-    # print("body", doc.body)
-    # print("content", doc.content)
     return doc
+
+
+def letters_serialize(letters):
+    letters = list(letters)
+    attachments = [x for letter in letters for x in letter.attachment_set.all()]
+    texts = extract_attachments_text(attachments)
+    return [letter_serialize(letter, texts) for letter in letters]
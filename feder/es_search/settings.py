@@ -4,6 +4,13 @@ from django.conf import settings
 
 ELASTICSEARCH_URL = settings.ELASTICSEARCH_URL
 APACHE_TIKA_URL = settings.APACHE_TIKA_URL
+APACHE_TIKA_MAX_WORKERS = getattr(settings, "APACHE_TIKA_MAX_WORKERS", 4)
+APACHE_TIKA_MAX_IN_FLIGHT = getattr(settings, "APACHE_TIKA_MAX_IN_FLIGHT", 8)
+ELASTICSEARCH_BULK_CHUNK_SIZE = getattr(settings, "ELASTICSEARCH_BULK_CHUNK_SIZE", 200)
+ELASTICSEARCH_SIMILAR_COUNT = getattr(settings, "ELASTICSEARCH_SIMILAR_COUNT", 10)
+ELASTICSEARCH_SIMILAR_CACHE_TIMEOUT = getattr(
+    settings, "ELASTICSEARCH_SIMILAR_CACHE_TIMEOUT", 60 * 60 * 24
+)
 
 os.environ["TIKA_CLIENT_ONLY"] = "true"
 os.environ["TIKA_SERVER_ENDPOINT"] = settings.APACHE_TIKA_URL
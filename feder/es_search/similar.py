@@ -0,0 +1,34 @@
+from django.core.cache import cache
+
+from .engine import get_engine
+from .settings import ELASTICSEARCH_SIMILAR_CACHE_TIMEOUT, ELASTICSEARCH_SIMILAR_COUNT
+
+SIMILAR_CACHE_KEY = "es_search:similar:{}"
+
+
+def cache_similar_letter_ids(letter_id):
+    engine = get_engine()
+    ids = (
+        engine.similar_letter_ids(letter_id, ELASTICSEARCH_SIMILAR_COUNT)
+        if engine
+        else []
+    )
+    cache.set(
+        SIMILAR_CACHE_KEY.format(letter_id), ids, ELASTICSEARCH_SIMILAR_CACHE_TIMEOUT
+    )
+    return ids
+
+
+def get_similar_letter_ids(letter_id):
+    """
+    Returns ids of letters similar to the given one.
+    Result is cached until the letter is reindexed or cache timeout passed.
+    """
+    ids = cache.get(SIMILAR_CACHE_KEY.format(letter_id))
+    if ids is None:
+        ids = cache_similar_letter_ids(letter_id)
+    return ids
+
+
+def invalidate_similar_letter_ids(letter_ids):
+    cache.delete_many([SIMILAR_CACHE_KEY.format(x) for x in letter_ids])
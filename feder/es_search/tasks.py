@@ -1,14 +1,78 @@
+import threading
+from functools import partial
+
 from background_task import background
+from django.db import transaction
+
+from .engine import get_engine
+from .similar import cache_similar_letter_ids, invalidate_similar_letter_ids
 
-from .queries import delete_document
-from .serializers import letter_serialize
+_pending = threading.local()
 
 
 @background
 def index_letter(letter_pks):
     from ..letters.models import Letter
 
+    engine = get_engine()
     for letter in Letter.objects.filter(pk__in=letter_pks).exclude_spam().all():
-        delete_document(letter.pk)
-        doc = letter_serialize(letter)
-        assert doc.save() == "created"
+        engine.index_letters([letter])
+    invalidate_similar_letter_ids(letter_pks)
+
+
+@background
+def bulk_index_letter(letter_pks):
+    from ..letters.models import Letter
+
+    letters = (
+        Letter.objects.filter(pk__in=letter_pks)
+        .exclude_spam()
+        .prefetch_related("attachment_set")
+        .all()
+    )
+    indexed = get_engine().index_letters(letters)
+    invalidate_similar_letter_ids(letter_pks)
+    return indexed
+
+
+@background
+def precompute_similar_letters(monitoring_pk):
+    from ..letters.models import Letter
+
+    letter_pks = (
+        Letter.objects.filter(record__case__monitoring=monitoring_pk)
+        .exclude_spam()
+        .values_list("pk", flat=True)
+    )
+    for letter_pk in letter_pks.iterator():
+        cache_similar_letter_ids(letter_pk)
+
+
+def schedule_index_letter(letter_pk):
+    """
+    Schedule indexing of letter after commit of current transaction.
+    Letters saved many times within a transaction are indexed once
+    and all of them by a single background task.
+    """
+    letter_pks = getattr(_pending, "letter_pks", None)
+    if letter_pks is None or not is_flush_pending(letter_pks):
+        # callback and its ids are discarded on rollback of transaction
+        letter_pks = _pending.letter_pks = {letter_pk}
+        transaction.on_commit(partial(flush_index_letter, letter_pks))
+    else:
+        letter_pks.add(letter_pk)
+
+
+def is_flush_pending(letter_pks):
+    return any(
+        isinstance(func, partial)
+        and func.func is flush_index_letter
+        and func.args[0] is letter_pks
+        for _, func in transaction.get_connection().run_on_commit
+    )
+
+
+def flush_index_letter(letter_pks):
+    if getattr(_pending, "letter_pks", None) is letter_pks:
+        _pending.letter_pks = None
+    bulk_index_letter(sorted(letter_pks))
@@ -1,19 +1,28 @@
+import json
 import time
 from collections.abc import Iterable
 from io import StringIO
 from time import sleep
+from unittest import mock
 
+from background_task.models import Task
 from django.core.management import call_command
-from django.test import TestCase
+from django.db import DatabaseError, transaction
+from django.test import TestCase, override_settings
 from elasticsearch.exceptions import ConflictError, ElasticsearchException
 from elasticsearch_dsl import Index, Search
 from elasticsearch_dsl.connections import connections, get_connection
 from elasticsearch_dsl.query import Match, MoreLikeThis, MultiMatch, Q
 
 from ..letters.factories import AttachmentFactory, IncomingLetterFactory
+from ..letters.models import Letter
 from .documents import LetterDocument
+from .engine.local import LocalEngine
+from .models import ExtractedText, IndexCheckpoint
 from .queries import delete_document, find_document, more_like_this, search_keywords
-from .tasks import index_letter
+from .serializers import extract_attachments_text
+from .similar import get_similar_letter_ids
+from .tasks import bulk_index_letter, index_letter, schedule_index_letter
 
 
 class ESMixin:
@@ -89,6 +98,17 @@ class IndexLetterTestCase(ESMixin, TestCase):
 
         self.assertMatch(result, letter)
 
+    def test_bulk_index_upsert_by_letter_id(self):
+        letter = IncomingLetterFactory(body=self.text)
+        self.assertEqual(bulk_index_letter.now([letter.pk]), 1)
+        self.assertEqual(bulk_index_letter.now([letter.pk]), 1)
+        self._refresh_all()
+
+        result = search_keywords("dolor")
+
+        self.assertMatch(result, letter)
+        self.assertEqual(result[0].meta.id, str(letter.pk))
+
     def test_search_more_like_this_by_title(self):
         letter_a = IncomingLetterFactory(title=self.text)
         letter_b = IncomingLetterFactory(title=self.text)
@@ -99,6 +119,21 @@ class IndexLetterTestCase(ESMixin, TestCase):
 
         self.assertMatch(result, letter_b)
 
+    def test_similar_letter_ids_cached_until_reindex(self):
+        letter_a = IncomingLetterFactory(title=self.text)
+        letter_b = IncomingLetterFactory(title=self.text)
+        self.index([letter_a, letter_b])
+        self.assertEqual(get_similar_letter_ids(letter_a.pk), [letter_b.pk])
+
+        letter_c = IncomingLetterFactory(title=self.text)
+        self.index(letter_c)
+        self.assertEqual(get_similar_letter_ids(letter_a.pk), [letter_b.pk])
+
+        self.index(letter_a)
+        self.assertCountEqual(
+            get_similar_letter_ids(letter_a.pk), [letter_b.pk, letter_c.pk]
+        )
+
     def test_search_more_like_this_by_attachment(self):
         letter_a = AttachmentFactory(attachment__text=self.text).letter
         letter_b = AttachmentFactory(
@@ -136,3 +171,203 @@ class IndexCommandTestCase(ESMixin, TestCase):
         self.index([])
         result = search_keywords(letter_valid.title)
         self.assertMatch(result, letter_valid)
+
+    def test_bulk_command(self):
+        letters = IncomingLetterFactory.create_batch(size=3, title="my-text")
+        stdout = StringIO()
+        call_command(
+            "es_index", "--skip-queue", "--bulk", "--chunk-size=2", stdout=stdout
+        )
+        self.index([])
+        result = search_keywords("my-text")
+
+        self.assertMatch(result, letters)
+        self.assertIn("Letters: 3; indexed: 3;", stdout.getvalue())
+
+    def test_incremental_command(self):
+        letter = IncomingLetterFactory(title="my-text")
+        letter_spam = IncomingLetterFactory(title="my-text")
+        call_command("es_index", "--skip-queue", "--incremental", stdout=StringIO())
+        self.index([])
+        self.assertMatch(search_keywords("my-text"), [letter, letter_spam])
+
+        Letter.objects.filter(pk=letter_spam.pk).update(is_spam=Letter.SPAM.spam)
+        letter_new = IncomingLetterFactory(title="my-text")
+        delete_document(letter_new.pk)
+        stdout = StringIO()
+        call_command("es_index", "--skip-queue", "--incremental", stdout=stdout)
+        self.index([])
+
+        self.assertMatch(search_keywords("my-text"), [letter, letter_new])
+        self.assertIn("Letters: 1; indexed: 1;", stdout.getvalue())
+
+    def test_similar_command(self):
+        letter_a = IncomingLetterFactory(title="my-text")
+        letter_b = IncomingLetterFactory(title="my-text")
+        self.index([letter_a, letter_b])
+        with mock.patch("feder.es_search.engine.elastic.more_like_this") as mlt:
+            mlt.return_value = []
+            call_command(
+                "es_similar",
+                letter_a.record.case.monitoring.pk,
+                "--skip-queue",
+                stdout=StringIO(),
+            )
+            get_similar_letter_ids(letter_a.pk)
+            self.assertEqual(mlt.call_count, 1)
+
+
+class ExtractAttachmentsTextTestCase(TestCase):
+    text = "Lorem ipsum dolor sit amet consectetur adipiscing elit"
+
+    @mock.patch("tika.tika.callServer")
+    def test_send_content_of_stored_file(self, call_server):
+        def tika_response(verb, endpoint, service, data, *args, **kwargs):
+            self.assertEqual(data.read(), b"x")
+            return 200, json.dumps([{"X-TIKA:content": self.text}])
+
+        call_server.side_effect = tika_response
+        attachment = AttachmentFactory(attachment__text="x")
+
+        texts = extract_attachments_text([attachment])
+
+        self.assertEqual(call_server.call_count, 1)
+        self.assertEqual(texts, {attachment.pk: self.text})
+        self.assertEqual(ExtractedText.objects.get().content, self.text)
+
+    @mock.patch("feder.es_search.serializers.parser.from_file")
+    def test_skip_cache_on_error(self, from_file):
+        from_file.side_effect = ValueError("Unsupported file")
+        attachment = AttachmentFactory(attachment__text="x")
+
+        texts = extract_attachments_text([attachment])
+
+        self.assertEqual(texts, {attachment.pk: ""})
+        self.assertFalse(ExtractedText.objects.exists())
+
+    @mock.patch("feder.es_search.serializers.parser.from_file")
+    def test_skip_cache_on_error_status(self, from_file):
+        from_file.return_value = {"status": 500, "content": None}
+        attachment = AttachmentFactory(attachment__text="x")
+
+        extract_attachments_text([attachment])
+
+        self.assertFalse(ExtractedText.objects.exists())
+
+    @mock.patch("feder.es_search.serializers.parser.from_file")
+    def test_extract_once_per_content(self, from_file):
+        from_file.return_value = {"status": 200, "content": self.text}
+        attachments = AttachmentFactory.create_batch(size=3, attachment__text="x")
+
+        texts = extract_attachments_text(attachments)
+
+        self.assertEqual(from_file.call_count, 1)
+        self.assertEqual(texts, {x.pk: self.text for x in attachments})
+        self.assertEqual(ExtractedText.objects.count(), 1)
+
+    @mock.patch("feder.es_search.serializers.parser.from_file")
+    def test_use_cache_on_reindex(self, from_file):
+        from_file.return_value = {"status": 200, "content": self.text}
+        attachment = AttachmentFactory(attachment__text="x")
+        extract_attachments_text([attachment])
+
+        texts = extract_attachments_text([attachment])
+
+        self.assertEqual(from_file.call_count, 1)
+        self.assertEqual(texts, {attachment.pk: self.text})
+
+
+class ScheduleIndexLetterTestCase(TestCase):
+    @mock.patch("feder.es_search.tasks.bulk_index_letter")
+    def test_coalesce_letters_of_transaction(self, bulk_index_letter):
+        with self.captureOnCommitCallbacks(execute=True):
+            schedule_index_letter(2)
+            schedule_index_letter(1)
+            schedule_index_letter(2)
+
+        bulk_index_letter.assert_called_once_with([1, 2])
+
+    @mock.patch("feder.es_search.tasks.bulk_index_letter")
+    def test_discard_letters_of_rolled_back_transaction(self, bulk_index_letter):
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    schedule_index_letter(1)
+                    raise DatabaseError
+            except DatabaseError:
+                pass
+            schedule_index_letter(2)
+
+        bulk_index_letter.assert_called_once_with([2])
+
+
+class LocalEngineTestCase(TestCase):
+    text = "Lorem ipsum dolor sit amet consectetur adipiscing elit"
+
+    def setUp(self):
+        self.engine = LocalEngine()
+
+    def test_search_keywords(self):
+        letter = IncomingLetterFactory(title="Lorem ipsum", body=self.text)
+        IncomingLetterFactory(title="Other", body="Other content")
+        self.engine.index_letters([letter])
+
+        self.assertEqual(self.engine.search_keywords("DOLOR amet"), [letter.pk])
+
+    def test_rank_by_term_frequency(self):
+        letter_a = IncomingLetterFactory(body="dolor sit amet")
+        letter_b = IncomingLetterFactory(body="dolor dolor dolor sit amet")
+        self.engine.index_letters([letter_a, letter_b])
+
+        self.assertEqual(
+            self.engine.search_keywords("dolor"), [letter_b.pk, letter_a.pk]
+        )
+
+    def test_similar_letter_ids(self):
+        letter_a = IncomingLetterFactory(title=self.text)
+        letter_b = IncomingLetterFactory(title=self.text)
+        letter_c = IncomingLetterFactory(title="Other", body="Other content")
+        self.engine.index_letters([letter_a, letter_b, letter_c])
+
+        self.assertEqual(self.engine.similar_letter_ids(letter_a.pk), [letter_b.pk])
+
+    def test_reindex_and_delete(self):
+        letter = IncomingLetterFactory(body=self.text)
+        self.engine.index_letters([letter])
+        self.engine.index_letters([letter])
+        self.assertEqual(list(self.engine.iter_letter_ids()), [letter.pk])
+
+        self.engine.delete_letters([letter.pk])
+
+        self.assertEqual(self.engine.search_keywords("dolor"), [])
+
+
+@override_settings(ELASTICSEARCH_URL=None, LOCAL_SEARCH_ENABLED=True)
+class LocalIndexCommandTestCase(TestCase):
+    def test_incremental_command(self):
+        letter = IncomingLetterFactory()
+        letter_spam = IncomingLetterFactory()
+        call_command("es_index", "--skip-queue", "--incremental", stdout=StringIO())
+        Letter.objects.filter(pk=letter_spam.pk).update(is_spam=Letter.SPAM.spam)
+        letter_new = IncomingLetterFactory()
+        stdout = StringIO()
+
+        with mock.patch(
+            "feder.es_search.management.commands.es_index.INCREMENTAL_CHUNK_SIZE", 1
+        ):
+            call_command("es_index", "--skip-queue", "--incremental", stdout=stdout)
+
+        self.assertCountEqual(
+            LocalEngine().iter_letter_ids(), [letter.pk, letter_new.pk]
+        )
+        self.assertIn("Removed documents of 1 letters", stdout.getvalue())
+        self.assertIn("Letters: 1; indexed: 1;", stdout.getvalue())
+
+    def test_incremental_command_advance_checkpoint_when_queued(self):
+        letter = IncomingLetterFactory()
+
+        call_command("es_index", "--incremental", stdout=StringIO())
+
+        self.assertIsNotNone(IndexCheckpoint.objects.for_monitorings().letter_modified)
+        task = Task.objects.get(task_name="feder.es_search.tasks.index_letter")
+        self.assertEqual(json.loads(task.task_params), [[[letter.pk]], {}])
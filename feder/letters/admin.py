@@ -3,7 +3,20 @@ from django.db.models import Q
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
-from .models import Attachment, Letter, LetterEmailDomain, ReputableLetterEmailTLD
+from feder.cases.models import CaseStats
+
+from .models import (
+    Attachment,
+    IncomingEmail,
+    Letter,
+    LetterEmailDomain,
+    ReputableLetterEmailTLD,
+)
+
+
+def refresh_letters_case_stats(queryset):
+    # counts of spam letters of cases are not updated by bulk update
+    CaseStats.objects.refresh(queryset.values_list("record__case_id", flat=True))
 
 
 class LetterDirectionListFilter(admin.SimpleListFilter):
@@ -134,18 +147,22 @@ class LetterAdmin(admin.ModelAdmin):
             mark_spam_by=request.user,
             mark_spam_at=timezone.now(),
         )
+        refresh_letters_case_stats(queryset)
 
     @admin.action(description=_("Mark selected letters as Non Spam"))
     def mark_non_spam(modeladmin, request, queryset):
         queryset.update(is_spam=Letter.SPAM.non_spam)
+        refresh_letters_case_stats(queryset)
 
     @admin.action(description=_("Mark selected letters as Spam Unknown"))
     def mark_spam_unknown(modeladmin, request, queryset):
         queryset.update(is_spam=Letter.SPAM.unknown)
+        refresh_letters_case_stats(queryset)
 
     @admin.action(description=_("Mark selected letters as Probable Spam"))
     def mark_probable_spam(modeladmin, request, queryset):
         queryset.update(is_spam=Letter.SPAM.probable_spam)
+        refresh_letters_case_stats(queryset)
 
     # def get_queryset(self, *args, **kwargs):
     #     qs = super().get_queryset(*args, **kwargs)
@@ -209,3 +226,24 @@ class ReputableLetterEmailTLDAdmin(admin.ModelAdmin):
     list_display = ("id", "name")
     search_fields = ("name",)
     ordering = ("name",)
+
+
+@admin.register(IncomingEmail)
+class IncomingEmailAdmin(admin.ModelAdmin):
+    """
+    Admin View for IncomingEmail
+    """
+
+    list_display = (
+        "id",
+        "message_id_header",
+        "email_to",
+        "status",
+        "letter",
+        "created",
+        "modified",
+    )
+    list_filter = ("status",)
+    search_fields = ("message_id_header", "email_to")
+    raw_id_fields = ("letter",)
+    readonly_fields = ("manifest", "error")
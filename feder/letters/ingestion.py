@@ -0,0 +1,167 @@
+import logging
+
+from django.db import IntegrityError, transaction
+
+from feder.cases.models import Case
+from feder.records.models import Record
+
+from .models import (
+    Attachment,
+    IncomingEmail,
+    IncomingEmailAttachment,
+    Letter,
+    LetterEmailDomain,
+)
+from .reputation import domain_reputation
+from .utils import get_dedup_key
+
+logger = logging.getLogger(__name__)
+
+
+def get_case(to_plus):
+    return Case.objects.select_related("institution").by_addresses(to_plus).first()
+
+
+def get_message_type(headers):
+    auto_reply = headers.get("auto_reply_type")
+    if auto_reply is None:
+        return Letter.MESSAGE_TYPES.regular
+    auto_reply = auto_reply.replace("-", "_")
+    return getattr(Letter.MESSAGE_TYPES, auto_reply, Letter.MESSAGE_TYPES.unknown)
+
+
+def get_letter(headers, text, eml_file):
+    """
+    Returns letter described by the webhook manifest and flag whether
+    it was created or already received before.
+    """
+    case = get_case(headers["to+"])
+    from_email = headers["from"][0] if headers["from"][0] else "unknown@domain.gov"
+    email_from = headers["from"][0] if headers["from"][0] else None
+    email_to = headers["to"][0] if headers["from"][0] else None
+    message_type = get_message_type(headers)
+    dedup_key = get_dedup_key(
+        headers["message_id"], email_from, email_to, headers["subject"]
+    )
+
+    letter = Letter.objects.filter(dedup_key=dedup_key).first()
+    if letter:
+        return get_existing_letter(letter)
+
+    try:
+        # savepoint keeps the transaction usable if concurrent redelivery won
+        with transaction.atomic():
+            letter = Letter.objects.create(
+                author_institution=case.institution if case else None,
+                email=from_email,
+                email_from=email_from,
+                email_to=email_to,
+                message_id_header=headers["message_id"],
+                dedup_key=dedup_key,
+                record=Record.objects.create(case=case),
+                message_type=message_type,
+                title=headers["subject"],
+                body=text["content"],
+                html_body=text.get("html_content", ""),
+                quote=text["quote"],
+                html_quote=text.get("html_quote", ""),
+                eml=eml_file,
+                is_draft=False,
+            )
+    except IntegrityError:
+        # locking read sees the row committed by the concurrent delivery even
+        # under REPEATABLE READ snapshot of MySQL
+        return get_existing_letter(
+            Letter.objects.select_for_update().get(dedup_key=dedup_key)
+        )
+    letter.spam_check()
+    logger.info(f"Request processed, letter added: {letter.pk}")
+    return letter, True
+
+
+def get_existing_letter(letter):
+    letter.spam_check()
+    logger.info(f"Request skipped, letter exists: {letter.pk}")
+    return letter, False
+
+
+def receive_letter(manifest, eml_file, attachments):
+    """
+    Creates letter with attachments from manifest of imap-to-webhook.
+    Redelivered messages return the existing letter and are not stored again.
+    """
+    logger.info(f'Letter to add: {manifest["headers"]}')
+    letter, created = get_letter(
+        headers=manifest["headers"], text=manifest["text"], eml_file=eml_file
+    )
+    if created:
+        LetterEmailDomain.register_letter_email_domains(letter=letter)
+        Attachment.objects.bulk_create(
+            # uploaded file is copied to storage in chunks on save
+            Attachment(letter=letter, attachment=attachment)
+            for attachment in attachments
+        )
+    return letter, created
+
+
+def process_incoming_email(incoming_email):
+    """
+    Creates letter of spooled email. Files of the spool are taken over by the
+    letter or removed if the letter was received before.
+    """
+    attachments = list(incoming_email.attachments.all())
+    letter, created = receive_letter(
+        manifest=incoming_email.manifest,
+        eml_file=incoming_email.eml.name,
+        attachments=[x.attachment.name for x in attachments],
+    )
+    if created:
+        # references are cleared by update, so django-cleanup keeps the files
+        IncomingEmailAttachment.objects.filter(incoming_email=incoming_email).update(
+            attachment=""
+        )
+    else:
+        if incoming_email.eml:
+            incoming_email.eml.delete(save=False)
+        for attachment in attachments:
+            attachment.attachment.delete(save=False)
+    IncomingEmailAttachment.objects.filter(incoming_email=incoming_email).delete()
+    IncomingEmail.objects.filter(pk=incoming_email.pk).update(
+        status=IncomingEmail.STATUS.processed, letter=letter, eml="", error=""
+    )
+    return letter
+
+
+def process_queued_emails():
+    """
+    Processes spooled emails in order of receiving. Entries locked by
+    another worker are skipped, so several workers can run at once.
+    Returns count of processed emails.
+    """
+    count = 0
+    while True:
+        with transaction.atomic():
+            incoming_email = (
+                IncomingEmail.objects.queued()
+                .select_for_update(skip_locked=True)
+                .order_by("pk")
+                .first()
+            )
+            if incoming_email is None:
+                break
+            try:
+                with transaction.atomic():
+                    process_incoming_email(incoming_email)
+            except Exception as e:
+                logger.exception(f"Incoming email {incoming_email.pk} failed")
+                IncomingEmail.objects.filter(pk=incoming_email.pk).update(
+                    status=IncomingEmail.STATUS.failed, error=str(e)
+                )
+        count += 1
+    domain_reputation.flush()
+    stats = IncomingEmail.objects.stats()
+    logger.info(
+        f"Incoming emails processed: {count}; "
+        f"queue depth: {stats['queue_depth']}; lag: {stats['lag_seconds']:.0f}s"
+    )
+    return count
@@ -0,0 +1,88 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.template.defaultfilters import filesizeformat
+
+from feder.letters.models import Letter
+from feder.letters.utils import html_to_text, text_email_wrapper
+
+
+def measure(func, documents, repeat):
+    """
+    Returns the best time of `repeat` runs of func over all documents.
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for document in documents:
+            func(document)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark conversion of HTML of stored letters to text "
+        "and quoting of their text."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--limit",
+            type=int,
+            default=500,
+            help="Count of the latest letters with HTML used as corpus",
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=3,
+            help="Count of runs, the best time is reported",
+        )
+        parser.add_argument(
+            "--quote-size",
+            type=int,
+            default=1024,
+            help="Size in KB of long quote built from text of letters",
+        )
+
+    def handle(self, *args, **options):
+        documents = [
+            html
+            for letter in Letter.objects.exclude(html_body="")
+            .order_by("-pk")
+            .values_list("html_body", "html_quote")[: options["limit"]]
+            for html in letter
+            if html
+        ]
+        if not documents:
+            raise CommandError("No letters with HTML to benchmark.")
+        self.repeat = options["repeat"]
+        self.stdout.write(
+            f"Corpus: {len(documents)} documents; "
+            f"{filesizeformat(self.get_size(documents))}\n"
+        )
+        self.report("html_to_text", html_to_text, documents)
+        # single long document, eg. reply with big quoted thread
+        self.report("html_to_text, joined corpus", html_to_text, ["".join(documents)])
+        texts = [html_to_text(html) for html in documents]
+        self.report("text_email_wrapper", text_email_wrapper, texts)
+        text = "\n".join(texts)
+        quote = text * (options["quote_size"] * 1024 // max(len(text), 1) + 1)
+        self.report(
+            "text_email_wrapper, long quote",
+            text_email_wrapper,
+            [quote[: options["quote_size"] * 1024]],
+        )
+
+    def get_size(self, documents):
+        return sum(len(document.encode("utf-8")) for document in documents)
+
+    def report(self, label, func, documents):
+        elapsed = max(measure(func, documents, self.repeat), 0.000001)
+        size = self.get_size(documents)
+        self.stdout.write(
+            f"{label}: documents: {len(documents)}; time: {elapsed:.3f}s; "
+            f"rate: {size / elapsed / 1024 / 1024:.2f} MB/s\n"
+        )
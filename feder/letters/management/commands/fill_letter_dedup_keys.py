@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand
+
+from feder.letters.models import Letter
+from feder.letters.utils import get_dedup_key
+from feder.main.utils import chunked
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill deduplication keys of received letters. "
+        "Only the oldest of duplicated letters gets the key."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=1000,
+            help="Count of letters updated in a single query",
+        )
+
+    def handle(self, *args, **options):
+        letters = (
+            Letter.objects.is_incoming()
+            .filter(dedup_key__isnull=True)
+            .only("pk", "message_id_header", "email_from", "email_to", "title")
+            .order_by("pk")
+        )
+        filled = 0
+        skipped = 0
+        for chunk in chunked(letters.iterator(), options["chunk_size"]):
+            for letter in chunk:
+                letter.dedup_key = get_dedup_key(
+                    letter.message_id_header,
+                    letter.email_from,
+                    letter.email_to,
+                    letter.title,
+                )
+            taken = set(
+                Letter.objects.filter(
+                    dedup_key__in={letter.dedup_key for letter in chunk}
+                ).values_list("dedup_key", flat=True)
+            )
+            to_update = []
+            for letter in chunk:
+                if letter.dedup_key in taken:
+                    skipped += 1
+                    continue
+                taken.add(letter.dedup_key)
+                to_update.append(letter)
+            Letter.objects.bulk_update(to_update, ["dedup_key"])
+            filled += len(to_update)
+        self.stdout.write(f"Filled: {filled}; duplicates skipped: {skipped}\n")
@@ -6,6 +6,7 @@ from django.core.files.storage import default_storage
 from django.core.management.base import BaseCommand
 
 from feder.letters.models import Letter, LetterEmailDomain
+from feder.letters.reputation import domain_reputation
 from feder.main.utils import get_clean_email
 
 
@@ -57,5 +58,6 @@ class Command(BaseCommand):
                 f' msg Id: {msg["Message-ID"]}, is_outgoing: {is_outgoing}'
             )
             LetterEmailDomain.register_letter_email_domains(letter=letter)
+        domain_reputation.flush()
         end_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         print(f"Completed {end_time}")
@@ -1,30 +1,65 @@
 from django.core.management.base import BaseCommand
+from django.utils.dateparse import parse_date
 
 from feder.letters.models import Letter
+from feder.letters.spam import get_pipeline
+from feder.letters.spam.stages import TokenModelStage, update_token_model
 
 
 class Command(BaseCommand):
-    help = "Remove duplicated incoming letters based on 'Message-ID'."
+    help = "Mark incoming letters scored as spam by pipeline as probable spam."
 
-    # def add_arguments(self, parser):
-    #     parser.add_argument(
-    #         "--monitoring-pk", help="PK of monitoring which receive mail",
-    #          required=True
-    #     )
-    #     parser.add_argument(
-    #         "--delete", help="Confirm deletion of email", action="store_true"
-    #     )
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--monitoring", type=int, help="PK of monitoring which receive mail"
+        )
+        parser.add_argument(
+            "--since",
+            type=parse_date,
+            help="Check only letters received since the date (YYYY-MM-DD)",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=2000,
+            help="Count of letters classified in a single query",
+        )
+        parser.add_argument(
+            "--stage",
+            action="append",
+            help="Name of spam pipeline stage to use, all stages by default",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report count of letters to be marked",
+        )
 
     def handle(self, *args, **options):
-        letter_count = 0
-        spam_count = 0
-        for letter in Letter.objects.is_incoming().all():
-            letter_count += 1
-            print(f"Processing letter: {letter.pk}, ", end="")
-            letter.spam_check()
-            if letter.is_spam == Letter.SPAM.probable_spam:
-                spam_count += 1
-                print("probable spam")
-            else:
-                print("")
-        print(f"letters: {letter_count}; spam: {spam_count}")
+        # letters validated by users are left as they are
+        qs = (
+            Letter.objects.is_incoming()
+            .filter(is_spam=Letter.SPAM.unknown)
+            .only("pk", "title", "body", "email_from", "eml")
+            .order_by("pk")
+        )
+        if options["monitoring"]:
+            qs = qs.filter(record__case__monitoring=options["monitoring"])
+        if options["since"]:
+            qs = qs.filter(created__date__gte=options["since"])
+        pipeline = get_pipeline(options["stage"])
+        if any(isinstance(stage, TokenModelStage) for stage in pipeline.stages):
+            model = update_token_model()
+            self.stdout.write(
+                f"Token model trained on {model['spam']['docs']} spam and "
+                f"{model['ham']['docs']} non-spam letters\n"
+            )
+        letter_count, spam_count = pipeline.reclassify(
+            qs, chunk_size=options["chunk_size"], dry_run=options["dry_run"]
+        )
+        prefix = "[dry run] " if options["dry_run"] else ""
+        stages = ", ".join(stage.name for stage in pipeline.stages)
+        self.stdout.write(
+            f"{prefix}letters: {letter_count}; probable spam: {spam_count}; "
+            f"stages: {stages}\n"
+        )
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from feder.letters.ingestion import process_queued_emails
+from feder.letters.models import IncomingEmail
+
+
+class Command(BaseCommand):
+    help = "Create letters of emails spooled by webhook and report the queue."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--stats", action="store_true", help="Only report the queue state"
+        )
+
+    def handle(self, *args, **options):
+        if not options["stats"]:
+            count = process_queued_emails()
+            self.stdout.write(f"Processed: {count}\n")
+        stats = IncomingEmail.objects.stats()
+        self.stdout.write(
+            f"Queue depth: {stats['queue_depth']}; "
+            f"lag: {stats['lag_seconds']:.0f}s\n"
+        )
@@ -0,0 +1,126 @@
+# Generated by Django 3.2.20 on 2026-10-17 23:25
+
+import django.db.models.deletion
+import django_extensions.db.fields
+import jsonfield.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("letters", "0035_alter_reputableletteremailtld_name"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="IncomingEmail",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "created",
+                    django_extensions.db.fields.CreationDateTimeField(
+                        auto_now_add=True, verbose_name="created"
+                    ),
+                ),
+                (
+                    "modified",
+                    django_extensions.db.fields.ModificationDateTimeField(
+                        auto_now=True, verbose_name="modified"
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("queued", "queued"),
+                            ("processed", "processed"),
+                            ("failed", "failed"),
+                        ],
+                        db_index=True,
+                        default="queued",
+                        max_length=20,
+                        verbose_name="Status",
+                    ),
+                ),
+                (
+                    "message_id_header",
+                    models.CharField(
+                        blank=True,
+                        db_index=True,
+                        max_length=500,
+                        verbose_name='ID of sent email message "Message-ID"',
+                    ),
+                ),
+                (
+                    "email_to",
+                    models.EmailField(
+                        blank=True, max_length=254, null=True, verbose_name="To"
+                    ),
+                ),
+                ("manifest", jsonfield.fields.JSONField(verbose_name="Manifest")),
+                (
+                    "eml",
+                    models.FileField(
+                        blank=True,
+                        null=True,
+                        upload_to="incoming/%Y/%m/%d",
+                        verbose_name="File",
+                    ),
+                ),
+                ("error", models.TextField(blank=True, verbose_name="Error")),
+                (
+                    "letter",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        to="letters.letter",
+                        verbose_name="Letter",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Incoming email",
+                "verbose_name_plural": "Incoming emails",
+                "ordering": ["pk"],
+            },
+        ),
+        migrations.CreateModel(
+            name="IncomingEmailAttachment",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "attachment",
+                    models.FileField(upload_to="letters/%Y/%m/%d", verbose_name="File"),
+                ),
+                (
+                    "incoming_email",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="attachments",
+                        to="letters.incomingemail",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Incoming email attachment",
+                "verbose_name_plural": "Incoming email attachments",
+            },
+        ),
+    ]
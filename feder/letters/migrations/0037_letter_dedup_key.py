@@ -0,0 +1,25 @@
+# Generated by Django 3.2.20 on 2026-10-17 23:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("letters", "0036_incomingemail"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="letter",
+            name="dedup_key",
+            field=models.CharField(
+                blank=True,
+                editable=False,
+                help_text="Hash of Message-ID, addresses and subject of received email",
+                max_length=64,
+                null=True,
+                unique=True,
+                verbose_name="Deduplication key",
+            ),
+        ),
+    ]
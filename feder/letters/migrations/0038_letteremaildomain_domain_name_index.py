@@ -0,0 +1,23 @@
+# Generated by Django 3.2.20 on 2026-10-17 23:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("letters", "0037_letter_dedup_key"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="letteremaildomain",
+            name="domain_name",
+            field=models.CharField(
+                blank=True,
+                db_index=True,
+                max_length=100,
+                null=True,
+                verbose_name="Email address domain",
+            ),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 3.2.20 on 2026-10-17 23:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("letters", "0038_letteremaildomain_domain_name_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="letter",
+            name="generated_from",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="generated_letters",
+                to="letters.letter",
+                verbose_name="Generated from mass draft",
+            ),
+        ),
+    ]
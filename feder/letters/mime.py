@@ -0,0 +1,138 @@
+import base64
+import tempfile
+from email import generator
+from email.mime.base import MIMEBase
+
+from django.conf import settings
+from django.core.files import File
+from django.core.mail import EmailMultiAlternatives
+from django.core.mail.message import SafeMIMEMultipart
+
+# multiple of 57 bytes, so each chunk is encoded into complete base64 lines
+ATTACHMENT_READ_SIZE = 57 * 1024
+EML_MEMORY_SIZE = 1024 * 1024
+
+
+class AttachmentPart(MIMEBase):
+    """
+    MIME part of attachment, which content is encoded in base64 from storage
+    only when the part is written.
+    """
+
+    def __init__(self, field_file):
+        super().__init__("application", "octet-stream")
+        self.field_file = field_file
+        self["Content-Transfer-Encoding"] = "base64"
+
+    def iter_encoded(self):
+        with self.field_file.open("rb") as fp:
+            for chunk in fp.chunks(ATTACHMENT_READ_SIZE):
+                yield base64.encodebytes(chunk).decode("ascii")
+
+    @property
+    def _payload(self):
+        # generators of email package, eg. used on sending by SMTP,
+        # require the whole payload in memory
+        if self._encoded_payload is None:
+            self._encoded_payload = "".join(self.iter_encoded())
+        return self._encoded_payload
+
+    @_payload.setter
+    def _payload(self, value):
+        self._encoded_payload = value
+
+    def is_multipart(self):
+        return False
+
+
+class StreamingGenerator(generator.BytesGenerator):
+    """
+    Writes multipart messages directly to the file, without rendering them
+    in memory first, and encodes attachments chunk by chunk.
+    """
+
+    def _write(self, msg):
+        if isinstance(msg, AttachmentPart):
+            self._write_headers(msg)
+            for lines in msg.iter_encoded():
+                self.write(lines.replace("\n", self._NL))
+            return
+        if not msg.is_multipart() or not isinstance(msg.get_payload(), list):
+            super()._write(msg)
+            return
+        # headers are written before parts, so the boundary can not be
+        # checked against their content, but random one does not occur there
+        if not msg.get_boundary():
+            msg.set_boundary(self._make_boundary())
+        self._write_headers(msg)
+        self._write_parts(msg)
+
+    def _write_parts(self, msg):
+        boundary = msg.get_boundary()
+        if msg.preamble is not None:
+            self._write_lines(msg.preamble)
+            self.write(self._NL)
+        for i, part in enumerate(msg.get_payload()):
+            self.write(("" if i == 0 else self._NL) + "--" + boundary + self._NL)
+            self.clone(self._fp).flatten(part, unixfrom=False, linesep=self._NL)
+        self.write(self._NL + "--" + boundary + "--" + self._NL)
+        if msg.epilogue is not None:
+            self._write_lines(msg.epilogue)
+
+
+def build_attachment(field_file, filename):
+    """
+    Returns MIME part of attachment encoded in base64 on write. The part is
+    the same as attachments created by EmailMessage and, written by
+    message_to_file, keeps only a chunk of content of file in memory.
+    """
+    attachment = AttachmentPart(field_file)
+    if filename:
+        try:
+            filename.encode("ascii")
+        except UnicodeEncodeError:
+            filename = ("utf-8", "", filename)
+        attachment.add_header("Content-Disposition", "attachment", filename=filename)
+    return attachment
+
+
+class LetterMessage(EmailMultiAlternatives):
+    """
+    Email message with attachments of files encoded from storage on write.
+    Their parts are kept in attachment_parts, so attachments keep holding
+    (filename, content, mimetype) only, as in EmailMessage.
+    """
+
+    def __init__(self, *args, attachment_files=(), **kwargs):
+        super().__init__(*args, **kwargs)
+        self.attachment_parts = [
+            build_attachment(field_file, filename)
+            for field_file, filename in attachment_files
+        ]
+
+    def _create_attachments(self, msg):
+        msg = super()._create_attachments(msg)
+        if not self.attachment_parts:
+            return msg
+        if not self.attachments:
+            body_msg = msg
+            msg = SafeMIMEMultipart(
+                _subtype=self.mixed_subtype,
+                encoding=self.encoding or settings.DEFAULT_CHARSET,
+            )
+            if self.body or body_msg.is_multipart():
+                msg.attach(body_msg)
+        for part in self.attachment_parts:
+            msg.attach(part)
+        return msg
+
+
+def message_to_file(message, name):
+    """
+    Writes message into temporary file, which is kept in memory only
+    up to EML_MEMORY_SIZE, and returns it as File of given name.
+    """
+    fp = tempfile.SpooledTemporaryFile(max_size=EML_MEMORY_SIZE)
+    StreamingGenerator(fp, mangle_from_=False).flatten(message, linesep="\n")
+    fp.seek(0)
+    return File(fp, name=name)
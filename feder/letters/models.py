@@ -6,10 +6,10 @@ from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.contenttypes.fields import GenericRelation
 from django.contrib.sites.shortcuts import get_current_site
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
-from django.core.files.base import ContentFile
-from django.core.mail.message import EmailMultiAlternatives, make_msgid
-from django.db import models
+from django.core.mail.message import make_msgid
+from django.db import models, transaction
 from django.db.models.manager import BaseManager
 from django.template.loader import render_to_string
 from django.urls import reverse
@@ -17,18 +17,24 @@ from django.utils import timezone
 from django.utils.encoding import force_str
 from django.utils.safestring import mark_safe
 from django.utils.translation import gettext_lazy as _
+from django_cleanup import cleanup
 from django_extensions.db.models import TimeStampedModel
+from jsonfield import JSONField
 from model_utils import Choices
 
 from feder.cases.models import Case, enforce_quarantined_queryset
-from feder.domains.models import Domain
+from feder.cases.stats import batch_case_stats, refresh_case_stats
 from feder.institutions.models import Institution
 from feder.main.exceptions import FederValueError
-from feder.main.utils import get_email_domain
+from feder.main.utils import chunked
 from feder.records.models import AbstractRecord, AbstractRecordQuerySet, Record
 
-from ..es_search.queries import find_document, more_like_this
+from ..es_search.engine import is_available
+from ..es_search.similar import get_similar_letter_ids
+from ..es_search.tasks import schedule_index_letter
 from ..virus_scan.models import Request as ScanRequest
+from .mime import LetterMessage, message_to_file
+from .settings import LETTER_MASS_CHUNK_SIZE, LETTER_REQUEST_BODY_CACHE_TIMEOUT
 from .utils import (
     html_email_wrapper,
     html_to_text,
@@ -83,6 +89,15 @@ class LetterQuerySet(AbstractRecordQuerySet):
     def exclude_spam(self):
         return self.exclude(is_spam=Letter.SPAM.spam)
 
+    def unsent(self):
+        return self.filter(models.Q(eml="") | models.Q(eml__isnull=True))
+
+    def for_sending(self):
+        return self.select_related(
+            "record__case__institution",
+            "record__case__monitoring__domain__organisation",
+        ).prefetch_related("attachment_set")
+
     def filter_automatic(self):
         return self.filter(message_type__in=[i[0] for i in Letter.MESSAGE_TYPES_AUTO])
 
@@ -100,6 +115,23 @@ class LetterQuerySet(AbstractRecordQuerySet):
 
 
 class LetterManager(BaseManager.from_queryset(LetterQuerySet)):
+    def bulk_create_for_records(self, records, **kwargs):
+        """
+        Creates letter of given fields for each record.
+        Primary keys are read back by records, if the database does not
+        return them from bulk insert.
+        """
+        letters = self.bulk_create(
+            [self.model(record=record, **kwargs) for record in records]
+        )
+        if not all(letter.pk for letter in letters):
+            pks = dict(self.filter(record__in=records).values_list("record_id", "pk"))
+            for letter in letters:
+                letter.pk = pks[letter.record_id]
+                letter._state.adding = False
+                letter._state.db = self.db
+        return letters
+
     def get_queryset(self):
         return (
             super().get_queryset()
@@ -182,9 +214,26 @@ class Letter(AbstractRecord):
         verbose_name=_('ID of sent email message "Message-ID"'),
         max_length=500,
     )
+    dedup_key = models.CharField(
+        verbose_name=_("Deduplication key"),
+        help_text=_("Hash of Message-ID, addresses and subject of received email"),
+        max_length=64,
+        null=True,
+        blank=True,
+        unique=True,
+        editable=False,
+    )
     eml = models.FileField(
         upload_to="messages/%Y/%m/%d", verbose_name=_("File"), null=True, blank=True
     )
+    generated_from = models.ForeignKey(
+        to="self",
+        verbose_name=_("Generated from mass draft"),
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name="generated_letters",
+    )
     objects = LetterManager()
     objects_with_spam = LetterQuerySet.as_manager()
 
@@ -253,39 +302,53 @@ class Letter(AbstractRecord):
                 "Only User and Institution is allowed for attribute author"
             )
 
-    @classmethod
-    def send_new_case(cls, case):
+    @staticmethod
+    def render_request_body(monitoring):
+        """
+        Returns HTML and text body of request of monitoring. Bodies are cached
+        per version of monitoring, as they are the same for all its cases
+        and reply address is substituted on sending.
+        """
+        key = f"letters:request_body:{monitoring.pk}:{monitoring.modified.timestamp()}"
+        bodies = cache.get(key)
+        if bodies is not None:
+            return bodies
+        template, footer = monitoring.template, monitoring.email_footer
+        template_is_html = is_formatted_html(template)
+        footer_is_html = is_formatted_html(footer)
         context = {
             "html_body": mark_safe(
-                case.monitoring.template
-                if is_formatted_html(case.monitoring.template)
-                else text_to_html(case.monitoring.template)
+                template if template_is_html else text_to_html(template)
             ),
             "text_body": mark_safe(
-                html_to_text(case.monitoring.template)
-                if is_formatted_html(case.monitoring.template)
-                else case.monitoring.template
+                html_to_text(template) if template_is_html else template
             ),
             "html_footer": mark_safe(
-                case.monitoring.email_footer
-                if is_formatted_html(case.monitoring.email_footer)
-                else text_to_html(case.monitoring.email_footer)
+                footer if footer_is_html else text_to_html(footer)
             ),
             "text_footer": mark_safe(
-                html_to_text(case.monitoring.email_footer)
-                if is_formatted_html(case.monitoring.email_footer)
-                else case.monitoring.email_footer
+                html_to_text(footer) if footer_is_html else footer
             ),
         }
+        bodies = (
+            render_to_string("letters/_letter_reply_body.html", context),
+            render_to_string("letters/_letter_reply_body.txt", context),
+        )
+        cache.set(key, bodies, LETTER_REQUEST_BODY_CACHE_TIMEOUT)
+        return bodies
+
+    @classmethod
+    def send_new_case(cls, case, connection=None):
+        html_body, body = cls.render_request_body(case.monitoring)
         letter = cls(
             author_user=case.user,
             email_from=str(case.get_email_address()),
             record=Record.objects.create(case=case),
             title=case.monitoring.subject,
-            html_body=render_to_string("letters/_letter_reply_body.html", context),
-            body=render_to_string("letters/_letter_reply_body.txt", context),
+            html_body=html_body,
+            body=body,
         )
-        letter.send(commit=True, only_email=False)
+        letter.send(commit=True, only_email=False, connection=connection)
         return letter
 
     def _email_context(self):
@@ -316,7 +379,7 @@ class Letter(AbstractRecord):
         txt_content = render_to_string("letters/_letter_reply_body.txt", context)
         return html_content, txt_content
 
-    def _construct_message(self, msg_id=None):
+    def _construct_message(self, msg_id=None, connection=None):
         headers = {
             "Return-Receipt-To": self.case.email,
             "Disposition-Notification-To": self.case.email,
@@ -324,7 +387,7 @@ class Letter(AbstractRecord):
         if msg_id:
             headers["Message-ID"] = msg_id
         html_content, txt_content = self.email_body()
-        msg = EmailMultiAlternatives(
+        msg = LetterMessage(
             subject=(
                 self.case.monitoring.subject if self.is_mass_draft() else self.title
             ),
@@ -333,9 +396,9 @@ class Letter(AbstractRecord):
             to=[self.case.institution.email],
             body=txt_content,
             headers=headers,
-            attachments=[
-                (att.filename, att.attachment.file.read(), "application/octet-stream")
-                for att in self.attachment_set.all()
+            connection=connection,
+            attachment_files=[
+                (att.attachment, att.filename) for att in self.attachment_set.all()
             ],
         )
         msg.attach_alternative(html_content, "text/html")
@@ -346,6 +409,7 @@ class Letter(AbstractRecord):
         Uses this letter as a template for generating mass message
          (it has to be defined with "mass draft" message type).
          prepares and returns generated letters ready for sending.
+         Cases having letter generated from this draft before are skipped.
         """
         if not self.is_mass_draft():
             raise FederValueError(
@@ -366,76 +430,96 @@ class Letter(AbstractRecord):
             letter_data[name] = getattr(self, name)
         letter_data["is_draft"] = False
         letter_data["message_type"] = self.MESSAGE_TYPES.regular
-
+        letter_data["generated_from"] = self
+
+        # copies share stored files of the draft attachments
+        attachment_names = [x.attachment.name for x in self.attachment_set.all()]
+        # cases with letters generated before are skipped on resume
+        cases = (
+            self.mass_draft.determine_cases()
+            .exclude(record__letters_letters__generated_from=self)
+            .select_related("institution")
+            .distinct()
+            .order_by("pk")
+        )
         letters = []
-        for case in self.mass_draft.determine_cases():
-            letter = Letter(**letter_data)
-            letter.record = Record.objects.create(case=case)
-            letter.save()
-
-            # Copying attachments
-            for attachment in self.attachment_set.all():
-                attachment_copy = Attachment(letter=letter)
-                file_copy = ContentFile(attachment.attachment.read())
-                file_copy.name = attachment.attachment.name
-                attachment_copy.attachment = file_copy
-                attachment_copy.save()
-
-            letters.append(letter)
-
+        for chunk in chunked(cases.iterator(), LETTER_MASS_CHUNK_SIZE):
+            with transaction.atomic(), batch_case_stats():
+                records = Record.objects.create_for_cases(chunk)
+                chunk_letters = Letter.objects.bulk_create_for_records(
+                    records, **letter_data
+                )
+                Attachment.objects.bulk_create(
+                    Attachment(letter=letter, attachment=name)
+                    for letter in chunk_letters
+                    for name in attachment_names
+                )
+                refresh_case_stats(*(case.pk for case in chunk))
+                if is_available():
+                    # bulk insert does not send post_save signal
+                    for letter in chunk_letters:
+                        schedule_index_letter(letter.pk)
+            letters.extend(chunk_letters)
         return letters
 
-    def send(self, commit=True, only_email=False):
+    def send(self, commit=True, only_email=False, connection=None):
         if self.is_mass_draft():
             raise FederValueError(
                 'send method can not be executed for "mass_draft" message type.'
             )
         self.case.update_email()
         msg_id = make_msgid(domain=self.case.email.split("@", 2)[1])
-        message = self._construct_message(msg_id=msg_id)
-        text = message.message().as_bytes()
+        message = self._construct_message(msg_id=msg_id, connection=connection)
         self.email = self.case.institution.email
         self.message_id_header = normalize_msg_id(msg_id)
-        self.eml.save("%s.eml" % uuid.uuid4(), ContentFile(text), save=False)
-        self.is_draft = False
-        if commit:
-            self.save(update_fields=["eml", "email"] if only_email else None)
-            if self.case.first_request is None:
-                self.case.first_request = self
-                self.case.save()
-            else:
-                self.case.last_request = self
-                self.case.save()
-        return message.send()
+        name = "%s.eml" % uuid.uuid4()
+        with message_to_file(message.message(), name) as eml_file:
+            self.eml.save(name, eml_file, save=False)
+        is_draft, self.is_draft = self.is_draft, False
+        try:
+            with transaction.atomic():
+                if commit:
+                    self.save(update_fields=["eml", "email"] if only_email else None)
+                    if self.case.first_request is None:
+                        self.case.first_request = self
+                        self.case.save()
+                    else:
+                        self.case.last_request = self
+                        self.case.save()
+                return message.send()
+        except Exception:
+            # changes of letter are rolled back, so its eml would be orphaned
+            self.eml.delete(save=False)
+            self.is_draft = is_draft
+            raise
 
     def get_more_like_this(self):
-        doc = find_document(self.pk)
-        if not doc:
+        ids = get_similar_letter_ids(self.pk)
+        if not ids:
             return Letter._default_manager.none()
-        result = more_like_this(doc)
-        ids = [x.letter_id for x in result]
         return Letter._default_manager.filter(pk__in=ids).all()
 
     def spam_check(self):
-        if self.email_from is not None and "@" in self.email_from:
-            from_domain = LetterEmailDomain.objects.filter(
-                domain_name=get_email_domain(self.email_from)
-            ).first()
-        else:
-            from_domain = None
-        if (
-            # (self.email_to not in self.body) or
-            (self.email_from is None or self.email_from == "")
-            or (from_domain is not None and from_domain.is_spammer_domain)
-        ):
+        """
+        Marks letter as probable spam if scored as spam by pipeline of stages
+        configured in LETTER_SPAM_STAGES. Letters validated by users are kept.
+        """
+        from .spam import get_default_pipeline
+
+        if self.is_spam_validated() or self.is_spam == Letter.SPAM.probable_spam:
+            return
+        if get_default_pipeline().is_spam(self):
             self.is_spam = Letter.SPAM.probable_spam
             self.save()
-            return
 
 
 class LetterEmailDomain(TimeStampedModel):
     domain_name = models.CharField(
-        verbose_name=_("Email address domain"), max_length=100, blank=True, null=True
+        verbose_name=_("Email address domain"),
+        max_length=100,
+        blank=True,
+        null=True,
+        db_index=True,
     )
     is_trusted_domain = models.BooleanField(
         verbose_name=_("Is trusted (own or partner) domain?"), default=False
@@ -466,30 +550,24 @@ class LetterEmailDomain(TimeStampedModel):
         super().save(*args, **kwargs)
 
     def add_email_to_letter(self):
-        self.email_to_count += 1
-        self.save()
+        type(self).objects.filter(pk=self.pk).update(
+            email_to_count=models.F("email_to_count") + 1
+        )
 
     def add_email_from_letter(self):
-        self.email_from_count += 1
-        self.save()
+        type(self).objects.filter(pk=self.pk).update(
+            email_from_count=models.F("email_from_count") + 1
+        )
 
     @classmethod
     def register_letter_email_domains(cls, letter: Letter):
-        trusted_domains = Domain.objects.all().values_list("name", flat=True)
-        is_outgoing = (
-            letter.is_outgoing or "fedrowanie.siecobywatelska.pl" in letter.email_from
-        )
-        from_domain_name = get_email_domain(letter.email_from)
-        from_domain, _ = cls.objects.get_or_create(domain_name=from_domain_name)
-        from_domain.is_trusted_domain = from_domain.domain_name in trusted_domains
-        from_domain.save()
-        from_domain.add_email_from_letter()
-        to_domain_name = get_email_domain(letter.email_to)
-        to_domain, _ = cls.objects.get_or_create(domain_name=to_domain_name)
-        to_domain.is_trusted_domain = to_domain.domain_name in trusted_domains
-        to_domain.is_monitoring_email_to_domain = is_outgoing
-        to_domain.save()
-        to_domain.add_email_to_letter()
+        """
+        Registers domains of letter addresses. Flags are read from
+        process-local cache and counters are saved in batches.
+        """
+        from .reputation import domain_reputation
+
+        domain_reputation.register_letter(letter)
 
     class Meta:
         verbose_name = _("Letter Email domain")
@@ -563,6 +641,8 @@ class AttachmentQuerySet(models.QuerySet):
         return self.prefetch_related("scan_request")
 
 
+# stored files are shared by copies of mass message, see signals
+@cleanup.ignore
 class Attachment(AttachmentBase):
     letter = models.ForeignKey(Letter, on_delete=models.CASCADE)
     objects = AttachmentQuerySet.as_manager()
@@ -596,3 +676,103 @@ class Attachment(AttachmentBase):
         return "".join(
             ["https://", get_current_site(None).domain, self.get_absolute_url()]
         )
+
+
+class IncomingEmailQuerySet(models.QuerySet):
+    def queued(self):
+        return self.filter(status=IncomingEmail.STATUS.queued)
+
+    def spool(self, manifest, eml_file, attachments):
+        """
+        Persists raw message received by webhook to process it later.
+        Redelivery of message still waiting in the queue is not stored again.
+        """
+        headers = manifest["headers"]
+        email_to = headers["to"][0] if headers["from"][0] else None
+        incoming_email = (
+            self.queued()
+            .filter(message_id_header=headers["message_id"], email_to=email_to)
+            .first()
+        )
+        if incoming_email:
+            logger.info(f"Request skipped, email queued: {incoming_email.pk}")
+            return incoming_email
+        incoming_email = self.create(
+            message_id_header=headers["message_id"],
+            email_to=email_to,
+            manifest=manifest,
+            eml=eml_file,
+        )
+        IncomingEmailAttachment.objects.bulk_create(
+            IncomingEmailAttachment(incoming_email=incoming_email, attachment=x)
+            for x in attachments
+        )
+        logger.info(f"Request spooled, email queued: {incoming_email.pk}")
+        return incoming_email
+
+    def stats(self):
+        """
+        Returns count of queued emails and age in seconds of the oldest one.
+        """
+        queued = self.queued().aggregate(
+            queue_depth=models.Count("pk"), oldest=models.Min("created")
+        )
+        lag = timezone.now() - queued["oldest"] if queued["oldest"] else None
+        return {
+            "queue_depth": queued["queue_depth"],
+            "lag_seconds": lag.total_seconds() if lag else 0,
+        }
+
+
+class IncomingEmail(TimeStampedModel):
+    STATUS = Choices(
+        ("queued", _("queued")),
+        ("processed", _("processed")),
+        ("failed", _("failed")),
+    )
+    status = models.CharField(
+        verbose_name=_("Status"),
+        choices=STATUS,
+        default=STATUS.queued,
+        max_length=20,
+        db_index=True,
+    )
+    message_id_header = models.CharField(
+        verbose_name=_('ID of sent email message "Message-ID"'),
+        max_length=500,
+        blank=True,
+        db_index=True,
+    )
+    email_to = models.EmailField(verbose_name=_("To"), null=True, blank=True)
+    manifest = JSONField(verbose_name=_("Manifest"))
+    eml = models.FileField(
+        upload_to="incoming/%Y/%m/%d", verbose_name=_("File"), null=True, blank=True
+    )
+    letter = models.ForeignKey(
+        Letter,
+        verbose_name=_("Letter"),
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+    )
+    error = models.TextField(verbose_name=_("Error"), blank=True)
+    objects = IncomingEmailQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = _("Incoming email")
+        verbose_name_plural = _("Incoming emails")
+        ordering = ["pk"]
+
+    def __str__(self):
+        return f"{self.message_id_header}"
+
+
+class IncomingEmailAttachment(models.Model):
+    incoming_email = models.ForeignKey(
+        IncomingEmail, on_delete=models.CASCADE, related_name="attachments"
+    )
+    attachment = models.FileField(upload_to="letters/%Y/%m/%d", verbose_name=_("File"))
+
+    class Meta:
+        verbose_name = _("Incoming email attachment")
+        verbose_name_plural = _("Incoming email attachments")
@@ -0,0 +1,154 @@
+import atexit
+import logging
+import threading
+import time
+from collections import Counter
+
+from django.db.models import F
+from django.utils import timezone
+
+from feder.domains.models import Domain
+from feder.main.utils import get_email_domain
+
+from .models import LetterEmailDomain
+from .settings import LETTER_DOMAIN_CACHE_TIMEOUT, LETTER_DOMAIN_FLUSH_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+
+class DomainReputation:
+    """
+    Process-local cache of LetterEmailDomain flags and buffer of its counters.
+
+    Cached domains are dropped on change of LetterEmailDomain or Domain
+    in this process and after LETTER_DOMAIN_CACHE_TIMEOUT seconds in others.
+    Counters are added with single UPDATE per domain at most every
+    LETTER_DOMAIN_FLUSH_INTERVAL seconds, at the end of request or at exit.
+    Counters buffered by a killed process are lost, so they are approximate.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.domains = {}
+        self.trusted_domains = None
+        self.loaded_at = time.monotonic()
+        self.pending = Counter()
+        self.flushed_at = time.monotonic()
+
+    def invalidate(self):
+        with self.lock:
+            self.domains = {}
+            self.trusted_domains = None
+            self.loaded_at = time.monotonic()
+
+    def expire(self):
+        if time.monotonic() - self.loaded_at > LETTER_DOMAIN_CACHE_TIMEOUT:
+            self.invalidate()
+
+    def get_trusted_domains(self):
+        with self.lock:
+            self.expire()
+            if self.trusted_domains is None:
+                self.trusted_domains = set(
+                    Domain.objects.all().values_list("name", flat=True)
+                )
+            return self.trusted_domains
+
+    def get(self, domain_name):
+        """
+        Returns LetterEmailDomain of given name or None, if it is not known.
+        """
+        with self.lock:
+            self.expire()
+            if domain_name not in self.domains:
+                self.domains[domain_name] = (
+                    LetterEmailDomain.objects.filter(domain_name=domain_name)
+                    .order_by("pk")
+                    .first()
+                )
+            return self.domains[domain_name]
+
+    def get_or_create(self, domain_name):
+        domain = self.get(domain_name)
+        if domain is None:
+            # domain could be created by another process meanwhile
+            with self.lock:
+                self.domains.pop(domain_name, None)
+            domain = self.get(domain_name) or LetterEmailDomain.objects.create(
+                domain_name=domain_name
+            )
+            with self.lock:
+                self.domains[domain_name] = domain
+        return domain
+
+    def is_spammer_domain(self, domain_name):
+        domain = self.get(domain_name)
+        return domain is not None and domain.is_spammer_domain
+
+    def set_flags(self, domain, **flags):
+        """
+        Saves flags of domain which differ from cached ones.
+        """
+        changed = {
+            key: value for key, value in flags.items() if getattr(domain, key) != value
+        }
+        if not changed:
+            return
+        # only changed flags are written, as cached domain may be outdated,
+        # eg. is_spammer_domain set by admin meanwhile
+        LetterEmailDomain.objects.filter(pk=domain.pk).update(
+            modified=timezone.now(), **changed
+        )
+        for key, value in changed.items():
+            setattr(domain, key, value)
+
+    def register_letter(self, letter):
+        trusted_domains = self.get_trusted_domains()
+        is_outgoing = (
+            letter.is_outgoing or "fedrowanie.siecobywatelska.pl" in letter.email_from
+        )
+        from_domain = self.get_or_create(get_email_domain(letter.email_from))
+        self.set_flags(
+            from_domain,
+            is_trusted_domain=from_domain.domain_name in trusted_domains,
+        )
+        to_domain = self.get_or_create(get_email_domain(letter.email_to))
+        self.set_flags(
+            to_domain,
+            is_trusted_domain=to_domain.domain_name in trusted_domains,
+            is_monitoring_email_to_domain=is_outgoing,
+        )
+        with self.lock:
+            self.pending[(from_domain.pk, "email_from_count")] += 1
+            self.pending[(to_domain.pk, "email_to_count")] += 1
+        self.flush_if_due()
+
+    def flush_if_due(self):
+        if time.monotonic() - self.flushed_at >= LETTER_DOMAIN_FLUSH_INTERVAL:
+            self.flush()
+
+    def flush(self):
+        """
+        Saves buffered counters of domains.
+        """
+        with self.lock:
+            pending, self.pending = self.pending, Counter()
+            self.flushed_at = time.monotonic()
+        counts = {}
+        for (pk, field), value in pending.items():
+            counts.setdefault(pk, {})[field] = F(field) + value
+        for pk, values in counts.items():
+            LetterEmailDomain.objects.filter(pk=pk).update(**values)
+        if counts:
+            logger.debug(f"Counters of {len(counts)} letter email domains saved")
+
+
+domain_reputation = DomainReputation()
+
+
+@atexit.register
+def flush_domain_counters():
+    try:
+        domain_reputation.flush()
+    except Exception as e:
+        logger.error(f"Counters of letter email domains lost: {e}")
@@ -0,0 +1,139 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.mail import get_connection
+from django.db import connections, transaction
+
+from feder.main.utils import chunked
+
+from .models import Letter
+from .settings import (
+    LETTER_SEND_BATCH_SIZE,
+    LETTER_SEND_CONCURRENCY,
+    LETTER_SEND_RATE_LIMIT,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimiter:
+    """
+    Spaces calls for the same key to at most `rate` per second.
+    """
+
+    def __init__(self, rate):
+        self.interval = 1 / rate if rate else 0
+        self.lock = threading.Lock()
+        self.next_at = {}
+
+    def wait(self, key):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            at = max(now, self.next_at.get(key, now))
+            self.next_at[key] = at + self.interval
+        if at > now:
+            time.sleep(at - now)
+
+
+def get_case_domain(case):
+    return case.monitoring.domain_id
+
+
+def set_mass_assign_status(case, status):
+    # only cases created by mass assign have status tracked
+    if case.mass_assign_status is not None:
+        case.mass_assign_status = status
+        type(case).objects.filter(pk=case.pk).update(mass_assign_status=status)
+
+
+def send_new_case(case, connection):
+    Letter.send_new_case(case=case, connection=connection)
+    set_mass_assign_status(case, case.MASS_ASSIGN_STATUS.sent)
+
+
+class MassSender:
+    """
+    Sends letters in batches, each batch over a single SMTP connection.
+    Batches are sent by pool of LETTER_SEND_CONCURRENCY threads with at most
+    LETTER_SEND_RATE_LIMIT messages per second from each Domain.
+
+    Each message is saved in transaction committed once SMTP server accepted
+    it, so sent letters are skipped when interrupted sending is resumed.
+    """
+
+    def __init__(
+        self,
+        concurrency=LETTER_SEND_CONCURRENCY,
+        batch_size=LETTER_SEND_BATCH_SIZE,
+        rate_limit=LETTER_SEND_RATE_LIMIT,
+    ):
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.limiter = RateLimiter(rate_limit)
+
+    def send_letters(self, letters):
+        """
+        Sends letters not sent yet. Returns count of sent letters.
+        """
+        return self.run(
+            letters.unsent().for_sending().order_by("pk").iterator(),
+            get_domain=lambda letter: get_case_domain(letter.case),
+            send=lambda letter, connection: letter.send(connection=connection),
+        )
+
+    def send_new_cases(self, cases):
+        """
+        Sends request of cases without any request sent and updates
+        mass assign status of the cases. Returns count of sent letters.
+        """
+        return self.run(
+            cases.filter(first_request__isnull=True)
+            .select_related("user", "institution", "monitoring__domain__organisation")
+            .order_by("pk")
+            .iterator(),
+            get_domain=get_case_domain,
+            send=send_new_case,
+            on_failure=lambda case: set_mass_assign_status(
+                case, case.MASS_ASSIGN_STATUS.failed
+            ),
+        )
+
+    def run(self, items, get_domain, send, on_failure=None):
+        batches = chunked(items, self.batch_size)
+        args = (get_domain, send, on_failure)
+        # threads use own database connections, which do not see data
+        # of transaction not committed yet
+        if self.concurrency <= 1 or transaction.get_connection().in_atomic_block:
+            return sum(self.send_batch(batch, *args) for batch in batches)
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            futures = [
+                executor.submit(self.send_batch_in_thread, batch, *args)
+                for batch in batches
+            ]
+            return sum(future.result() for future in futures)
+
+    def send_batch_in_thread(self, batch, get_domain, send, on_failure=None):
+        try:
+            return self.send_batch(batch, get_domain, send, on_failure)
+        finally:
+            connections.close_all()
+
+    def send_batch(self, batch, get_domain, send, on_failure=None):
+        sent = 0
+        with get_connection() as connection:
+            for item in batch:
+                self.limiter.wait(get_domain(item))
+                try:
+                    with transaction.atomic():
+                        send(item, connection)
+                    sent += 1
+                except Exception:
+                    logger.exception(f"Sending of {item!r} failed")
+                    if on_failure is not None:
+                        on_failure(item)
+        logger.info(f"Sent {sent} of {len(batch)} messages in batch")
+        return sent
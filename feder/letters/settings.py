@@ -1,3 +1,32 @@
 from django.conf import settings
 
 LETTER_RECEIVE_SECRET = getattr(settings, "LETTER_RECEIVE_SECRET")
+LETTER_RECEIVE_ASYNC = getattr(settings, "LETTER_RECEIVE_ASYNC", False)
+LETTER_DOMAIN_CACHE_TIMEOUT = getattr(settings, "LETTER_DOMAIN_CACHE_TIMEOUT", 60)
+LETTER_DOMAIN_FLUSH_INTERVAL = getattr(settings, "LETTER_DOMAIN_FLUSH_INTERVAL", 10)
+LETTER_SPAM_STAGES = getattr(
+    settings,
+    "LETTER_SPAM_STAGES",
+    [
+        "feder.letters.spam.stages.SenderStage",
+        "feder.letters.spam.stages.DomainReputationStage",
+        "feder.letters.spam.stages.ReputableTLDStage",
+        "feder.letters.spam.stages.HeaderStage",
+        "feder.letters.spam.stages.TokenModelStage",
+    ],
+)
+LETTER_SPAM_THRESHOLD = getattr(settings, "LETTER_SPAM_THRESHOLD", 1.0)
+LETTER_HAM_THRESHOLD = getattr(settings, "LETTER_HAM_THRESHOLD", -1.0)
+LETTER_SPAM_MODEL_CACHE_TIMEOUT = getattr(
+    settings, "LETTER_SPAM_MODEL_CACHE_TIMEOUT", 60 * 60 * 24
+)
+LETTER_SPAM_STAGE_CACHE_TIMEOUT = getattr(
+    settings, "LETTER_SPAM_STAGE_CACHE_TIMEOUT", 60 * 5
+)
+LETTER_MASS_CHUNK_SIZE = getattr(settings, "LETTER_MASS_CHUNK_SIZE", 200)
+LETTER_SEND_CONCURRENCY = getattr(settings, "LETTER_SEND_CONCURRENCY", 4)
+LETTER_SEND_BATCH_SIZE = getattr(settings, "LETTER_SEND_BATCH_SIZE", 50)
+LETTER_SEND_RATE_LIMIT = getattr(settings, "LETTER_SEND_RATE_LIMIT", 5)
+LETTER_REQUEST_BODY_CACHE_TIMEOUT = getattr(
+    settings, "LETTER_REQUEST_BODY_CACHE_TIMEOUT", 60 * 60
+)
@@ -1,30 +1,82 @@
 import logging
 
-from django.db.models.signals import post_save
+from django.core.signals import request_finished
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
 
-from feder.es_search.settings import ELASTICSEARCH_URL
-from feder.es_search.tasks import index_letter
-from feder.letters.models import Letter
+from feder.cases.models import Case
+from feder.domains.models import Domain
+from feder.es_search.engine import is_available
+from feder.es_search.tasks import schedule_index_letter
+from feder.letters.models import Attachment, Letter, LetterEmailDomain
+from feder.letters.reputation import domain_reputation
 
 logger = logging.getLogger(__name__)
 
 
 @receiver(post_save, sender=Letter)
 def index_letter_signal(sender, instance, **kwargs):
-    if ELASTICSEARCH_URL is None:
-        logger.info("Skipping indexing due Elasticsearch integration disabled")
+    if not is_available():
+        logger.info("Skipping indexing due search engine disabled")
         return
-    index_letter([instance.pk])
+    schedule_index_letter(instance.pk)
 
 
 @receiver(post_save, sender=Letter)
 def update_case_statuses(sender, instance, created, raw, **kwargs):
-    if not raw and created and instance.record.case_id:
-        case = instance.record.case
-        prev_cr = case.confirmation_received
-        prev_rr = case.response_received
-        case.confirmation_received = case.get_confirmation_received()
-        case.response_received = case.get_response_received()
-        if prev_cr != case.confirmation_received or prev_rr != case.response_received:
-            case.save()
+    if raw or not created or not instance.is_incoming or not instance.record.case_id:
+        return
+    if instance.message_type in Letter.MESSAGE_TYPES_AUTO:
+        field = "confirmation_received"
+    else:
+        field = "response_received"
+    Case.objects.mark_received(instance.record.case_id, field)
+
+
+@receiver(post_save, sender=LetterEmailDomain)
+def invalidate_letter_email_domain(sender, created, **kwargs):
+    # new domains are already up to date in cache
+    if not created:
+        domain_reputation.invalidate()
+
+
+@receiver(post_delete, sender=LetterEmailDomain)
+@receiver(post_save, sender=Domain)
+@receiver(post_delete, sender=Domain)
+def invalidate_domain_reputation(sender, **kwargs):
+    domain_reputation.invalidate()
+
+
+@receiver(request_finished)
+def flush_domain_counters_on_request_finished(sender, **kwargs):
+    domain_reputation.flush_if_due()
+
+
+def delete_unused_attachment_file(storage, name):
+    def delete():
+        if not Attachment.objects.filter(attachment=name).exists():
+            storage.delete(name)
+
+    transaction.on_commit(delete)
+
+
+@receiver(post_delete, sender=Attachment)
+def delete_attachment_file(sender, instance, **kwargs):
+    if instance.attachment.name:
+        delete_unused_attachment_file(
+            instance.attachment.storage, instance.attachment.name
+        )
+
+
+@receiver(pre_save, sender=Attachment)
+def delete_replaced_attachment_file(sender, instance, raw, **kwargs):
+    if raw or not instance.pk:
+        return
+    name = (
+        Attachment.objects.filter(pk=instance.pk)
+        .values_list("attachment", flat=True)
+        .first()
+    )
+    if name and name != instance.attachment.name:
+        delete_unused_attachment_file(instance.attachment.storage, name)
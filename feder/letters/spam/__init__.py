@@ -0,0 +1,30 @@
+import threading
+
+from django.utils.module_loading import import_string
+
+from ..settings import LETTER_HAM_THRESHOLD, LETTER_SPAM_STAGES, LETTER_SPAM_THRESHOLD
+from .base import SpamPipeline
+
+_local = threading.local()
+
+
+def get_pipeline(stage_names=None):
+    """
+    Returns pipeline of stages configured in LETTER_SPAM_STAGES,
+    optionally limited to stages of given names.
+    """
+    stages = [import_string(path)() for path in LETTER_SPAM_STAGES]
+    if stage_names:
+        stages = [stage for stage in stages if stage.name in stage_names]
+    return SpamPipeline(
+        stages, spam_threshold=LETTER_SPAM_THRESHOLD, ham_threshold=LETTER_HAM_THRESHOLD
+    )
+
+
+def get_default_pipeline():
+    """
+    Returns pipeline of all stages, reused by a thread for its letters.
+    """
+    if getattr(_local, "pipeline", None) is None:
+        _local.pipeline = get_pipeline()
+    return _local.pipeline
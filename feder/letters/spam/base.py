@@ -0,0 +1,97 @@
+import logging
+
+from feder.main.utils import chunked
+
+logger = logging.getLogger(__name__)
+
+
+class BaseStage:
+    """
+    Single check of spam pipeline.
+
+    Positive score means spam and negative one means regular letter.
+    Score reaching threshold of the pipeline stops further checks.
+    Positive scores of heuristic stages are counted only if any other stage
+    scored the letter as spam as well, and their negative scores are counted
+    only if none did, so a heuristic never overrides an explicit verdict.
+    """
+
+    name = None
+    heuristic = False
+
+    def prepare(self, letters):
+        """
+        Loads data required to score the letters at once.
+        """
+
+    def score(self, letter):
+        raise NotImplementedError(f"Provide 'score' in {self.__class__.__name__}")
+
+    def is_heuristic(self, score):
+        return self.heuristic
+
+
+class SpamPipeline:
+    def __init__(self, stages, spam_threshold, ham_threshold):
+        self.stages = stages
+        self.spam_threshold = spam_threshold
+        self.ham_threshold = ham_threshold
+
+    def is_decisive(self, score):
+        return score >= self.spam_threshold or score <= self.ham_threshold
+
+    def score_letters(self, letters):
+        """
+        Returns mapping of letter pk to its score.
+        """
+        letters = list(letters)
+        for stage in self.stages:
+            stage.prepare(letters)
+        return {letter.pk: self.score_letter(letter) for letter in letters}
+
+    def score_letter(self, letter):
+        score = 0
+        heuristic_spam_score = 0
+        heuristic_ham_score = 0
+        has_evidence = False
+        total = 0
+        for stage in self.stages:
+            stage_score = stage.score(letter)
+            if not stage.is_heuristic(stage_score):
+                score += stage_score
+                has_evidence = has_evidence or stage_score > 0
+            elif stage_score > 0:
+                heuristic_spam_score += stage_score
+            else:
+                heuristic_ham_score += stage_score
+            if has_evidence:
+                total = score + heuristic_spam_score
+            else:
+                total = score + heuristic_ham_score
+            if self.is_decisive(total):
+                break
+        return total
+
+    def is_spam(self, letter):
+        return self.score_letters([letter])[letter.pk] >= self.spam_threshold
+
+    def reclassify(self, letters, chunk_size, dry_run=False):
+        """
+        Marks letters scored as spam as probable spam.
+        Returns count of checked letters and count of spam.
+        """
+        from ..models import Letter
+
+        letter_count = 0
+        spam_count = 0
+        for chunk in chunked(letters.iterator(chunk_size=chunk_size), chunk_size):
+            scores = self.score_letters(chunk)
+            ids = [pk for pk, score in scores.items() if score >= self.spam_threshold]
+            if ids and not dry_run:
+                Letter.objects.filter(pk__in=ids).update(
+                    is_spam=Letter.SPAM.probable_spam
+                )
+            letter_count += len(chunk)
+            spam_count += len(ids)
+            logger.info(f"Letters checked: {letter_count}; spam: {spam_count}")
+        return letter_count, spam_count
@@ -0,0 +1,263 @@
+import email
+import gzip
+import logging
+import math
+import re
+import threading
+import time
+from collections import Counter
+
+from django.core.cache import cache
+
+from feder.main.utils import get_email_domain, tokenize
+
+from ..models import Letter, LetterEmailDomain, ReputableLetterEmailTLD
+from ..reputation import domain_reputation
+from ..settings import LETTER_SPAM_MODEL_CACHE_TIMEOUT, LETTER_SPAM_STAGE_CACHE_TIMEOUT
+from ..utils import is_spam_check
+from .base import BaseStage
+
+logger = logging.getLogger(__name__)
+
+HEADER_READ_SIZE = 64 * 1024
+HEADER_END_RE = re.compile(rb"\r?\n\r?\n")
+GZIP_MAGIC = b"\x1f\x8b"
+TOKEN_MODEL_CACHE_KEY = "letters:spam:token_model"
+TOKEN_MODEL_TRAINING_CACHE_KEY = "letters:spam:token_model:training"
+TOKEN_MODEL_TRAIN_SIZE = 2000
+TOKEN_MODEL_MIN_SIZE = 10
+# keeps pickled model far below 1 MB limit of memcached
+TOKEN_MODEL_MAX_TOKENS = 5000
+# probability of spam or non-spam the model is trusted with on its own
+TOKEN_MODEL_CONFIDENCE = 0.99
+
+_token_model_lock = threading.Lock()
+_token_model = {"model": None, "loaded_at": None}
+
+
+def get_sender_domain(letter):
+    if letter.email_from and "@" in letter.email_from:
+        return get_email_domain(letter.email_from)
+    return ""
+
+
+class SenderStage(BaseStage):
+    """
+    Letters without sender address are spam.
+    """
+
+    name = "sender"
+
+    def score(self, letter):
+        return 0.0 if letter.email_from else 1.0
+
+
+class DomainReputationStage(BaseStage):
+    """
+    Uses flags of LetterEmailDomain set by staff and on registration.
+    """
+
+    name = "domain"
+
+    def __init__(self):
+        self.domains = None
+
+    def prepare(self, letters):
+        if len(letters) == 1:
+            # single letters use process-local cache of ingestion
+            self.domains = None
+            return
+        names = {get_sender_domain(letter) for letter in letters}
+        self.domains = {}
+        for domain in LetterEmailDomain.objects.filter(domain_name__in=names):
+            self.domains.setdefault(domain.domain_name, domain)
+
+    def get_domain(self, name):
+        if self.domains is None:
+            return domain_reputation.get(name)
+        return self.domains.get(name)
+
+    def score(self, letter):
+        domain = self.get_domain(get_sender_domain(letter))
+        if domain is None:
+            return 0.0
+        if domain.is_spammer_domain:
+            return 1.0
+        if (
+            domain.is_trusted_domain
+            or domain.is_non_spammer_domain
+            or domain.is_monitoring_email_to_domain
+        ):
+            return -1.0
+        return 0.0
+
+
+class ReputableTLDStage(BaseStage):
+    """
+    Letters from reputable top-level domains are less likely spam.
+    """
+
+    name = "tld"
+    heuristic = True
+
+    def __init__(self):
+        self.tlds = None
+        self.loaded_at = None
+
+    def prepare(self, letters):
+        if (
+            self.loaded_at is None
+            or time.monotonic() - self.loaded_at > LETTER_SPAM_STAGE_CACHE_TIMEOUT
+        ):
+            self.loaded_at = time.monotonic()
+            self.tlds = {
+                name.lower()
+                for name in ReputableLetterEmailTLD.objects.values_list(
+                    "name", flat=True
+                )
+            }
+
+    def score(self, letter):
+        domain = get_sender_domain(letter)
+        if not domain or not self.tlds:
+            return 0.0
+        return -0.5 if domain.rsplit(".", 1)[-1].lower() in self.tlds else 0.25
+
+
+def read_eml_headers(field_file):
+    """
+    Returns headers of email message read from the beginning of eml file.
+    """
+    with field_file.storage.open(field_file.name, "rb") as fp:
+        if fp.read(2) == GZIP_MAGIC:
+            fp.seek(0)
+            fp = gzip.GzipFile(fileobj=fp)
+        else:
+            fp.seek(0)
+        data = fp.read(HEADER_READ_SIZE)
+    return email.message_from_bytes(HEADER_END_RE.split(data, 1)[0])
+
+
+class HeaderStage(BaseStage):
+    """
+    Uses verdict of mail server in 'X-Spam-Flag' header of eml.
+    """
+
+    name = "header"
+
+    def score(self, letter):
+        if not letter.eml:
+            return 0.0
+        try:
+            headers = read_eml_headers(letter.eml)
+        except (OSError, EOFError) as e:
+            logger.error(f"Headers of letter {letter.pk} not read: {e}")
+            return 0.0
+        return 1.0 if is_spam_check(headers) else 0.0
+
+
+def train_token_model():
+    """
+    Returns token counts of letters marked as spam by users
+    and letters marked as non-spam, limited to the most frequent tokens.
+    """
+    spam = Letter.objects.filter(
+        is_spam=Letter.SPAM.spam, mark_spam_by__isnull=False
+    ).order_by("-pk")[:TOKEN_MODEL_TRAIN_SIZE]
+    ham = Letter.objects.filter(is_spam=Letter.SPAM.non_spam).order_by("-pk")[
+        :TOKEN_MODEL_TRAIN_SIZE
+    ]
+    model = {}
+    for key, qs in (("spam", spam), ("ham", ham)):
+        counts = Counter()
+        docs = 0
+        for title, body in qs.values_list("title", "body"):
+            counts.update(set(tokenize(title)) | set(tokenize(body)))
+            docs += 1
+        model[key] = {"docs": docs, "counts": counts}
+    total = model["spam"]["counts"] + model["ham"]["counts"]
+    tokens = {token for token, _ in total.most_common(TOKEN_MODEL_MAX_TOKENS)}
+    for value in model.values():
+        value["counts"] = Counter(
+            {k: v for k, v in value["counts"].items() if k in tokens}
+        )
+    return model
+
+
+def update_token_model():
+    """
+    Trains token model and shares it with other processes through cache.
+    """
+    model = train_token_model()
+    cache.set(TOKEN_MODEL_CACHE_KEY, model, LETTER_SPAM_MODEL_CACHE_TIMEOUT)
+    cache.delete(TOKEN_MODEL_TRAINING_CACHE_KEY)
+    with _token_model_lock:
+        _token_model.update(model=model, loaded_at=time.monotonic())
+    return model
+
+
+def get_token_model():
+    """
+    Returns token model from process-local cache refreshed from shared cache
+    every LETTER_SPAM_STAGE_CACHE_TIMEOUT seconds. Missing model is trained
+    in background task and None is returned meanwhile.
+    """
+    with _token_model_lock:
+        loaded_at = _token_model["loaded_at"]
+        if (
+            loaded_at is not None
+            and time.monotonic() - loaded_at <= LETTER_SPAM_STAGE_CACHE_TIMEOUT
+        ):
+            return _token_model["model"]
+        model = cache.get(TOKEN_MODEL_CACHE_KEY)
+        _token_model.update(model=model, loaded_at=time.monotonic())
+    if model is None and cache.add(
+        TOKEN_MODEL_TRAINING_CACHE_KEY, True, LETTER_SPAM_MODEL_CACHE_TIMEOUT
+    ):
+        from ..tasks import train_spam_token_model
+
+        train_spam_token_model()
+    return model
+
+
+def clear_token_model():
+    with _token_model_lock:
+        _token_model.update(model=None, loaded_at=None)
+
+
+class TokenModelStage(BaseStage):
+    """
+    Naive Bayes classifier over words of letters previously marked by users.
+    Confident verdicts score full weight and are not heuristic.
+    """
+
+    name = "tokens"
+    heuristic = True
+    weight = 0.75
+
+    def __init__(self):
+        self.model = None
+
+    def prepare(self, letters):
+        self.model = get_token_model()
+
+    def score(self, letter):
+        if self.model is None:
+            return 0.0
+        spam, ham = self.model["spam"], self.model["ham"]
+        if min(spam["docs"], ham["docs"]) < TOKEN_MODEL_MIN_SIZE:
+            return 0.0
+        log_odds = math.log(spam["docs"] / ham["docs"])
+        for token in set(tokenize(letter.title)) | set(tokenize(letter.body)):
+            log_odds += math.log(
+                (spam["counts"][token] + 1) / (spam["docs"] + 2)
+            ) - math.log((ham["counts"][token] + 1) / (ham["docs"] + 2))
+        probability = 1 / (1 + math.exp(-max(min(log_odds, 50), -50)))
+        if probability >= TOKEN_MODEL_CONFIDENCE:
+            return 1.0
+        if probability <= 1 - TOKEN_MODEL_CONFIDENCE:
+            return -1.0
+        return (probability - 0.5) * 2 * self.weight
+
+    def is_heuristic(self, score):
+        return abs(score) < 1.0
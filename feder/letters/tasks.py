@@ -0,0 +1,20 @@
+from background_task import background
+
+from .ingestion import process_queued_emails
+from .spam.stages import update_token_model
+
+
+@background
+def process_incoming_emails():
+    """
+    Creates letters of emails spooled by webhook.
+    """
+    process_queued_emails()
+
+
+@background
+def train_spam_token_model():
+    """
+    Trains token model of spam pipeline outside of letter ingestion.
+    """
+    update_token_model()
@@ -0,0 +1,54 @@
+from unittest import mock
+
+from django.db.models import QuerySet
+from django.test import TestCase
+
+from feder.letters.factories import IncomingLetterFactory
+from feder.letters.ingestion import get_letter
+from feder.letters.models import Letter
+from feder.letters.utils import get_dedup_key
+
+
+class GetLetterTestCase(TestCase):
+    headers = {
+        "from": ["user-a@example.com"],
+        "to": ["user-b@example.com"],
+        "to+": ["user-b@example.com"],
+        "message_id": "<race@example.com>",
+        "subject": "Odpowiedź",
+    }
+    text = {"content": "Treść odpowiedzi", "quote": ""}
+
+    def get_letter(self):
+        return get_letter(headers=self.headers, text=self.text, eml_file=None)
+
+    def test_create_letter(self):
+        letter, created = self.get_letter()
+        self.assertTrue(created)
+        self.assertEqual(letter.dedup_key, Letter.objects.get().dedup_key)
+
+    def test_return_existing_letter(self):
+        existing, _ = self.get_letter()
+        letter, created = self.get_letter()
+        self.assertFalse(created)
+        self.assertEqual(letter, existing)
+
+    def test_return_letter_of_concurrent_delivery(self):
+        existing = IncomingLetterFactory(
+            dedup_key=get_dedup_key(
+                "<race@example.com>",
+                "user-a@example.com",
+                "user-b@example.com",
+                "Odpowiedź",
+            )
+        )
+        select_for_update = QuerySet.select_for_update
+        # concurrent delivery commits its letter after the first lookup missed
+        with mock.patch.object(QuerySet, "first", return_value=None), mock.patch.object(
+            QuerySet, "select_for_update", autospec=True, side_effect=select_for_update
+        ) as locking_read:
+            letter, created = self.get_letter()
+        self.assertFalse(created)
+        self.assertEqual(letter, existing)
+        locking_read.assert_called_once()
+        self.assertEqual(Letter.objects.count(), 1)
@@ -1,11 +1,13 @@
 from io import StringIO
 
-from django.core.management import call_command
+from django.core.management import CommandError, call_command
 from django.test import TestCase
 
 from feder.cases.factories import CaseFactory
 from feder.letters.factories import IncomingLetterFactory, OutgoingLetterFactory
-from feder.letters.models import Letter
+from feder.letters.models import Letter, LetterEmailDomain
+from feder.letters.spam.stages import get_token_model
+from feder.letters.utils import get_dedup_key
 
 
 class FixDuplicateMailTestCase(TestCase):
@@ -53,3 +55,93 @@ class FixDuplicateMailTestCase(TestCase):
             stdout=stdout,
         )
         self.assertFalse(Letter.objects.filter(pk=in_dupe_id.id).exists())
+
+
+class FillLetterDedupKeysTestCase(TestCase):
+    def test_fill_only_first_of_duplicates(self):
+        kwargs = dict(
+            message_id_header="<xxxx@example.com>",
+            email_from="a@example.com",
+            email_to="b@example.com",
+            title="Hello",
+        )
+        first = IncomingLetterFactory(**kwargs)
+        dupe = IncomingLetterFactory(**kwargs)
+        other = IncomingLetterFactory(**{**kwargs, "title": "Re: Hello"})
+        outgoing = OutgoingLetterFactory()
+        stdout = StringIO()
+        call_command("fill_letter_dedup_keys", "--chunk-size=2", stdout=stdout)
+        for letter in (first, dupe, other, outgoing):
+            letter.refresh_from_db()
+        self.assertEqual(first.dedup_key, get_dedup_key(**self.get_key_kwargs()))
+        self.assertIsNone(dupe.dedup_key)
+        self.assertIsNotNone(other.dedup_key)
+        self.assertIsNone(outgoing.dedup_key)
+        self.assertIn("Filled: 2; duplicates skipped: 1", stdout.getvalue())
+
+    def get_key_kwargs(self):
+        return dict(
+            message_id="<xxxx@example.com>",
+            email_from="a@example.com",
+            email_to="b@example.com",
+            title="Hello",
+        )
+
+
+class LetterCheckSpamTestCase(TestCase):
+    def setUp(self):
+        LetterEmailDomain.objects.create(
+            domain_name="spammer.com", is_spammer_domain=True
+        )
+        self.spam = IncomingLetterFactory(email_from="user@spammer.com")
+        self.no_sender = IncomingLetterFactory(email_from="")
+        self.regular = IncomingLetterFactory(email_from="user@example.com")
+        self.validated = IncomingLetterFactory(
+            email_from="user@spammer.com", is_spam=Letter.SPAM.non_spam
+        )
+
+    def test_mark_probable_spam(self):
+        stdout = StringIO()
+        call_command("letter_check_spam", "--chunk-size=1", stdout=stdout)
+        self.assertIn(
+            "letters: 3; probable spam: 2",
+            stdout.getvalue(),
+        )
+        self.assertIn("Token model trained on 0 spam", stdout.getvalue())
+        self.assertIsNotNone(get_token_model())
+        self.assertEqual(
+            set(Letter.objects.filter(is_spam=Letter.SPAM.probable_spam)),
+            {self.spam, self.no_sender},
+        )
+
+    def test_dry_run(self):
+        stdout = StringIO()
+        call_command("letter_check_spam", "--dry-run", stdout=stdout)
+        self.assertIn("[dry run] letters: 3; probable spam: 2", stdout.getvalue())
+        self.assertFalse(
+            Letter.objects.filter(is_spam=Letter.SPAM.probable_spam).exists()
+        )
+
+    def test_filter_monitoring(self):
+        stdout = StringIO()
+        call_command(
+            "letter_check_spam",
+            f"--monitoring={self.regular.case.monitoring.pk}",
+            stdout=stdout,
+        )
+        self.assertIn("letters: 1;", stdout.getvalue())
+
+
+class BenchmarkLetterTextTestCase(TestCase):
+    def test_report_rates(self):
+        IncomingLetterFactory(html_body="<p>Hello</p>", html_quote="<p>Quote</p>")
+        stdout = StringIO()
+        call_command("benchmark_letter_text", "--repeat=1", stdout=stdout)
+        output = stdout.getvalue()
+        self.assertIn("Corpus: 2 documents", output)
+        self.assertIn("html_to_text, joined corpus: documents: 1", output)
+        self.assertIn("text_email_wrapper, long quote: documents: 1", output)
+
+    def test_require_corpus(self):
+        with self.assertRaises(CommandError):
+            call_command("benchmark_letter_text", stdout=StringIO())
@@ -0,0 +1,75 @@
+import os
+import tempfile
+from email.generator import BytesGenerator
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from io import BytesIO
+
+from django.core.files import File
+from django.test import SimpleTestCase
+
+from feder.letters.mime import (
+    ATTACHMENT_READ_SIZE,
+    AttachmentPart,
+    LetterMessage,
+    build_attachment,
+    message_to_file,
+)
+
+
+class StreamingGeneratorTestCase(SimpleTestCase):
+    def get_file(self, content):
+        fd, path = tempfile.mkstemp()
+        with os.fdopen(fd, "wb") as fp:
+            fp.write(content)
+        self.addCleanup(os.remove, path)
+        return File(open(path, "rb"), name=path)
+
+    def assertSameAsBytes(self, message):
+        with message_to_file(message, "letter.eml") as eml_file:
+            content = eml_file.read()
+        fp = BytesIO()
+        BytesGenerator(fp, mangle_from_=False).flatten(message, linesep="\n")
+        self.assertEqual(content, fp.getvalue())
+
+    def test_letter_message(self):
+        message = LetterMessage(
+            subject="Zażółć",
+            body="Lorem ipsum",
+            from_email="case@example.com",
+            to=["institution@example.com"],
+            attachments=[("data.txt", "content", "text/plain")],
+            attachment_files=[
+                (self.get_file(b"x" * (ATTACHMENT_READ_SIZE + 1)), "zażółć.bin"),
+                (self.get_file(b""), "empty.bin"),
+            ],
+        )
+        message.attach_alternative("<p>Lorem ipsum</p>", "text/html")
+        msg = message.message()
+
+        self.assertSameAsBytes(msg)
+        self.assertEqual(message.attachments, [("data.txt", "content", "text/plain")])
+        self.assertEqual(
+            [part.get_filename() for part in msg.walk() if part.get_filename()],
+            ["data.txt", "zażółć.bin", "empty.bin"],
+        )
+
+    def test_nested_multipart_with_preamble_and_epilogue(self):
+        alternative = MIMEMultipart("alternative")
+        alternative.attach(MIMEText("Lorem ipsum"))
+        alternative.attach(MIMEText("<p>Lorem ipsum</p>", "html"))
+        message = MIMEMultipart()
+        message.preamble = "This is a multi-part message in MIME format."
+        message.epilogue = "Epilogue"
+        message.attach(alternative)
+        message.attach(build_attachment(self.get_file(b"line\n" * 100), "a.txt"))
+
+        self.assertSameAsBytes(message)
+
+    def test_write_without_payload_in_memory(self):
+        part = build_attachment(self.get_file(b"content"), "a.txt")
+        message = MIMEMultipart()
+        message.attach(part)
+        message_to_file(message, "letter.eml").close()
+        self.assertIsInstance(part, AttachmentPart)
+        self.assertIsNone(part._encoded_payload)
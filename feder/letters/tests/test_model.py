@@ -1,22 +1,30 @@
 import email
+from unittest.mock import patch
 
 from django.core import mail
+from django.core.files.base import ContentFile
+from django.template.loader import render_to_string
 from django.test import TestCase
 
 from feder.cases.factories import CaseFactory
 from feder.cases.models import Case
+from feder.cases_tags.factories import TagFactory
 from feder.institutions.factories import InstitutionFactory
 from feder.letters.utils import normalize_msg_id
+from feder.main.exceptions import FederError
 from feder.monitorings.factories import MonitoringFactory
+from feder.monitorings.tasks import send_mass_draft
 from feder.users.factories import UserFactory
 
 from ..factories import (
+    AttachmentFactory,
     IncomingLetterFactory,
     LetterFactory,
     OutgoingLetterFactory,
     SendOutgoingLetterFactory,
 )
-from ..models import Letter
+from ..mime import ATTACHMENT_READ_SIZE, AttachmentPart, LetterMessage, message_to_file
+from ..models import Attachment, Letter, MassMessageDraft
 
 
 class ModelTestCase(TestCase):
@@ -114,3 +122,152 @@ class ModelTestCase(TestCase):
             mail.outbox[0].body,
             "Email for a new case should contain footer text from monitoring",
         )
+
+    def test_send_streams_attachments(self):
+        letter = OutgoingLetterFactory()
+        contents = [b"x" * (ATTACHMENT_READ_SIZE + 1), b"line\n", b""]
+        for i, content in enumerate(contents):
+            AttachmentFactory(
+                letter=letter,
+                attachment=ContentFile(content, name=f"zażółć-{i}.txt"),
+            )
+        letter.send()
+        for message in (
+            mail.outbox[0].message(),
+            email.message_from_bytes(mail.outbox[0].message().as_bytes()),
+            email.message_from_bytes(letter.eml.read()),
+        ):
+            attachments = sorted(
+                (part.get_filename(), part.get_payload(decode=True))
+                for part in message.walk()
+                if part.get_content_disposition() == "attachment"
+            )
+            self.assertEqual(
+                attachments,
+                [(f"zażółć-{i}.txt", content) for i, content in enumerate(contents)],
+            )
+
+    def test_write_eml_without_attachment_payload(self):
+        letter = OutgoingLetterFactory()
+        AttachmentFactory(
+            letter=letter, attachment=ContentFile(b"x" * 1000, name="file.txt")
+        )
+        message = letter._construct_message().message()
+        with message_to_file(message, "letter.eml") as eml_file:
+            content = eml_file.read()
+        part = next(x for x in message.walk() if isinstance(x, AttachmentPart))
+        self.assertIsNone(part._encoded_payload)
+        self.assertEqual(content, message.as_bytes(linesep="\n"))
+
+    def test_failed_send_deletes_eml(self):
+        letter = OutgoingLetterFactory(eml=None, is_draft=True)
+        storage = letter.eml.storage
+        with patch.object(LetterMessage, "send", side_effect=OSError("Lost")), patch(
+            "feder.letters.models.uuid"
+        ) as uuid, self.assertRaises(OSError):
+            uuid.uuid4.return_value = "failed"
+            letter.send()
+        self.assertFalse(letter.eml)
+        self.assertTrue(letter.is_draft)
+        letter.refresh_from_db()
+        self.assertFalse(letter.eml)
+        self.assertFalse(
+            storage.exists(letter.eml.field.generate_filename(letter, "failed.eml"))
+        )
+
+    def test_send_new_case_renders_request_once_per_monitoring(self):
+        monitoring = MonitoringFactory(email_footer="first footer")
+        cases = CaseFactory.create_batch(size=2, monitoring=monitoring)
+        with patch(
+            "feder.letters.models.render_to_string", side_effect=render_to_string
+        ) as render:
+            Letter.send_new_case(case=cases[0])
+            Letter.send_new_case(case=cases[1])
+        # request bodies once, then email bodies per letter
+        self.assertEqual(render.call_count, 6)
+        self.assertIn(cases[1].email, mail.outbox[1].body)
+        self.assertNotIn(cases[0].email, mail.outbox[1].body)
+
+        monitoring.email_footer = "second footer"
+        monitoring.save()
+        case = CaseFactory(monitoring=monitoring)
+        Letter.send_new_case(case=case)
+        self.assertIn("second footer", mail.outbox[2].body)
+
+
+class MassLettersTestCase(TestCase):
+    def setUp(self):
+        self.monitoring = MonitoringFactory()
+        self.tag = TagFactory(monitoring=self.monitoring)
+        self.other_tag = TagFactory(monitoring=self.monitoring)
+        self.cases = [
+            CaseFactory(monitoring=self.monitoring, tags=[self.tag, self.other_tag])
+            for _ in range(3)
+        ]
+        CaseFactory(monitoring=self.monitoring)
+        self.draft = OutgoingLetterFactory(
+            is_draft=True,
+            message_type=Letter.MESSAGE_TYPES.mass_draft,
+            record__case=None,
+        )
+        mass_draft = MassMessageDraft.objects.create(
+            letter=self.draft, monitoring=self.monitoring
+        )
+        mass_draft.recipients_tags.set([self.tag, self.other_tag])
+        self.attachment = AttachmentFactory(letter=self.draft)
+
+    def test_generate_letter_for_each_case(self):
+        with patch("feder.letters.models.LETTER_MASS_CHUNK_SIZE", 2):
+            letters = self.draft.generate_mass_letters()
+        self.assertCountEqual([x.case for x in letters], self.cases)
+        for letter in letters:
+            self.assertEqual(Letter.objects.get(pk=letter.pk).title, self.draft.title)
+            self.assertFalse(letter.is_draft)
+
+    def test_schedule_index_of_generated_letters(self):
+        with patch("feder.letters.models.is_available", return_value=True), patch(
+            "feder.letters.models.schedule_index_letter"
+        ) as schedule:
+            letters = self.draft.generate_mass_letters()
+        self.assertCountEqual(
+            [x.args[0] for x in schedule.call_args_list], [x.pk for x in letters]
+        )
+
+    def test_keep_mass_draft_until_all_letters_sent(self):
+        with patch.object(
+            LetterMessage, "send", side_effect=[OSError("Lost"), 1, 1]
+        ), self.assertRaises(FederError):
+            send_mass_draft.now(self.draft.pk)
+        self.assertTrue(Letter.objects.filter(pk=self.draft.pk).exists())
+        self.assertEqual(self.draft.generated_letters.unsent().count(), 1)
+
+        send_mass_draft.now(self.draft.pk)
+        self.assertFalse(Letter.objects.filter(pk=self.draft.pk).exists())
+        self.assertFalse(
+            Letter.objects.filter(record__case__in=self.cases).unsent().exists()
+        )
+
+    def test_skip_cases_generated_before(self):
+        letters = self.draft.generate_mass_letters()
+        self.assertEqual(self.draft.generate_mass_letters(), [])
+        self.assertCountEqual(self.draft.generated_letters.all(), letters)
+
+    def test_share_attachment_file(self):
+        letters = self.draft.generate_mass_letters()
+        name = self.attachment.attachment.name
+        self.assertEqual(
+            Attachment.objects.filter(attachment=name).count(), len(letters) + 1
+        )
+        storage = self.attachment.attachment.storage
+        with self.captureOnCommitCallbacks(execute=True):
+            self.draft.delete()
+        self.assertTrue(storage.exists(name))
+        with self.captureOnCommitCallbacks(execute=True):
+            Letter.objects.filter(pk__in=[x.pk for x in letters]).delete()
+        self.assertFalse(storage.exists(name))
+
+    def test_send_generated_letters(self):
+        letters = self.draft.generate_mass_letters()
+        for letter in letters:
+            letter.send()
+        self.assertEqual(len(mail.outbox), 3)
@@ -0,0 +1,67 @@
+from django.test import TestCase
+
+from feder.domains.factories import DomainFactory
+from feder.letters.factories import IncomingLetterFactory
+from feder.letters.models import Letter, LetterEmailDomain
+from feder.letters.reputation import DomainReputation
+
+
+class DomainReputationTestCase(TestCase):
+    def setUp(self):
+        self.reputation = DomainReputation()
+
+    def get_letter(self, **kwargs):
+        kwargs.setdefault("email_from", "user@example.com")
+        kwargs.setdefault("email_to", "case@fedrowanie.example.org")
+        return IncomingLetterFactory(**kwargs)
+
+    def test_register_domains(self):
+        DomainFactory(name="fedrowanie.example.org")
+        self.reputation.register_letter(self.get_letter())
+        self.reputation.register_letter(self.get_letter())
+        self.reputation.flush()
+        from_domain = LetterEmailDomain.objects.get(domain_name="example.com")
+        to_domain = LetterEmailDomain.objects.get(domain_name="fedrowanie.example.org")
+        self.assertEqual(from_domain.email_from_count, 2)
+        self.assertFalse(from_domain.is_trusted_domain)
+        self.assertEqual(to_domain.email_to_count, 2)
+        self.assertTrue(to_domain.is_trusted_domain)
+
+    def test_register_letter_without_domain_queries(self):
+        self.reputation.register_letter(self.get_letter())
+        letter = self.get_letter()
+        with self.assertNumQueries(0):
+            self.reputation.register_letter(letter)
+
+    def test_flush_counters_in_single_query_per_domain(self):
+        for _ in range(3):
+            self.reputation.register_letter(self.get_letter())
+        with self.assertNumQueries(2):
+            self.reputation.flush()
+        self.assertEqual(
+            LetterEmailDomain.objects.get(domain_name="example.com").email_from_count,
+            3,
+        )
+
+    def test_spam_check_uses_updated_flags(self):
+        domain = LetterEmailDomain.objects.create(domain_name="example.com")
+        letter = self.get_letter()
+        self.assertFalse(self.reputation.is_spammer_domain("example.com"))
+        domain.is_spammer_domain = True
+        domain.save()
+        letter.spam_check()
+        letter.refresh_from_db()
+        self.assertEqual(letter.is_spam, Letter.SPAM.probable_spam)
+
+    def test_set_flags_keeps_spammer_domain_set_meanwhile(self):
+        self.reputation.register_letter(self.get_letter(email_from="user@example.org"))
+        LetterEmailDomain.objects.filter(domain_name="example.org").update(
+            is_spammer_domain=True
+        )
+        letter = self.get_letter(
+            email_from="case@fedrowanie.siecobywatelska.pl", email_to="user@example.org"
+        )
+        self.reputation.register_letter(letter)
+        domain = LetterEmailDomain.objects.get(domain_name="example.org")
+        self.assertTrue(domain.is_spammer_domain)
+        self.assertTrue(domain.is_monitoring_email_to_domain)
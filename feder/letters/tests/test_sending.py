@@ -0,0 +1,76 @@
+from unittest.mock import patch
+
+from django.core import mail
+from django.core.mail import get_connection
+from django.test import TestCase
+
+from feder.cases.factories import CaseFactory
+from feder.monitorings.factories import MonitoringFactory
+
+from ..factories import OutgoingLetterFactory
+from ..models import Letter
+from ..sending import MassSender, RateLimiter
+
+
+class MassSenderTestCase(TestCase):
+    def setUp(self):
+        self.monitoring = MonitoringFactory()
+        self.letters = [
+            OutgoingLetterFactory(record__case__monitoring=self.monitoring, eml=None)
+            for _ in range(5)
+        ]
+        self.sender = MassSender(concurrency=1, batch_size=2, rate_limit=0)
+
+    def get_letters(self):
+        return Letter.objects.filter(pk__in=[x.pk for x in self.letters])
+
+    def test_send_letters_reusing_connection(self):
+        with patch(
+            "feder.letters.sending.get_connection", side_effect=get_connection
+        ) as connection:
+            self.assertEqual(self.sender.send_letters(self.get_letters()), 5)
+        self.assertEqual(connection.call_count, 3)
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertFalse(self.get_letters().unsent().exists())
+
+    def test_resume_skip_sent_letters(self):
+        self.letters[0].send()
+        mail.outbox = []
+        self.assertEqual(self.sender.send_letters(self.get_letters()), 4)
+        self.assertEqual(len(mail.outbox), 4)
+
+    def test_failed_letter_stays_unsent(self):
+        def send(letter, connection):
+            letter.send(connection=connection)
+            if letter.pk == self.letters[0].pk:
+                raise OSError("Connection lost")
+
+        sent = self.sender.run(
+            self.get_letters().for_sending(), get_domain=lambda x: None, send=send
+        )
+        self.assertEqual(sent, 4)
+        self.assertEqual(list(self.get_letters().unsent()), [self.letters[0]])
+
+    def test_send_new_cases(self):
+        cases = [CaseFactory(monitoring=self.monitoring) for _ in range(2)]
+        qs = self.monitoring.case_set.filter(pk__in=[x.pk for x in cases])
+        self.assertEqual(self.sender.send_new_cases(qs), 2)
+        self.assertEqual(self.sender.send_new_cases(qs), 0)
+        self.assertEqual(len(mail.outbox), 2)
+
+    def test_send_in_transaction_without_threads(self):
+        sender = MassSender(concurrency=4, batch_size=2, rate_limit=0)
+        with patch("feder.letters.sending.ThreadPoolExecutor") as executor:
+            self.assertEqual(sender.send_letters(self.get_letters()), 5)
+        executor.assert_not_called()
+
+
+class RateLimiterTestCase(TestCase):
+    @patch("feder.letters.sending.time.sleep")
+    def test_wait_per_key(self, sleep):
+        limiter = RateLimiter(rate=2)
+        limiter.wait("a")
+        limiter.wait("b")
+        sleep.assert_not_called()
+        limiter.wait("a")
+        self.assertAlmostEqual(sleep.call_args[0][0], 0.5, places=1)
@@ -0,0 +1,169 @@
+import gzip
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.test import TestCase
+
+from feder.letters.factories import IncomingLetterFactory, get_email
+from feder.letters.models import Letter, LetterEmailDomain, ReputableLetterEmailTLD
+from feder.letters.spam import get_pipeline
+from feder.letters.spam.stages import (
+    TOKEN_MODEL_MAX_TOKENS,
+    HeaderStage,
+    ReputableTLDStage,
+    TokenModelStage,
+    clear_token_model,
+    get_token_model,
+    train_token_model,
+    update_token_model,
+)
+from feder.users.factories import UserFactory
+
+
+class SpamPipelineTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        clear_token_model()
+
+    def test_mark_letter_without_sender(self):
+        letter = IncomingLetterFactory(email_from="")
+        with patch.object(HeaderStage, "score") as score:
+            letter.spam_check()
+        score.assert_not_called()
+        letter.refresh_from_db()
+        self.assertEqual(letter.is_spam, Letter.SPAM.probable_spam)
+
+    def test_mark_letter_from_spammer_domain(self):
+        LetterEmailDomain.objects.create(
+            domain_name="spammer.com", is_spammer_domain=True
+        )
+        letter = IncomingLetterFactory(email_from="user@spammer.com")
+        letter.spam_check()
+        letter.refresh_from_db()
+        self.assertEqual(letter.is_spam, Letter.SPAM.probable_spam)
+
+    def test_keep_validated_letter(self):
+        letter = IncomingLetterFactory(email_from="", is_spam=Letter.SPAM.non_spam)
+        letter.spam_check()
+        letter.refresh_from_db()
+        self.assertEqual(letter.is_spam, Letter.SPAM.non_spam)
+
+    def test_header_spam_flag(self):
+        msg = get_email()
+        msg["X-Spam-Flag"] = "YES"
+        letter = IncomingLetterFactory(email_from="user@example.com")
+        letter.eml.save(
+            "spam.eml.gz", ContentFile(gzip.compress(msg.as_bytes())), save=True
+        )
+        self.assertEqual(HeaderStage().score(letter), 1.0)
+        letter.spam_check()
+        letter.refresh_from_db()
+        self.assertEqual(letter.is_spam, Letter.SPAM.probable_spam)
+
+    def test_header_without_spam_flag(self):
+        letter = IncomingLetterFactory(email_from="user@example.com")
+        self.assertEqual(HeaderStage().score(letter), 0.0)
+
+    def test_reputable_tld(self):
+        ReputableLetterEmailTLD.objects.create(name="pl")
+        stage = ReputableTLDStage()
+        stage.prepare([])
+        self.assertLess(stage.score(Letter(email_from="user@gmina.pl")), 0)
+        self.assertGreater(stage.score(Letter(email_from="user@example.xyz")), 0)
+
+    def train_token_model(self):
+        user = UserFactory()
+        for i in range(10):
+            IncomingLetterFactory(
+                title=f"cheap pills {i}",
+                body="buy cheap pills now",
+                is_spam=Letter.SPAM.spam,
+                mark_spam_by=user,
+            )
+            IncomingLetterFactory(
+                title=f"public information {i}",
+                body="answer to request for public information",
+                is_spam=Letter.SPAM.non_spam,
+            )
+        update_token_model()
+
+    def test_token_model(self):
+        self.train_token_model()
+        stage = TokenModelStage()
+        stage.model = get_token_model()
+        self.assertGreater(stage.score(Letter(title="pills", body="cheap pills")), 0.5)
+        self.assertLess(
+            stage.score(Letter(title="request", body="public information")), -0.5
+        )
+
+    def test_token_model_limited_to_most_frequent_tokens(self):
+        body = " ".join(f"word{i}" for i in range(TOKEN_MODEL_MAX_TOKENS + 10))
+        IncomingLetterFactory(title="common", body=body, is_spam=Letter.SPAM.non_spam)
+        IncomingLetterFactory(title="common", body="", is_spam=Letter.SPAM.non_spam)
+        model = train_token_model()
+        self.assertEqual(len(model["ham"]["counts"]), TOKEN_MODEL_MAX_TOKENS)
+        self.assertEqual(model["ham"]["counts"]["common"], 2)
+
+    def test_token_model_not_trained_on_check(self):
+        letter = IncomingLetterFactory(email_from="user@example.com")
+        with patch("feder.letters.spam.stages.train_token_model") as train, patch(
+            "feder.letters.tasks.train_spam_token_model"
+        ) as task:
+            letter.spam_check()
+            IncomingLetterFactory(email_from="user@example.com").spam_check()
+        train.assert_not_called()
+        task.assert_called_once_with()
+
+    def test_token_model_cached_in_process(self):
+        update_token_model()
+        with self.assertNumQueries(0), patch.object(cache, "get") as cache_get:
+            self.assertIsNotNone(get_token_model())
+        cache_get.assert_not_called()
+
+    def test_heuristics_alone_are_not_spam(self):
+        pipeline = get_pipeline(["sender", "header", "tld", "tokens"])
+        letter = IncomingLetterFactory(email_from="user@example.xyz")
+        with patch.object(ReputableTLDStage, "score", return_value=0.25), patch.object(
+            TokenModelStage, "score", return_value=0.75
+        ):
+            self.assertFalse(pipeline.is_spam(letter))
+            with patch.object(HeaderStage, "score", return_value=0.25):
+                self.assertTrue(pipeline.is_spam(letter))
+
+    def test_confident_token_model_alone_is_spam(self):
+        self.train_token_model()
+        pipeline = get_pipeline(["tokens"])
+        letter = IncomingLetterFactory(
+            email_from="user@example.com",
+            title="cheap pills now",
+            body="buy cheap pills now",
+        )
+        self.assertTrue(pipeline.is_spam(letter))
+        with patch.object(TokenModelStage, "score", return_value=0.75):
+            self.assertFalse(pipeline.is_spam(letter))
+
+    def test_reputable_tld_keeps_header_spam_flag(self):
+        ReputableLetterEmailTLD.objects.create(name="pl")
+        pipeline = get_pipeline(["sender", "tld", "header"])
+        letter = IncomingLetterFactory(email_from="user@gmina.pl")
+        self.assertFalse(pipeline.is_spam(letter))
+        with patch.object(HeaderStage, "score", return_value=1.0):
+            self.assertTrue(pipeline.is_spam(letter))
+
+    def test_reclassify_in_batch(self):
+        LetterEmailDomain.objects.create(
+            domain_name="spammer.com", is_spammer_domain=True
+        )
+        spam = [IncomingLetterFactory(email_from="user@spammer.com") for _ in range(3)]
+        regular = IncomingLetterFactory(email_from="user@example.com")
+        pipeline = get_pipeline(["sender", "domain", "tld"])
+        letter_count, spam_count = pipeline.reclassify(
+            Letter.objects.order_by("pk"), chunk_size=10
+        )
+        self.assertEqual((letter_count, spam_count), (4, 3))
+        self.assertEqual(
+            set(Letter.objects.filter(is_spam=Letter.SPAM.probable_spam)), set(spam)
+        )
+        regular.refresh_from_db()
+        self.assertEqual(regular.is_spam, Letter.SPAM.unknown)
@@ -1,6 +1,11 @@
 from unittest import TestCase
 
-from feder.letters.utils import normalize_msg_id
+from feder.letters.utils import (
+    get_dedup_key,
+    html_to_text,
+    normalize_msg_id,
+    text_email_wrapper,
+)
 
 
 class normalize_msg_idTestCase(TestCase):
@@ -15,3 +20,51 @@ class normalize_msg_idTestCase(TestCase):
     def test_various_results_compare(self):
         for input, result in self.RESULT.items():
             self.assertEqual(normalize_msg_id(input), result)
+
+
+class GetDedupKeyTestCase(TestCase):
+    def test_normalize_message(self):
+        self.assertEqual(
+            get_dedup_key("<xxx@example.com>", "A@example.com", None, "Hello "),
+            get_dedup_key("xxx@example.com", "a@example.com", "", "Hello"),
+        )
+
+    def test_distinguish_subject(self):
+        self.assertNotEqual(
+            get_dedup_key("xxx@example.com", "a@example.com", None, "Hello"),
+            get_dedup_key("xxx@example.com", "a@example.com", None, "Re: Hello"),
+        )
+
+
+class HtmlToTextTestCase(TestCase):
+    HTML = (
+        "<p>Dzień dobry,</p><ul><li>first</li><li>second</li></ul>"
+        "<ol><li>one</li></ol><script>x</script><blockquote>a<br>b</blockquote>"
+    )
+
+    def test_convert_lists_and_paragraphs(self):
+        self.assertEqual(
+            html_to_text(self.HTML),
+            "\nDzień dobry,  - first  - second  1. onexa\nb",
+        )
+
+    def test_convert_long_html(self):
+        html = "<p>quoted line</p>" * 20000
+        self.assertEqual(html_to_text(html), "\nquoted line" * 20000)
+
+
+class TextEmailWrapperTestCase(TestCase):
+    def test_quote_lines(self):
+        text = "Hello\n\n  indented\tline \r\n" + "word " * 20
+        self.assertEqual(
+            text_email_wrapper(text),
+            "> Hello\n> indented        line\n> "
+            + "word " * 14
+            + "word\n> "
+            + "word " * 4
+            + "word\n",
+        )
+
+    def test_quote_long_text(self):
+        text = "quoted line\n" * 100000
+        self.assertEqual(text_email_wrapper(text), "> quoted line\n" * 100000)
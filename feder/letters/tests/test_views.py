@@ -1,7 +1,9 @@
 import codecs
+import gzip
 import json
 import os
 from datetime import datetime
+from unittest.mock import patch
 
 from django.core import mail
 from django.core.files.base import ContentFile
@@ -15,7 +17,8 @@ from guardian.shortcuts import assign_perm
 from feder.alerts.models import Alert
 from feder.cases.factories import CaseFactory
 from feder.cases.models import Case
-from feder.letters.models import Letter
+from feder.letters.ingestion import process_queued_emails
+from feder.letters.models import IncomingEmail, Letter
 from feder.letters.settings import LETTER_RECEIVE_SECRET
 from feder.main.tests import PermissionStatusMixin
 from feder.monitorings.factories import MonitoringFactory
@@ -254,7 +257,10 @@ class LetterReplyViewTestCase(ObjectMixin, PermissionStatusMixin, TestCase):
         self.assertEqual(len(mail.outbox), 1)
         new_letter = Letter.objects.filter(title="Lorem").get()
         new_attachment = new_letter.attachment_set.get()
-        self.assertEqual(mail.outbox[0].attachments[0][0], new_attachment.filename)
+        # files are attached as MIME parts encoded from storage on write
+        self.assertEqual(
+            mail.outbox[0].attachment_parts[0].get_filename(), new_attachment.filename
+        )
         self.assertEqual(Record.objects.count(), 3)
 
     def test_no_send_drafts(self):
@@ -532,6 +538,24 @@ class ReceiveEmailTestCase(TestCase):
         )
         self.assertEqual(attachment.attachment.read().decode("utf8"), "54321")
 
+    def test_compress_uncompressed_eml(self):
+        case = CaseFactory()
+        body = self._get_body(case)
+        body["eml"]["compressed"] = False
+        files = self._get_files(body)
+        files["eml"] = SimpleUploadedFile(
+            name="a9a7b32cdfa34a7f91c826ff9b3831bb.eml",
+            content=b"12345",
+            content_type="message/rfc822",
+        )
+
+        response = self.client.post(path=self.authenticated_url, data=files)
+        self.assertEqual(response.json()["status"], "OK")
+
+        letter = case.record_set.all()[0].content_object
+        self.assertTrue(letter.eml.name.endswith(".eml.gz"))
+        self.assertEqual(gzip.decompress(letter.eml.read()), b"12345")
+
     def test_vacation_reply_type(self):
         case = CaseFactory()
         body = self._get_body(case, auto_reply_type="vacation-reply")
@@ -622,6 +646,55 @@ class ReceiveEmailTestCase(TestCase):
         response = self.client.post(path=self.authenticated_url, data=files)
         self.assertEqual(response.status_code, 400)
 
+    @patch("feder.letters.views.LETTER_RECEIVE_ASYNC", True)
+    def test_spool_email(self):
+        case = CaseFactory()
+        files = self._get_files(self._get_body(case))
+
+        response = self.client.post(path=self.authenticated_url, data=files)
+        self.assertEqual(response.json()["status"], "OK")
+        incoming_email = IncomingEmail.objects.get(pk=response.json()["incoming_email"])
+        self.assertEqual(incoming_email.status, IncomingEmail.STATUS.queued)
+        self.assertEqual(IncomingEmail.objects.stats()["queue_depth"], 1)
+        self.assertEqual(case.record_set.count(), 0)
+
+        self.assertEqual(process_queued_emails(), 1)
+        incoming_email.refresh_from_db()
+        self.assertEqual(incoming_email.status, IncomingEmail.STATUS.processed)
+        self.assertEqual(IncomingEmail.objects.stats()["queue_depth"], 0)
+        letter = case.record_set.get().content_object
+        self.assertEqual(incoming_email.letter, letter)
+        self.assertEqual(
+            codecs.decode(letter.eml.read(), "zlib").decode("utf-8"), "12345"
+        )
+        attachment = letter.attachment_set.get()
+        self.assertEqual(attachment.attachment.read().decode("utf8"), "54321")
+
+    @patch("feder.letters.views.LETTER_RECEIVE_ASYNC", True)
+    def test_spool_redelivered_email_once(self):
+        body = self._get_body(CaseFactory())
+        for _ in range(2):
+            response = self.client.post(
+                path=self.authenticated_url, data=self._get_files(body)
+            )
+            self.assertEqual(response.json()["status"], "OK")
+        self.assertEqual(IncomingEmail.objects.count(), 1)
+
+    @patch("feder.letters.views.LETTER_RECEIVE_ASYNC", True)
+    def test_process_received_email_once(self):
+        case = CaseFactory()
+        body = self._get_body(case)
+        self.client.post(path=self.authenticated_url, data=self._get_files(body))
+        process_queued_emails()
+        self.client.post(path=self.authenticated_url, data=self._get_files(body))
+        process_queued_emails()
+
+        self.assertEqual(case.record_set.count(), 1)
+        first, second = IncomingEmail.objects.all()
+        self.assertEqual(second.status, IncomingEmail.STATUS.processed)
+        self.assertEqual(second.letter, first.letter)
+        self.assertFalse(second.attachments.exists())
+
     def _get_files(self, body):
         files = MultiValueDict()
         files["manifest"] = SimpleUploadedFile(
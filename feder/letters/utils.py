@@ -1,13 +1,19 @@
+import gzip
+import hashlib
+import io
 import re
+import tempfile
 from html.parser import HTMLParser
 from textwrap import TextWrapper
 
 from bleach.sanitizer import Cleaner
 from django.conf import settings
+from django.core.files import File
 from django.forms.widgets import TextInput
 
 BODY_REPLY_TPL = "\n\nProsimy o odpowiedź na adres {{EMAIL}}"
 BODY_FOOTER_SEPERATOR = "\n\n--\n"
+COMPRESS_CHUNK_SIZE = 64 * 1024
 
 
 cleaner = Cleaner(
@@ -20,12 +26,16 @@ cleaner = Cleaner(
 class HTMLFilter(HTMLParser):
     def __init__(self):
         super().__init__()
-        self.text = ""
+        self.parts = []
         self.list_counter = 0
         self.list_type = ""
 
+    @property
+    def text(self):
+        return "".join(self.parts)
+
     def handle_data(self, data):
-        self.text += data
+        self.parts.append(data)
 
     def handle_starttag(self, tag, attrs):
         if tag == "ul":
@@ -34,9 +44,9 @@ class HTMLFilter(HTMLParser):
             self.list_type = "ol"
         elif tag == "li":
             self.list_counter += 1
-            self.text += self.get_list_prefix()
+            self.parts.append(self.get_list_prefix())
         elif tag == "br" or tag == "p":
-            self.text += "\n"
+            self.parts.append("\n")
 
     def handle_endtag(self, tag):
         if tag == "ul" or tag == "ol":
@@ -48,33 +58,47 @@ class HTMLFilter(HTMLParser):
             return "  - "
         elif self.list_type == "ol":
             return f"  {self.list_counter}. "
+        return ""
 
     def handle_entityref(self, name):
         if name == "nbsp":
-            self.text += " "
+            self.parts.append(" ")
 
     def handle_charref(self, name):
         if name == "160":
-            self.text += " "
+            self.parts.append(" ")
 
 
 def html_to_text(html):
     parser = HTMLFilter()
     parser.feed(cleaner.clean(html))
+    parser.close()
     return parser.text
 
 
+quote_wrapper = TextWrapper(
+    width=80, break_long_words=False, initial_indent="> ", subsequent_indent="> "
+)
+
+
+def iter_quoted_lines(text):
+    """
+    Yields lines of text wrapped and prefixed as email quote, skipping empty ones.
+    """
+    width = quote_wrapper.width - len(quote_wrapper.initial_indent)
+    for line in io.StringIO(text):
+        line = line.strip()
+        if not line:
+            continue
+        # short lines without tabs or control characters are not changed
+        if len(line) <= width and line.isprintable():
+            yield quote_wrapper.initial_indent + line
+        else:
+            yield from quote_wrapper.wrap(line)
+
+
 def text_email_wrapper(text):
-    wrapper = TextWrapper(width=80, break_long_words=False)
-    wrapper.subsequent_indent = "> "
-    wrapper.initial_indent = "> "
-    lines = text.split("\n")
-    wrapped_text = ""
-    for line in lines:
-        wrapped_line = "\n".join(wrapper.wrap(line.strip()))
-        if wrapped_line:
-            wrapped_text += wrapped_line + "\n"
-    return wrapped_text
+    return "".join(f"{line}\n" for line in iter_quoted_lines(text))
 
 
 def html_email_wrapper(html_quote):
@@ -82,6 +106,19 @@ def html_email_wrapper(html_quote):
     return html
 
 
+def gzip_file(file_obj, name):
+    """
+    Compress uploaded file chunk by chunk into temporary file,
+    so the content is never kept in memory as a whole.
+    """
+    tmp = tempfile.TemporaryFile()
+    with gzip.GzipFile(fileobj=tmp, mode="wb") as fp:
+        for chunk in file_obj.chunks(COMPRESS_CHUNK_SIZE):
+            fp.write(chunk)
+    tmp.seek(0)
+    return File(tmp, name=name)
+
+
 def normalize_msg_id(msg_id):
     if msg_id[0] == "<":
         msg_id = msg_id[1:]
@@ -90,6 +127,19 @@ def normalize_msg_id(msg_id):
     return msg_id
 
 
+def get_dedup_key(message_id, email_from, email_to, title):
+    """
+    Returns hash identifying received message regardless of redelivery.
+    """
+    parts = [
+        (message_id or "").strip().lstrip("<").rstrip(">"),
+        (email_from or "").strip().lower(),
+        (email_to or "").strip().lower(),
+        (title or "").strip(),
+    ]
+    return hashlib.sha256("\0".join(parts).encode("utf-8")).hexdigest()
+
+
 def is_spam_check(email_object):
     return email_object["X-Spam-Flag"] == "YES"
 
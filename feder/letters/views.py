@@ -23,7 +23,7 @@ from django.conf import settings
 from django.contrib.messages.views import SuccessMessageMixin
 from django.contrib.syndication.views import Feed
 from django.core.exceptions import PermissionDenied
-from django.core.files.base import ContentFile
+from django.core.files import File
 from django.db.models import Q
 from django.http import HttpResponseBadRequest, JsonResponse
 from django.shortcuts import get_object_or_404
@@ -41,7 +41,7 @@ from guardian.shortcuts import get_anonymous_user
 from feder.alerts.models import Alert
 from feder.cases.models import Case
 from feder.letters.formsets import AttachmentInline
-from feder.letters.settings import LETTER_RECEIVE_SECRET
+from feder.letters.settings import LETTER_RECEIVE_ASYNC, LETTER_RECEIVE_SECRET
 from feder.main.mixins import (
     AttrPermissionRequiredMixin,
     BaseXSendFileView,
@@ -54,8 +54,11 @@ from feder.virus_scan.models import Request as ScanRequest
 
 from .filters import LetterFilter
 from .forms import AssignLetterForm, LetterForm, ReplyForm
+from .ingestion import receive_letter
 from .mixins import LetterObjectFeedMixin, LetterSummaryTableMixin
-from .models import Attachment, Letter, LetterEmailDomain
+from .models import Attachment, IncomingEmail, Letter
+from .tasks import process_incoming_emails
+from .utils import gzip_file
 
 _("Letters index")
 
@@ -679,82 +682,19 @@ class ReceiveEmail(View):
                 'The acceptable format version is "{}".'.format(self.required_version)
             )
 
-        eml_data = request.FILES["eml"]
-        logger.info(f'Letter to add: {manifest["headers"]}')
-        letter = self.get_letter(
-            headers=manifest["headers"],
-            eml_manifest=manifest["eml"],
-            text=manifest["text"],
-            eml_data=eml_data,
-        )
-        LetterEmailDomain.register_letter_email_domains(letter=letter)
-        # TODO
-        # letter.spam_check()
-        Attachment.objects.bulk_create(
-            self.get_attachment(attachment, letter)
-            for attachment in request.FILES.getlist("attachment")
-        )
-        return JsonResponse({"status": "OK", "letter": letter.pk})
-
-    def get_letter(self, headers, eml_manifest, text, eml_data, **kwargs):
-        case = self.get_case(headers["to+"])
-        eml_file = self.get_eml_file(eml_manifest, eml_data)
-        from_email = headers["from"][0] if headers["from"][0] else "unknown@domain.gov"
-
-        auto_reply = headers.get("auto_reply_type")
-        if auto_reply is not None:
-            auto_reply = auto_reply.replace("-", "_")
-            message_type = getattr(
-                Letter.MESSAGE_TYPES, auto_reply, Letter.MESSAGE_TYPES.unknown
+        eml_file = self.get_eml_file(manifest["eml"], request.FILES["eml"])
+        attachments = request.FILES.getlist("attachment")
+        if LETTER_RECEIVE_ASYNC:
+            incoming_email = IncomingEmail.objects.spool(
+                manifest=manifest, eml_file=eml_file, attachments=attachments
             )
-        else:
-            message_type = Letter.MESSAGE_TYPES.regular
-
-        if Letter.objects.filter(
-            email_from=headers["from"][0] if headers["from"][0] else None,
-            email_to=headers["to"][0] if headers["from"][0] else None,
-            message_id_header=headers["message_id"],
-            title=headers["subject"],
-        ).exists():
-            letter_to_add = Letter.objects.filter(
-                email_from=headers["from"][0] if headers["from"][0] else None,
-                email_to=headers["to"][0] if headers["from"][0] else None,
-                message_id_header=headers["message_id"],
-                title=headers["subject"],
-            ).first()
-            letter_to_add.spam_check()
-            logger.info(f"Request skipped, letter exists: {letter_to_add.pk}")
-            return letter_to_add
-
-        letter_to_add = Letter.objects.create(
-            author_institution=case.institution if case else None,
-            email=from_email,
-            email_from=headers["from"][0] if headers["from"][0] else None,
-            email_to=headers["to"][0] if headers["from"][0] else None,
-            message_id_header=headers["message_id"],
-            record=Record.objects.create(case=case),
-            message_type=message_type,
-            title=headers["subject"],
-            body=text["content"],
-            html_body=text.get("html_content", ""),
-            quote=text["quote"],
-            html_quote=text.get("html_quote", ""),
-            eml=eml_file,
-            is_draft=False,
-        )
-        letter_to_add.spam_check()
-        logger.info(f"Request processed, letter added: {letter_to_add.pk}")
-        return letter_to_add
-
-    def get_case(self, to_plus):
-        return Case.objects.select_related("institution").by_addresses(to_plus).first()
-
-    def get_attachment(self, attachment, letter):
-        file_obj = ContentFile(content=attachment.read(), name=attachment.name)
-        return Attachment(letter=letter, attachment=file_obj)
+            process_incoming_emails()
+            return JsonResponse({"status": "OK", "incoming_email": incoming_email.pk})
+        letter, _ = receive_letter(manifest, eml_file, attachments)
+        return JsonResponse({"status": "OK", "letter": letter.pk})
 
     def get_eml_file(self, eml_manifest, eml_data):
-        eml_extensions = "eml.gz" if eml_manifest["compressed"] else "eml"
-        eml_filename = f"{uuid.uuid4().hex}.{eml_extensions}"
-        eml_content = eml_data.read()
-        return ContentFile(eml_content, eml_filename)
+        eml_filename = f"{uuid.uuid4().hex}.eml.gz"
+        if eml_manifest["compressed"]:
+            return File(eml_data, eml_filename)
+        return gzip_file(eml_data, eml_filename)
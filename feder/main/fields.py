@@ -0,0 +1,54 @@
+from autoslug import utils
+from autoslug.fields import AutoSlugField
+
+
+class BulkAutoSlugField(AutoSlugField):
+    """
+    AutoSlugField able to reserve unique slugs of many new instances
+    with a single query, eg. before bulk_create.
+    """
+
+    def get_reserved_attname(self):
+        return f"_reserved_{self.attname}"
+
+    def get_base_slug(self, instance):
+        slug = self.slugify(utils.get_prepopulated_value(self, instance) or "")
+        return self.slugify(utils.crop_slug(self, slug or instance._meta.model_name))
+
+    def get_indexed_slug(self, slug, index):
+        tail = f"{self.index_sep}{index}"
+        return f"{slug[: self.max_length - len(tail)]}{tail}"
+
+    def reserve_slugs(self, instances):
+        """
+        Sets unique slugs of unsaved instances. Only slugs taken by
+        existing rows or other instances are checked with further queries.
+        """
+        manager = self.model._default_manager
+        slugs = [self.get_base_slug(instance) for instance in instances]
+        taken = set(
+            manager.filter(**{f"{self.name}__in": slugs})
+            .order_by()
+            .values_list(self.name, flat=True)
+        )
+        for instance, slug in zip(instances, slugs):
+            index = 1
+            candidate = slug
+            while candidate in taken or (
+                index > 1 and manager.filter(**{self.name: candidate}).exists()
+            ):
+                index += 1
+                candidate = self.get_indexed_slug(slug, index)
+            taken.add(candidate)
+            setattr(instance, self.attname, candidate)
+            setattr(instance, self.get_reserved_attname(), candidate)
+
+    def pre_save(self, instance, add):
+        value = self.value_from_object(instance)
+        if (
+            add
+            and value
+            and getattr(instance, self.get_reserved_attname(), None) == value
+        ):
+            return value
+        return super().pre_save(instance, add)
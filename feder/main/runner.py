@@ -0,0 +1,26 @@
+import shutil
+import tempfile
+
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class TemporaryMediaDiscoverRunner(DiscoverRunner):
+    """
+    Runs tests with MEDIA_ROOT in temporary directory removed after tests,
+    so files of letters and attachments created by tests are not left in
+    media of development environment.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.media_root = tempfile.mkdtemp(prefix="feder-media-")
+        self.media_settings = override_settings(
+            MEDIA_ROOT=self.media_root, SENDFILE_ROOT=self.media_root
+        )
+        self.media_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.media_settings.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+        super().teardown_test_environment(**kwargs)
@@ -4,6 +4,8 @@ from django.urls import reverse
 from guardian.shortcuts import assign_perm
 
 import feder
+from feder.cases.factories import CaseFactory
+from feder.cases.models import Case
 from feder.users.factories import UserFactory
 
 
@@ -141,3 +143,38 @@ class SitemapTestCase(TestCase):
     def test_main(self):
         url = reverse("sitemaps", kwargs={"section": "main"})
         self.assertEqual(self.client.get(url).status_code, 200)
+
+
+class BulkAutoSlugFieldTestCase(TestCase):
+    def setUp(self):
+        self.case = CaseFactory(name="Foo")
+        self.field = Case._meta.get_field("slug")
+
+    def build(self, name):
+        return Case(
+            name=name,
+            user=self.case.user,
+            monitoring=self.case.monitoring,
+            institution=self.case.institution,
+        )
+
+    def test_reserve_slugs_with_single_query(self):
+        cases = [self.build("Bar"), self.build("Baz")]
+        with self.assertNumQueries(1):
+            self.field.reserve_slugs(cases)
+        with self.assertNumQueries(1):
+            Case.objects.bulk_create(cases)
+        self.assertEqual(
+            sorted(Case.objects.values_list("slug", flat=True)), ["bar", "baz", "foo"]
+        )
+
+    def test_reserve_unique_slugs_of_duplicates(self):
+        cases = [self.build("Foo"), self.build("Foo"), self.build("Bar")]
+        self.field.reserve_slugs(cases)
+        self.assertEqual([x.slug for x in cases], ["foo-2", "foo-3", "bar"])
+
+    def test_save_without_reserved_slug(self):
+        case = self.build("Foo")
+        case.slug = "foo"
+        case.save()
+        self.assertEqual(case.slug, "foo-2")
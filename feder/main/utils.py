@@ -1,3 +1,6 @@
+import re
+from itertools import islice
+
 from django.contrib.admin.models import ADDITION, CHANGE, DELETION, LogEntry
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.sites.shortcuts import get_current_site
@@ -6,6 +9,8 @@ from django.forms.models import model_to_dict
 from django.utils.encoding import force_str
 from rest_framework_csv.renderers import CSVStreamingRenderer
 
+TOKEN_RE = re.compile(r"\w{2,50}")
+
 
 def get_numeric_param(request, key):
     """Get numeric param from request"""
@@ -57,6 +62,21 @@ def get_email_domain(email: str) -> str:
     return ""
 
 
+def chunked(iterable, size):
+    """Split iterable into lists of at most `size` elements."""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def tokenize(text):
+    """Split text into lowercase words for search and spam checks."""
+    return TOKEN_RE.findall(text.lower()) if text else []
+
+
 class PaginatedCSVStreamingRenderer(CSVStreamingRenderer):
     def render(self, data, *args, **kwargs):
         """Copied form PaginatedCSVRenderer to support paginated results."""
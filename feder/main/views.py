@@ -4,7 +4,7 @@ from django.views.generic import TemplateView
 from feder.cases.models import Case
 from feder.institutions.models import Institution
 from feder.monitorings.models import Monitoring
-from feder.teryt.models import JST
+from feder.teryt.models import JST, cached_area_counts
 
 
 class HomeView(TemplateView):
@@ -26,6 +26,12 @@ class HomeView(TemplateView):
         institutions and cases counts
         """
         voivodeship_list = JST.objects.filter(category__level=1).all().order_by("name")
+        case_counts = cached_area_counts(
+            "home:cases", voivodeship_list, Case.objects.all(), "institution__jst"
+        )
+        institution_counts = cached_area_counts(
+            "home:institutions", voivodeship_list, Institution.objects.all()
+        )
         table = """
             <table class="table table-bordered compact" style="width: 100%">
             """
@@ -40,9 +46,9 @@ class HomeView(TemplateView):
                 "<tr><td>"
                 + voivodeship.name
                 + "</td><td>"
-                + str(Case.objects.area(voivodeship).count())
+                + str(case_counts[voivodeship.pk]["count"])
                 + "</td><td>"
-                + str(Institution.objects.area(voivodeship).count())
+                + str(institution_counts[voivodeship.pk]["count"])
                 + "</td></tr>"
             )
         table += "</table>"
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from feder.main.utils import chunked
+from feder.monitorings.models import Monitoring, MonitoringStats
+
+
+class Command(BaseCommand):
+    help = "Recompute counts of cases shown in table of monitorings."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=100,
+            help="Count of monitorings recomputed in a single query",
+        )
+
+    def handle(self, *args, **options):
+        count = 0
+        for ids in chunked(
+            Monitoring.objects.order_by("pk").values_list("pk", flat=True).iterator(),
+            options["chunk_size"],
+        ):
+            count += MonitoringStats.objects.refresh(ids)
+        self.stdout.write(f"Statistics of {count} monitorings rebuilt\n")
@@ -0,0 +1,55 @@
+# Generated by Django 3.2.20 on 2026-10-18 00:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("monitorings", "0024_alter_monitoring_subject"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MonitoringStats",
+            fields=[
+                (
+                    "monitoring",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="stats",
+                        serialize=False,
+                        to="monitorings.monitoring",
+                        verbose_name="Monitoring",
+                    ),
+                ),
+                (
+                    "case_count",
+                    models.PositiveIntegerField(default=0, verbose_name="Case count"),
+                ),
+                (
+                    "case_quarantined_count",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="Case quarantined count"
+                    ),
+                ),
+                (
+                    "case_confirmation_received_count",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="Confirmation received count"
+                    ),
+                ),
+                (
+                    "case_response_received_count",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="Response received count"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Monitoring statistics",
+                "verbose_name_plural": "Monitoring statistics",
+            },
+        ),
+    ]
@@ -0,0 +1,51 @@
+from django.db import migrations, models
+from django.db.models import Q
+
+CHUNK_SIZE = 100
+
+
+def fill_monitoring_stats(apps, schema_editor):
+    Monitoring = apps.get_model("monitorings", "Monitoring")
+    MonitoringStats = apps.get_model("monitorings", "MonitoringStats")
+    monitoring_ids = list(
+        Monitoring.objects.order_by("pk").values_list("pk", flat=True)
+    )
+    for i in range(0, len(monitoring_ids), CHUNK_SIZE):
+        rows = (
+            Monitoring.objects.filter(pk__in=monitoring_ids[i : i + CHUNK_SIZE])
+            .order_by()
+            .annotate(
+                case_count=models.Count("case"),
+                case_quarantined_count=models.Count(
+                    "case", filter=Q(case__is_quarantined=True)
+                ),
+                case_confirmation_received_count=models.Count(
+                    "case", filter=Q(case__confirmation_received=True)
+                ),
+                case_response_received_count=models.Count(
+                    "case", filter=Q(case__response_received=True)
+                ),
+            )
+            .values(
+                "pk",
+                "case_count",
+                "case_quarantined_count",
+                "case_confirmation_received_count",
+                "case_response_received_count",
+            )
+        )
+        MonitoringStats.objects.bulk_create(
+            [MonitoringStats(monitoring_id=row.pop("pk"), **row) for row in rows],
+            ignore_conflicts=True,
+        )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("monitorings", "0025_monitoringstats"),
+        ("cases", "0020_casestats"),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_monitoring_stats, migrations.RunPython.noop),
+    ]
@@ -5,6 +5,8 @@ from autoslug.fields import AutoSlugField
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.db import models
+from django.db.models import F
+from django.db.models.functions import Coalesce
 from django.urls import reverse
 from django.utils.translation import gettext_lazy as _
 from guardian.models import GroupObjectPermissionBase, UserObjectPermissionBase
@@ -12,7 +14,7 @@ from model_utils.models import TimeStampedModel
 
 from feder.domains.models import Domain
 from feder.main.utils import FormattedDatetimeMixin, RenderBooleanFieldMixin
-from feder.teryt.models import JST
+from feder.teryt.models import JST, cached_area_counts
 
 from .validators import validate_template_syntax
 
@@ -61,6 +63,18 @@ class MonitoringQuerySet(FormattedDatetimeMixin, models.QuerySet):
             )
         )
 
+    def with_case_stats(self):
+        """
+        Annotates monitorings with case counts stored in MonitoringStats,
+        without aggregation over cases.
+        """
+        return self.annotate(
+            **{
+                field: Coalesce(f"stats__{field}", 0)
+                for field in MonitoringStats.STATS_FIELDS
+            }
+        )
+
     def area(self, jst):
         return self.filter(
             case__institution__jst__tree_id=jst.tree_id,
@@ -75,9 +89,14 @@ class MonitoringQuerySet(FormattedDatetimeMixin, models.QuerySet):
             return self.filter(is_public=True)
         if user.is_superuser:
             return self
-        any_permission = models.Q(monitoringuserobjectpermission__user=user)
+        # subquery instead of join, so rows are not duplicated per permission
+        any_permission = models.Q(
+            pk__in=MonitoringUserObjectPermission.objects.filter(user=user).values(
+                "content_object"
+            )
+        )
         public_only = models.Q(is_public=True)
-        return self.filter(any_permission | public_only).distinct()
+        return self.filter(any_permission | public_only)
 
 
 @reversion.register()
@@ -184,6 +203,14 @@ class Monitoring(RenderBooleanFieldMixin, TimeStampedModel):
         institutions and cases counts
         """
         voivodeship_list = JST.objects.filter(category__level=1).all().order_by("name")
+        counts = cached_area_counts(
+            f"monitoring:{self.pk}:cases",
+            voivodeship_list,
+            self.case_set.all(),
+            "institution__jst",
+            count=models.Count("pk"),
+            quarantined=models.Count("pk", filter=models.Q(is_quarantined=True)),
+        )
         table = """
             <table class="table table-bordered compact" style="width: 100%">
             """
@@ -198,11 +225,9 @@ class Monitoring(RenderBooleanFieldMixin, TimeStampedModel):
                 "<tr><td>"
                 + voivodeship.name
                 + "</td><td>"
-                + str(self.case_set.area(voivodeship).count())
+                + str(counts[voivodeship.pk]["count"])
                 + "</td><td>"
-                + str(
-                    self.case_set.filter(is_quarantined=True).area(voivodeship).count()
-                )
+                + str(counts[voivodeship.pk]["quarantined"])
                 + "</td></tr>"
             )
         table += "</table>"
@@ -225,6 +250,95 @@ class Monitoring(RenderBooleanFieldMixin, TimeStampedModel):
         return user_list, index_generate()
 
 
+class MonitoringStatsQuerySet(models.QuerySet):
+    def refresh(self, monitoring_ids):
+        """
+        Recomputes counts of cases of given monitorings with single
+        aggregate query. Monitorings which do not exist are skipped.
+        """
+        monitoring_ids = {x for x in monitoring_ids if x is not None}
+        if not monitoring_ids:
+            return 0
+        stats = [
+            MonitoringStats(monitoring_id=row.pop("pk"), **row)
+            for row in Monitoring.objects.filter(pk__in=monitoring_ids)
+            .order_by()
+            .with_case_count()
+            .with_case_quarantined_count()
+            .with_case_confirmation_received_count()
+            .with_case_response_received_count()
+            .values("pk", *MonitoringStats.STATS_FIELDS)
+        ]
+        existing_ids = set(
+            self.filter(monitoring_id__in=monitoring_ids).values_list(
+                "monitoring_id", flat=True
+            )
+        )
+        self.bulk_update(
+            [x for x in stats if x.monitoring_id in existing_ids],
+            MonitoringStats.STATS_FIELDS,
+        )
+        self.bulk_create(
+            [x for x in stats if x.monitoring_id not in existing_ids],
+            ignore_conflicts=True,
+        )
+        return len(stats)
+
+    def add(self, monitoring_id, **deltas):
+        """
+        Adds given deltas to counters of monitoring in single UPDATE,
+        so concurrent changes of cases are not lost.
+        Returns False, if monitoring has no statistics yet.
+        """
+        deltas = {field: value for field, value in deltas.items() if value}
+        if not deltas:
+            return True
+        return bool(
+            self.filter(monitoring_id=monitoring_id).update(
+                **{field: F(field) + value for field, value in deltas.items()}
+            )
+        )
+
+
+class MonitoringStats(models.Model):
+    """
+    Counts of cases of monitoring, maintained on change of cases,
+    so lists of monitorings do not aggregate them.
+    """
+
+    STATS_FIELDS = [
+        "case_count",
+        "case_quarantined_count",
+        "case_confirmation_received_count",
+        "case_response_received_count",
+    ]
+    monitoring = models.OneToOneField(
+        Monitoring,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="stats",
+        verbose_name=_("Monitoring"),
+    )
+    case_count = models.PositiveIntegerField(verbose_name=_("Case count"), default=0)
+    case_quarantined_count = models.PositiveIntegerField(
+        verbose_name=_("Case quarantined count"), default=0
+    )
+    case_confirmation_received_count = models.PositiveIntegerField(
+        verbose_name=_("Confirmation received count"), default=0
+    )
+    case_response_received_count = models.PositiveIntegerField(
+        verbose_name=_("Response received count"), default=0
+    )
+    objects = MonitoringStatsQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = _("Monitoring statistics")
+        verbose_name_plural = _("Monitoring statistics")
+
+    def __str__(self):
+        return f"Statistics of monitoring #{self.monitoring_id}"
+
+
 class MonitoringUserObjectPermission(UserObjectPermissionBase):
     content_object = models.ForeignKey(Monitoring, on_delete=models.CASCADE)
 
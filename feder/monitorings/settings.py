@@ -0,0 +1,6 @@
+from django.conf import settings
+
+MONITORING_MASS_ASSIGN_CHUNK_SIZE = getattr(
+    settings, "MONITORING_MASS_ASSIGN_CHUNK_SIZE", 100
+)
+MONITORING_MASS_ASSIGN_LIMIT = getattr(settings, "MONITORING_MASS_ASSIGN_LIMIT", 20000)
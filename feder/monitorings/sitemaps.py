@@ -21,7 +21,7 @@ class MonitoringPagesSitemap(Sitemap):
 
     def items(self):
         items = []
-        for obj in Monitoring.objects.with_case_count().all():
+        for obj in Monitoring.objects.with_case_stats().all():
             for page in range(0, self.ceildiv(obj.case_count, self.paginate_by) + 1):
                 items.append((obj, page + 1))
         return items
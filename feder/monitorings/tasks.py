@@ -1,32 +1,71 @@
 from background_task import background
-from django.db import transaction
 
 from feder.cases.models import Case
 from feder.letters.models import Letter
+from feder.letters.sending import MassSender
+from feder.main.exceptions import FederError
+from feder.main.utils import chunked
+
+from .settings import MONITORING_MASS_ASSIGN_CHUNK_SIZE
 
 
 @background
 def handle_mass_assign(mass_assign):
-    for case in Case.objects.filter(mass_assign=mass_assign).all():
-        case.update_email()
-        case.save()
-    send_letter_for_mass_assign(mass_assign)
+    """
+    Sets emails of cases created by mass assign and schedules sending
+    of their requests in chunks, each in a separate task.
+    """
+    cases = Case.objects.filter(mass_assign=mass_assign).order_by("pk")
+    for chunk in chunked(
+        cases.filter(email="").select_related("monitoring__domain").iterator(),
+        MONITORING_MASS_ASSIGN_CHUNK_SIZE,
+    ):
+        for case in chunk:
+            case.update_email()
+        Case.objects.bulk_update(chunk, ["email"])
+    case_ids = cases.exclude(mass_assign_status=Case.MASS_ASSIGN_STATUS.sent)
+    for ids in chunked(
+        case_ids.values_list("pk", flat=True).iterator(),
+        MONITORING_MASS_ASSIGN_CHUNK_SIZE,
+    ):
+        send_letter_for_mass_assign(mass_assign, ids)
 
 
 @background
-def send_letter_for_mass_assign(mass_assign):
-    for case in Case.objects.filter(mass_assign=mass_assign).all():
-        Letter.send_new_case(case=case)
+def send_letter_for_mass_assign(mass_assign, case_ids=None):
+    """
+    Sends requests of cases of mass assign, all or given ones.
+    Cases with request sent before are skipped, so a retry of the task
+    scheduled on failure of any case resumes sending.
+    """
+    cases = Case.objects.filter(mass_assign=mass_assign)
+    if case_ids is not None:
+        cases = cases.filter(pk__in=case_ids)
+    MassSender().send_new_cases(cases)
+    failed_count = cases.filter(
+        mass_assign_status=Case.MASS_ASSIGN_STATUS.failed
+    ).count()
+    if failed_count:
+        raise FederError(
+            f"Sending requests of {failed_count} cases of mass assign "
+            f"{mass_assign} failed."
+        )
 
 
 @background
 def send_mass_draft(mass_draft_pk):
     """
     Generates letters from mass draft object, sends them and then deletes the draft.
+    Retry of interrupted task sends only letters not sent yet, so the draft
+    is kept until all of them are sent.
     """
-    with transaction.atomic():
-        mass_draft = Letter.objects.get(pk=mass_draft_pk)
-        letters = mass_draft.generate_mass_letters()
-        for letter in letters:
-            letter.send()
-        mass_draft.delete()
+    mass_draft = Letter.objects.get(pk=mass_draft_pk)
+    # letters are generated in chunks, each in its own transaction
+    mass_draft.generate_mass_letters()
+    MassSender().send_letters(mass_draft.generated_letters.all())
+    unsent_count = mass_draft.generated_letters.unsent().count()
+    if unsent_count:
+        raise FederError(
+            f"Sending {unsent_count} letters of mass draft {mass_draft_pk} failed."
+        )
+    mass_draft.delete()
@@ -1,7 +1,10 @@
+from io import StringIO
 from unittest import skip
 from unittest.mock import Mock, patch
 
+from background_task.models import Task
 from django.core import mail
+from django.core.management import call_command
 from django.db.models import Count
 from django.test import TestCase
 from django.urls import reverse
@@ -18,6 +21,7 @@ from feder.letters.factories import (
     OutgoingLetterFactory,
 )
 from feder.letters.models import Letter, MassMessageDraft
+from feder.main.exceptions import FederError
 from feder.main.tests import PermissionStatusMixin
 from feder.monitorings.filters import MonitoringFilter
 from feder.parcels.factories import IncomingParcelPostFactory, OutgoingParcelPostFactory
@@ -27,7 +31,7 @@ from feder.users.factories import UserFactory
 
 from .factories import MonitoringFactory
 from .forms import MassMessageForm, MonitoringForm
-from .models import Monitoring
+from .models import Monitoring, MonitoringStats
 from .serializers import MultiCaseTagSerializer
 from .tasks import handle_mass_assign, send_letter_for_mass_assign
 
@@ -418,6 +422,17 @@ class MonitoringAssignViewTestCase(ObjectMixin, PermissionStatusMixin, TestCase)
         self.send_all_pending()
         self.assertEqual(len(mail.outbox), 2)
 
+    def test_assign_refresh_monitoring_stats(self):
+        self.login_permitted_user()
+        self.monitoring.hide_new_cases = True
+        self.monitoring.save()
+        InstitutionFactory(name="Office 1")
+        InstitutionFactory(name="Office 2")
+        self.client.post(self.get_url() + "?name=Office", data={"all": "yes"})
+        stats = MonitoringStats.objects.get(monitoring=self.monitoring)
+        self.assertEqual(stats.case_count, 2)
+        self.assertEqual(stats.case_quarantined_count, 2)
+
     def test_force_filtering_before_assign(self):
         self.login_permitted_user()
         InstitutionFactory(name="Office 1")
@@ -539,6 +554,175 @@ class MonitoringAssignViewTestCase(ObjectMixin, PermissionStatusMixin, TestCase)
         # reply to email should have organisation name
         self.assertTrue("angel-corp" in mail.outbox[0].from_email)
 
+    @patch("feder.monitorings.views.MONITORING_MASS_ASSIGN_CHUNK_SIZE", 2)
+    def test_create_cases_in_chunks(self):
+        self.login_permitted_user()
+        CaseFactory(monitoring=self.monitoring, name=self.monitoring.name + " #2")
+        InstitutionFactory.create_batch(size=5, name="Office")
+        self.client.post(self.get_url() + "?name=Office", data={"all": "yes"})
+        cases = Case.objects.filter(mass_assign__isnull=False).order_by("pk")
+        self.assertEqual(
+            [case.name[len(self.monitoring.name) :] for case in cases],
+            [" #2", " #3", " #4", " #5", " #6"],
+        )
+        self.assertEqual(
+            Case.objects.filter(monitoring=self.monitoring)
+            .values("slug")
+            .distinct()
+            .count(),
+            6,
+        )
+
+    def test_mark_mass_assigned_cases_as_sent(self):
+        self.login_permitted_user()
+        InstitutionFactory(name="Office 1")
+        self.client.post(self.get_url() + "?name=Office", data={"all": "yes"})
+        case = Case.objects.get(monitoring=self.monitoring)
+        self.assertEqual(case.mass_assign_status, Case.MASS_ASSIGN_STATUS.pending)
+        self.send_all_pending()
+        case.refresh_from_db()
+        self.assertEqual(case.mass_assign_status, Case.MASS_ASSIGN_STATUS.sent)
+
+    @patch("feder.monitorings.tasks.MONITORING_MASS_ASSIGN_CHUNK_SIZE", 2)
+    def test_schedule_sending_in_chunks(self):
+        self.login_permitted_user()
+        InstitutionFactory.create_batch(size=5, name="Office")
+        self.client.post(self.get_url() + "?name=Office", data={"all": "yes"})
+        mass_assign = Case.objects.filter(monitoring=self.monitoring).first()
+        handle_mass_assign.now(str(mass_assign.mass_assign))
+        tasks = Task.objects.filter(
+            task_name="feder.monitorings.tasks.send_letter_for_mass_assign"
+        )
+        self.assertEqual(tasks.count(), 3)
+        self.assertEqual(sorted(len(task.params()[0][1]) for task in tasks), [1, 2, 2])
+        self.assertFalse(Case.objects.filter(email="").exists())
+
+    def test_retry_sends_only_failed_cases(self):
+        self.login_permitted_user()
+        InstitutionFactory.create_batch(size=2, name="Office")
+        self.client.post(self.get_url() + "?name=Office", data={"all": "yes"})
+        cases = Case.objects.filter(monitoring=self.monitoring).order_by("pk")
+        mass_assign = str(cases[0].mass_assign)
+        handle_mass_assign.now(mass_assign)
+        send_new_case = Letter.send_new_case
+
+        def fail_first(case, connection=None):
+            if case.pk == cases[0].pk:
+                raise ValueError("SMTP error")
+            return send_new_case(case=case, connection=connection)
+
+        with patch.object(Letter, "send_new_case", side_effect=fail_first):
+            with self.assertRaises(FederError):
+                send_letter_for_mass_assign.now(mass_assign)
+        self.assertEqual(
+            cases.mass_assign_progress(), {"pending": 0, "sent": 1, "failed": 1}
+        )
+        self.assertEqual(len(mail.outbox), 1)
+        send_letter_for_mass_assign.now(mass_assign)
+        self.assertEqual(
+            cases.mass_assign_progress(), {"pending": 0, "sent": 2, "failed": 0}
+        )
+        self.assertEqual(len(mail.outbox), 2)
+
+
+class MonitoringAssignProgressViewTestCase(
+    ObjectMixin, PermissionStatusMixin, TestCase
+):
+    permission = ["monitorings.change_monitoring"]
+
+    def get_url(self):
+        return reverse(
+            "monitorings:assign-progress", kwargs={"slug": self.monitoring.slug}
+        )
+
+    def test_count_cases_by_status(self):
+        CaseFactory(
+            monitoring=self.monitoring,
+            mass_assign_status=Case.MASS_ASSIGN_STATUS.pending,
+        )
+        CaseFactory(
+            monitoring=self.monitoring,
+            mass_assign_status=Case.MASS_ASSIGN_STATUS.sent,
+        )
+        CaseFactory(monitoring=self.monitoring)
+        CaseFactory(mass_assign_status=Case.MASS_ASSIGN_STATUS.failed)
+        self.login_permitted_user()
+        response = self.client.get(self.get_url())
+        self.assertEqual(response.json(), {"pending": 1, "sent": 1, "failed": 0})
+
+    def test_invalid_mass_assign(self):
+        self.login_permitted_user()
+        response = self.client.get(self.get_url(), {"mass_assign": "foo"})
+        self.assertEqual(response.status_code, 400)
+
+
+class MonitoringStatsTestCase(TestCase):
+    def setUp(self):
+        self.monitoring = MonitoringFactory()
+
+    def get_stats(self, monitoring=None):
+        return MonitoringStats.objects.get(monitoring=monitoring or self.monitoring)
+
+    def test_count_created_cases(self):
+        CaseFactory(monitoring=self.monitoring)
+        CaseFactory(monitoring=self.monitoring, is_quarantined=True)
+        stats = self.get_stats()
+        self.assertEqual(stats.case_count, 2)
+        self.assertEqual(stats.case_quarantined_count, 1)
+        self.assertEqual(stats.case_response_received_count, 0)
+
+    def test_update_on_change_of_flags(self):
+        case = CaseFactory(monitoring=self.monitoring)
+        case.confirmation_received = True
+        case.response_received = True
+        case.save()
+        stats = self.get_stats()
+        self.assertEqual(stats.case_count, 1)
+        self.assertEqual(stats.case_confirmation_received_count, 1)
+        self.assertEqual(stats.case_response_received_count, 1)
+
+        case.response_received = False
+        case.save(update_fields=["response_received"])
+        self.assertEqual(self.get_stats().case_response_received_count, 0)
+
+    def test_update_on_move_of_case(self):
+        case = CaseFactory(monitoring=self.monitoring, is_quarantined=True)
+        other = MonitoringFactory()
+        case.monitoring = other
+        case.save()
+        self.assertEqual(self.get_stats().case_count, 0)
+        self.assertEqual(self.get_stats().case_quarantined_count, 0)
+        self.assertEqual(self.get_stats(other).case_count, 1)
+        self.assertEqual(self.get_stats(other).case_quarantined_count, 1)
+
+    def test_update_on_delete_of_case(self):
+        case = CaseFactory(monitoring=self.monitoring, is_quarantined=True)
+        case.delete()
+        self.assertEqual(self.get_stats().case_count, 0)
+        self.assertEqual(self.get_stats().case_quarantined_count, 0)
+
+    def test_delete_monitoring(self):
+        CaseFactory(monitoring=self.monitoring)
+        self.monitoring.delete()
+        self.assertFalse(MonitoringStats.objects.exists())
+
+    def test_annotate_monitorings_with_stats(self):
+        CaseFactory(monitoring=self.monitoring)
+        other = MonitoringFactory()
+        monitorings = Monitoring.objects.with_case_stats().order_by("pk")
+        self.assertEqual(
+            [(x.pk, x.case_count) for x in monitorings],
+            [(self.monitoring.pk, 1), (other.pk, 0)],
+        )
+
+    def test_rebuild_command(self):
+        CaseFactory(monitoring=self.monitoring, response_received=True)
+        MonitoringStats.objects.all().delete()
+        stdout = StringIO()
+        call_command("rebuild_monitoring_stats", stdout=stdout)
+        self.assertEqual(self.get_stats().case_response_received_count, 1)
+        self.assertIn("Statistics of 1 monitorings rebuilt", stdout.getvalue())
+
 
 class SitemapTestCase(ObjectMixin, TestCase):
     def test_monitorings(self):
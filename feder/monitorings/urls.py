@@ -107,6 +107,11 @@ urlpatterns = [
         views.MonitoringAssignView.as_view(),
         name="assign",
     ),
+    re_path(
+        _(r"^(?P<slug>[\w-]+)/~assign/progress$"),
+        views.MonitoringAssignProgressView.as_view(),
+        name="assign-progress",
+    ),
     re_path(
         _(r"^(?P<slug>[\w-]+)/~mass-message$"),
         views.MassMessageView.as_view(),
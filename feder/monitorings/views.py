@@ -1,3 +1,4 @@
+import uuid
 from datetime import datetime
 
 from ajax_datatable import AjaxDatatableView
@@ -17,7 +18,7 @@ from django.contrib.auth import get_user_model
 from django.contrib.syndication.views import Feed
 from django.core.exceptions import PermissionDenied
 from django.db.models import Count, Q
-from django.http import HttpResponseRedirect
+from django.http import HttpResponseBadRequest, HttpResponseRedirect, JsonResponse
 from django.shortcuts import get_object_or_404
 from django.template.defaultfilters import linebreaksbr
 from django.urls import reverse, reverse_lazy
@@ -34,6 +35,7 @@ from django.views.generic import (
     FormView,
     TemplateView,
     UpdateView,
+    View,
 )
 from django_filters.views import FilterView
 from extra_views import CreateWithInlinesView
@@ -55,7 +57,8 @@ from feder.letters.models import Letter
 from feder.letters.utils import is_formatted_html, text_to_html
 from feder.letters.views import LetterCommonMixin
 from feder.main.mixins import ExtraListMixin, RaisePermissionRequiredMixin
-from feder.main.utils import DeleteViewLogEntryMixin, FormValidLogEntryMixin
+from feder.main.utils import DeleteViewLogEntryMixin, FormValidLogEntryMixin, chunked
+from feder.teryt.models import invalidate_area_counts
 
 from .filters import (
     MonitoringCaseAreaFilter,
@@ -69,9 +72,10 @@ from .forms import (
     SaveTranslatedUserObjectPermissionsForm,
     SelectUserForm,
 )
-from .models import Monitoring
+from .models import Monitoring, MonitoringStats
 from .permissions import MultiCaseTagManagementPerm
 from .serializers import MultiCaseTagSerializer
+from .settings import MONITORING_MASS_ASSIGN_CHUNK_SIZE, MONITORING_MASS_ASSIGN_LIMIT
 from .tasks import handle_mass_assign, send_mass_draft
 
 
@@ -86,7 +90,7 @@ class MonitoringListView(SelectRelatedMixin, FilterView):
             super()
             .get_queryset()
             .for_user(self.request.user)
-            .with_case_count()
+            .with_case_stats()
             .order_by("-created")
         )
 
@@ -196,10 +200,7 @@ class MonitoringsAjaxDatatableView(AjaxDatatableView):
         return (
             qs.for_user(user=self.request.user)
             .with_formatted_datetime("created", timezone.get_default_timezone())
-            .with_case_count()
-            .with_case_confirmation_received_count()
-            .with_case_response_received_count()
-            .with_case_quarantined_count()
+            .with_case_stats()
         )
 
     def render_row_details(self, pk, request=None):
@@ -375,9 +376,7 @@ class MonitoringCasesAjaxDatatableView(AjaxDatatableView):
         return (
             qs.for_user(user=self.request.user)
             # .with_formatted_datetime("created", timezone.get_default_timezone())
-            .with_record_max()
-            .with_application_letter_status()
-            .with_record_count()
+            .with_stats()
         )
 
     def customize_row(self, row, obj):
@@ -727,7 +726,7 @@ class MonitoringAssignView(RaisePermissionRequiredMixin, FilterView):
     permission_required = "monitorings.change_monitoring"
     template_name = "monitorings/institution_assign.html"
     paginate_by = None
-    LIMIT = 500
+    LIMIT = MONITORING_MASS_ASSIGN_LIMIT
 
     def get_limit_simultaneously(self):
         return self.LIMIT
@@ -754,6 +753,9 @@ class MonitoringAssignView(RaisePermissionRequiredMixin, FilterView):
         context["monitoring"] = self.monitoring
         context["is_filtered"] = self.is_filtered()
         context["select_all_checkbox"] = self.generate_assign_all_checkbox()
+        context["mass_assign_progress"] = Case.objects.filter(
+            monitoring=self.monitoring
+        ).mass_assign_progress()
         return context
 
     def is_filtered(self):
@@ -803,21 +805,8 @@ class MonitoringAssignView(RaisePermissionRequiredMixin, FilterView):
             ) % {"count": to_assign_count, "limit": self.get_limit_simultaneously()}
             messages.error(self.request, msg)
             return HttpResponseRedirect(self.request.path)
-        cases = []
         mass_assign = Case.objects.get_mass_assign_uid()
-        for i, institution in enumerate(qs):
-            postfix = " #%d" % (i + count + 1,)
-            cases.append(
-                Case(
-                    user=self.request.user,
-                    name=self.monitoring.name + postfix,
-                    monitoring=self.monitoring,
-                    institution=institution,
-                    mass_assign=mass_assign,
-                    is_quarantined=self.monitoring.hide_new_cases,
-                )
-            )
-        Case.objects.bulk_create(cases)
+        self.create_cases(qs.values_list("pk", flat=True), mass_assign, start=count)
         handle_mass_assign(mass_assign.hex)
         msg = _("%(count)d institutions was assigned to %(monitoring)s. ") % {
             "count": to_assign_count,
@@ -829,6 +818,60 @@ class MonitoringAssignView(RaisePermissionRequiredMixin, FilterView):
         url = reverse("monitorings:assign", kwargs={"slug": self.monitoring.slug})
         return HttpResponseRedirect(url)
 
+    def create_cases(self, institution_ids, mass_assign, start):
+        """
+        Creates cases of institutions in chunks, reserving their slugs
+        with a query per chunk.
+        """
+        slug_field = Case._meta.get_field("slug")
+        for i, ids in enumerate(
+            chunked(list(institution_ids), MONITORING_MASS_ASSIGN_CHUNK_SIZE)
+        ):
+            offset = start + i * MONITORING_MASS_ASSIGN_CHUNK_SIZE
+            cases = [
+                Case(
+                    user=self.request.user,
+                    name=f"{self.monitoring.name} #{offset + j + 1}",
+                    monitoring=self.monitoring,
+                    institution_id=institution_id,
+                    mass_assign=mass_assign,
+                    mass_assign_status=Case.MASS_ASSIGN_STATUS.pending,
+                    is_quarantined=self.monitoring.hide_new_cases,
+                )
+                for j, institution_id in enumerate(ids)
+            ]
+            slug_field.reserve_slugs(cases)
+            Case.objects.bulk_create(cases)
+        # bulk created cases do not send signals updating counters
+        MonitoringStats.objects.refresh([self.monitoring.pk])
+        invalidate_area_counts()
+
+
+class MonitoringAssignProgressView(RaisePermissionRequiredMixin, View):
+    """
+    Returns counts of cases of monitoring by status of mass assign request,
+    optionally limited to single mass assign given by "mass_assign" parameter.
+    """
+
+    permission_required = "monitorings.change_monitoring"
+
+    def get_permission_object(self):
+        return self.monitoring
+
+    @cached_property
+    def monitoring(self):
+        return get_object_or_404(Monitoring, slug=self.kwargs["slug"])
+
+    def get(self, request, *args, **kwargs):
+        cases = Case.objects.filter(monitoring=self.monitoring)
+        mass_assign = request.GET.get("mass_assign")
+        if mass_assign:
+            try:
+                cases = cases.filter(mass_assign=uuid.UUID(mass_assign))
+            except ValueError:
+                return HttpResponseBadRequest("Invalid mass_assign")
+        return JsonResponse(cases.mass_assign_progress())
+
 
 class MassMessageView(
     LetterCommonMixin,
@@ -7,6 +7,7 @@ from django.dispatch import receiver
 from django.urls import reverse
 from django.utils.translation import gettext_lazy as _
 
+from feder.cases.models import Case
 from feder.institutions.models import Institution
 from feder.records.models import AbstractRecord, AbstractRecordQuerySet
 
@@ -75,8 +76,4 @@ class OutgoingParcelPost(AbstractParcelPost):
 @receiver(post_save, sender=IncomingParcelPost)
 def update_case_statuses(sender, instance, created, raw, **kwargs):
     if not raw and created and instance.record.case_id:
-        case = instance.record.case
-        prev_rr = case.response_received
-        case.response_received = case.get_response_received()
-        if prev_rr != case.response_received:
-            case.save()
+        Case.objects.mark_received(instance.record.case_id, "response_received")
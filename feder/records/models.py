@@ -1,10 +1,10 @@
 import warnings
 
 from cached_property import cached_property
-from django.db import models
+from django.db import connections, models, transaction
 
 # Create your models here.
-from django.db.models import Prefetch
+from django.db.models import Max, Prefetch
 from django.utils.translation import gettext_lazy as _
 from django_extensions.db.models import TimeStampedModel
 
@@ -83,6 +83,44 @@ class RecordQuerySet(models.QuerySet):
     def for_user(self, user):
         return enforce_quarantined_queryset(self, user, "case")
 
+    def create_for_cases(self, cases):
+        """
+        Creates record for each of distinct cases in a single query. Primary keys are
+        read back as the latest records of the cases, locked meanwhile, if
+        the database does not return them from bulk insert, eg. MySQL.
+        """
+        records = [self.model(case=case) for case in cases]
+        if (
+            not records
+            or connections[self.db].features.can_return_rows_from_bulk_insert
+        ):
+            return self.bulk_create(records)
+        case_ids = sorted({record.case_id for record in records})
+        with transaction.atomic(using=self.db):
+            # foreign key checks of concurrent inserts of records wait for lock
+            # of their cases, so the latest record of a case is created here
+            list(
+                Case.objects.using(self.db)
+                .filter(pk__in=case_ids)
+                .order_by("pk")
+                .select_for_update()
+                .values_list("pk", flat=True)
+            )
+            last_pk = self.aggregate(last_pk=Max("pk"))["last_pk"] or 0
+            self.bulk_create(records)
+            # locking read sees records committed before the lock as well
+            pks = dict(
+                self.filter(case__in=case_ids, pk__gt=last_pk)
+                .select_for_update()
+                .order_by("pk")
+                .values_list("case_id", "pk")
+            )
+        for record in records:
+            record.pk = pks[record.case_id]
+            record._state.adding = False
+            record._state.db = self.db
+        return records
+
 
 class Record(TimeStampedModel):
     case = models.ForeignKey(Case, on_delete=models.CASCADE, null=True)
@@ -1,5 +1,7 @@
+from django.db import connection
 from django.test import TestCase
 
+from feder.cases.factories import CaseFactory
 from feder.letters.factories import IncomingLetterFactory
 from feder.letters.models import Letter
 from feder.parcels.factories import IncomingParcelPostFactory, OutgoingParcelPostFactory
@@ -50,6 +52,26 @@ class RecordQuerySetTestCase(TestCase):
             self.assertEqual(objects[2].content_object, ipp2)
             self.assertEqual(objects[3].content_object, ipp3)
 
+    def test_create_for_cases(self):
+        cases = CaseFactory.create_batch(size=3)
+        CaseFactory.create_batch(size=2)
+        # lock of cases, last primary key, insert and read back in savepoint
+        queries = 1 if connection.features.can_return_rows_from_bulk_insert else 6
+        with self.assertNumQueries(queries):
+            records = Record.objects.create_for_cases(cases)
+        self.assertEqual(len({record.pk for record in records}), 3)
+        for record, case in zip(records, cases):
+            self.assertEqual(Record.objects.get(pk=record.pk).case, case)
+
+    def test_create_for_cases_with_previous_records(self):
+        cases = CaseFactory.create_batch(size=2)
+        previous = [Record.objects.create(case=case) for case in reversed(cases)]
+        records = Record.objects.create_for_cases(cases)
+        self.assertEqual(Record.objects.count(), 4)
+        for record, case in zip(records, cases):
+            self.assertNotIn(record, previous)
+            self.assertEqual(Record.objects.get(pk=record.pk).case, case)
+
 
 class RecordTestCase(TestCase):
     def test_content_template(self):
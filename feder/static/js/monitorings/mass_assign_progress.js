@@ -0,0 +1,23 @@
+$(function () {
+    var POLL_INTERVAL = 5000,
+        $progress = $('#mass-assign-progress');
+
+    function getCount (status) {
+        return parseInt($progress.find('[data-status=' + status + ']').text());
+    }
+
+    function poll () {
+        $.getJSON($progress.data('url'), function (data) {
+            $.each(data, function (status, count) {
+                $progress.find('[data-status=' + status + ']').text(count);
+            });
+            if (data.pending > 0) {
+                setTimeout(poll, POLL_INTERVAL);
+            }
+        });
+    }
+
+    if ($progress.length && getCount('pending') > 0) {
+        setTimeout(poll, POLL_INTERVAL);
+    }
+});
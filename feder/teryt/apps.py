@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+from django.utils.translation import gettext_lazy as _
+
+
+class TerytConfig(AppConfig):
+    name = "feder.teryt"
+    verbose_name = _("TERYT")
+
+    def ready(self):
+        from . import signals  # noqa
@@ -1,8 +1,84 @@
+import uuid
+from bisect import bisect_right
+
+from django.core.cache import cache
+from django.db.models import Count
 from django.urls import reverse
-from teryt_tree.models import JednostkaAdministracyjna
+from teryt_tree.models import (
+    JednostkaAdministracyjna,
+    JednostkaAdministracyjnaManager,
+    JednostkaAdministracyjnaQuerySet,
+)
+
+from .settings import TERYT_AREA_COUNTS_CACHE_TIMEOUT
+
+AREA_COUNTS_VERSION_KEY = "teryt:area_counts:version"
+
+
+class JSTQuerySet(JednostkaAdministracyjnaQuerySet):
+    def area_counts(self, queryset, jst_path="jst", **aggregates):
+        """
+        Returns aggregates of objects of queryset located in area of each unit,
+        as dict of {unit pk: {name: value}}, with "count" of objects by default.
+
+        Objects are grouped by "tree_id" and "lft" of their unit in a single
+        query and assigned to units of this queryset by "lft"/"rght" range,
+        so units should not overlap, eg. be of the same level.
+        """
+        aggregates = aggregates or {"count": Count("pk")}
+        trees = {}
+        for pk, tree_id, lft, rght in self.order_by("tree_id", "lft").values_list(
+            "pk", "tree_id", "lft", "rght"
+        ):
+            trees.setdefault(tree_id, []).append((lft, rght, pk))
+        counts = {
+            pk: dict.fromkeys(aggregates, 0)
+            for units in trees.values()
+            for _, _, pk in units
+        }
+        tree_field, lft_field = f"{jst_path}__tree_id", f"{jst_path}__lft"
+        for row in (
+            queryset.order_by().values(tree_field, lft_field).annotate(**aggregates)
+        ):
+            units = trees.get(row[tree_field])
+            if not units:
+                continue
+            index = bisect_right(units, (row[lft_field], float("inf"))) - 1
+            if index < 0 or units[index][1] < row[lft_field]:
+                continue
+            values = counts[units[index][2]]
+            for name in aggregates:
+                values[name] += row[name] or 0
+        return counts
+
+
+def get_area_counts_version():
+    return cache.get_or_set(AREA_COUNTS_VERSION_KEY, uuid.uuid4().hex, None)
+
+
+def invalidate_area_counts():
+    """
+    Drops all cached area counts, eg. on change of cases or institutions.
+    """
+    cache.set(AREA_COUNTS_VERSION_KEY, uuid.uuid4().hex, None)
+
+
+def cached_area_counts(name, units, queryset, jst_path="jst", **aggregates):
+    """
+    Returns JSTQuerySet.area_counts of units cached under given name
+    until invalidate_area_counts.
+    """
+    key = f"teryt:area_counts:{get_area_counts_version()}:{name}"
+    counts = cache.get(key)
+    if counts is None:
+        counts = units.area_counts(queryset, jst_path, **aggregates)
+        cache.set(key, counts, TERYT_AREA_COUNTS_CACHE_TIMEOUT)
+    return counts
 
 
 class JST(JednostkaAdministracyjna):
+    objects = JednostkaAdministracyjnaManager.from_queryset(JSTQuerySet)()
+
     def institution_qs(self):
         Institution = self.institution_set.model
         return Institution.objects.area(self)
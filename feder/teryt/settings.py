@@ -0,0 +1,5 @@
+from django.conf import settings
+
+TERYT_AREA_COUNTS_CACHE_TIMEOUT = getattr(
+    settings, "TERYT_AREA_COUNTS_CACHE_TIMEOUT", 60 * 60
+)
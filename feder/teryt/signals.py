@@ -0,0 +1,20 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import invalidate_area_counts
+
+# fields of objects used by area counts
+AREA_FIELDS = {"institution", "institution_id", "jst", "jst_id", "is_quarantined"}
+
+
+@receiver(post_save, sender="cases.Case")
+@receiver(post_save, sender="institutions.Institution")
+def invalidate_area_counts_on_save(sender, created, raw, update_fields, **kwargs):
+    if created or update_fields is None or AREA_FIELDS & set(update_fields):
+        invalidate_area_counts()
+
+
+@receiver(post_delete, sender="cases.Case")
+@receiver(post_delete, sender="institutions.Institution")
+def invalidate_area_counts_on_delete(sender, **kwargs):
+    invalidate_area_counts()
@@ -0,0 +1,74 @@
+from django.core.cache import cache
+from django.db.models import Count, Q
+from django.test import TestCase
+
+from feder.cases.factories import CaseFactory
+from feder.institutions.factories import InstitutionFactory
+from feder.institutions.models import Institution
+from feder.teryt.factories import (
+    CommunityJSTFactory,
+    CountyJSTFactory,
+    VoivodeshipJSTFactory,
+)
+from feder.teryt.models import JST, cached_area_counts
+
+
+class JSTQuerySetTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.voivodeship = VoivodeshipJSTFactory()
+        self.county = CountyJSTFactory(parent=self.voivodeship)
+        self.community = CommunityJSTFactory(parent=self.county)
+        self.other_voivodeship = VoivodeshipJSTFactory()
+        self.institution = InstitutionFactory(jst=self.community)
+        InstitutionFactory(jst=self.county)
+        InstitutionFactory(jst=self.other_voivodeship)
+
+    def get_voivodeships(self):
+        return JST.objects.filter(category__level=1)
+
+    def test_count_objects_in_area(self):
+        with self.assertNumQueries(2):
+            counts = self.get_voivodeships().area_counts(Institution.objects.all())
+        self.assertEqual(
+            counts,
+            {
+                self.voivodeship.pk: {"count": 2},
+                self.other_voivodeship.pk: {"count": 1},
+            },
+        )
+
+    def test_count_in_area_of_counties(self):
+        counts = JST.objects.filter(category__level=2).area_counts(
+            Institution.objects.all()
+        )
+        self.assertEqual(counts, {self.county.pk: {"count": 2}})
+
+    def test_custom_aggregates(self):
+        CaseFactory(institution=self.institution)
+        CaseFactory(institution=self.institution, is_quarantined=True)
+        counts = self.get_voivodeships().area_counts(
+            self.institution.case_set.all(),
+            "institution__jst",
+            count=Count("pk"),
+            quarantined=Count("pk", filter=Q(is_quarantined=True)),
+        )
+        self.assertEqual(counts[self.voivodeship.pk], {"count": 2, "quarantined": 1})
+        self.assertEqual(
+            counts[self.other_voivodeship.pk], {"count": 0, "quarantined": 0}
+        )
+
+    def test_cache_invalidated_on_change(self):
+        def get_count():
+            return cached_area_counts(
+                "test", self.get_voivodeships(), Institution.objects.all()
+            )[self.other_voivodeship.pk]["count"]
+
+        self.assertEqual(get_count(), 1)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_count(), 1)
+        InstitutionFactory(jst=self.other_voivodeship)
+        self.assertEqual(get_count(), 2)
+        self.institution.jst = self.other_voivodeship
+        self.institution.save()
+        self.assertEqual(get_count(), 3)